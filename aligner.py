@@ -0,0 +1,86 @@
+import difflib
+import re
+from typing import List, Sequence, Tuple
+import numpy as np
+from regrouper import START, END
+
+# Shortest duration an interpolated word may get before we borrow time from a neighbour
+MIN_WORD_DURATION = 0.08
+
+_NORMALIZE_RE = re.compile(r"[^\w']+", re.UNICODE)
+
+
+def _normalize(token: str) -> str:
+    """Case/punctuation-insensitive form used for matching ("Hello," == "hello")."""
+    return _NORMALIZE_RE.sub("", token.lower())
+
+
+def realign_words(old_words: Sequence[str], old_times: np.ndarray, new_text: str,
+                  seg_start: float, seg_end: float) -> Tuple[List[str], np.ndarray]:
+    """
+    Re-aligns an edited caption line to the segment's cached word timings.
+
+    Tokens that still match an old word keep its timing. Inserted or changed tokens
+    share the gap between their matched neighbours (or the segment bounds) in proportion
+    to their character length. Deleted words are dropped.
+    Returns (words, times) in the same layout as regrouper.words_to_arrays.
+    """
+    tokens = new_text.split()
+    if not tokens:
+        return [], np.empty((0, 3), dtype=np.float64)
+
+    # Keep Whisper's leading-space convention for word strings
+    prefix = " " if old_words and old_words[0][:1].isspace() else ""
+
+    times = np.full((len(tokens), 3), np.nan, dtype=np.float64)
+    times[:, 2] = 1.0
+    fixed = np.zeros(len(tokens), dtype=bool)
+
+    matcher = difflib.SequenceMatcher(
+        None, [_normalize(w) for w in old_words], [_normalize(t) for t in tokens], autojunk=False
+    )
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            times[j1:j2] = old_times[i1:i2]
+            fixed[j1:j2] = True
+
+    # Fill each run of unmatched tokens between its fixed neighbours
+    lengths = np.array([max(len(t), 1) for t in tokens], dtype=np.float64)
+    j = 0
+    n = len(tokens)
+    while j < n:
+        if fixed[j]:
+            j += 1
+            continue
+        first = j
+        while j < n and not fixed[j]:
+            j += 1
+        last = j  # exclusive
+
+        # Borrow neighbouring matched words while the gap is too short for the run
+        while True:
+            left = times[first - 1, END] if first > 0 else seg_start
+            right = times[last, START] if last < n else seg_end
+            if right - left >= MIN_WORD_DURATION * (last - first):
+                break
+            if first > 0:
+                first -= 1
+                fixed[first] = False
+            elif last < n:
+                last += 1
+                fixed[last - 1] = False
+            else:
+                break
+        left = times[first - 1, END] if first > 0 else seg_start
+        right = times[last, START] if last < n else seg_end
+        right = max(right, left)
+
+        weights = lengths[first:last]
+        bounds = left + (right - left) * np.concatenate(([0.0], np.cumsum(weights) / weights.sum()))
+        times[first:last, START] = bounds[:-1]
+        times[first:last, END] = bounds[1:]
+        # Keep the original probability for borrowed words, interpolated ones get 1.0
+        fixed[first:last] = True
+        j = max(j, last)
+
+    return [prefix + t for t in tokens], times
@@ -1,39 +1,427 @@
 import streamlit as st
+import copy
 import os
-import shutil
-from utils import download_google_fonts, fetch_google_font
+from utils import fetch_google_font
+from fonts import bootstrap_fonts
+from font_catalog import warm_catalog
 from settings import (
     TEMP_DIR, OUTPUT_DIR, FONTS_DIR, STYLES, STYLE_BOLD_REEL, STYLE_MINIMALIST, STYLE_DYNAMIC_POP,
-    FONT_BOLD, FONT_MINIMAL, FONT_IMPACT, WHISPER_MODEL_SIZE
+    FONT_BOLD, FONT_MINIMAL, FONT_IMPACT, WHISPER_MODEL_SIZE, WHISPER_MODEL_SIZES, WHISPER_COMPUTE_TYPE,
+    VIDEO_WIDTH_VERTICAL, PRESET_FONTS, BATCH_PREFETCH_LOOKAHEAD, RENDER_MAX_THREADS, EDITOR_PAGE_ROWS
 )
-from transcriber import Transcriber
+from transcription_service import get_transcription_client
+from regrouper import regroup_words, words_to_arrays
+from subtitle_track import SubtitleTrack
+from timing import transform_times, stretch_for_fps, parse_anchors
 from renderer import VideoRenderer
+from jobs import JobExecutor, RenderProgressLogger, DONE
+from cpu_scheduler import get_scheduler
+from ingest import (
+    ingest_upload, hash_buffer, content_path, write_buffer, load_cached_words, save_cached_words,
+    render_cache_key, render_cache_path, link_or_copy
+)
+from archive import build_batch_archive
+from exporter import export_file
+from workspace import WorkspaceManager
+from projects import ProjectStore, ProjectConflict
+from subtitle_formats import FORMATS, EXTENSIONS, format_for, parse_subtitles, write_subtitles
 from presets_manager import PresetsManager
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # --- App Config ---
 st.set_page_config(page_title="CaptionME", page_icon="🎬", layout="wide")
 
 @st.cache_resource
-def get_transcriber():
-    return Transcriber(model_size=WHISPER_MODEL_SIZE)
+def get_transcriber_client():
+    # Models live in the shared transcription server (started on demand), not in this process
+    client = get_transcription_client()
+    # Start loading the default model right away so the first transcription doesn't wait on it
+    try:
+        client.warm(WHISPER_MODEL_SIZE, WHISPER_COMPUTE_TYPE)
+    except Exception as e:
+        print(f"Model warm-up request failed: {e}")
+    return client
+
+@st.cache_resource
+def get_font_status():
+    status = bootstrap_fonts(background=True)
+    # Index installed fonts in the background rather than on the first render or this page load
+    warm_catalog()
+    return status
+
+@st.cache_resource
+def get_job_executor():
+    return JobExecutor()
+
+# --- Background Jobs ---
+# These run on the shared JobExecutor, outside the Streamlit script thread.
+def run_transcription_job(job, client, video_path, model_size, media_hash=None):
+    cached = load_cached_words(media_hash, model_size)
+    if cached is not None:
+        return cached
+    # Whisper runs with a fixed thread count per model. Count it against this process's CPU budget
+    # once the server starts on it (a request queued behind another session's uses no CPU), without
+    # waiting for the budget: the server already limits itself, renders are what yield meanwhile
+    scheduler = get_scheduler()
+    threads = client.status().get("threads") or scheduler.total_threads
+    leases = []
+
+    def on_started():
+        job.progress["stage"] = "Transcribing audio"
+        leases.append(scheduler.record(job.owner, threads))
+
+    job.progress["stage"] = f"Waiting for Whisper ({model_size})"
+    try:
+        words = client.transcribe_words(video_path, model_size, WHISPER_COMPUTE_TYPE, on_started=on_started)
+    finally:
+        for lease in leases:
+            lease.release()
+    save_cached_words(media_hash, model_size, words)
+    return words
+
+def run_render_job(job, video_path, track, style, output_path, style_config, cache_path=None):
+    target_path = cache_path or output_path
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+    def on_wait():
+        job.progress["stage"] = "Waiting for CPU"
+
+    with get_scheduler().acquire(job.owner, 1, RENDER_MAX_THREADS, on_wait=on_wait) as lease:
+        job.progress["stage"] = "Rendering"
+        VideoRenderer().render_video(
+            video_path, track, style, target_path,
+            style_config=style_config, logger=RenderProgressLogger(job), threads=lease.threads
+        )
+    if cache_path:
+        link_or_copy(cache_path, output_path)
+    return output_path
+
+def start_transcription(video_path):
+    """Queues a transcription job for video_path and remembers its id in the session."""
+    model_size = st.session_state.get("model_size", WHISPER_MODEL_SIZE)
+    st.session_state.transcribe_job = get_job_executor().submit(
+        "transcribe", run_transcription_job, get_transcriber_client(), video_path, model_size,
+        st.session_state.get("media_hash"), label=video_path, owner=get_session_id()
+    )
+
+def run_prefetch_job(job, client, buffer, filename, model_size):
+    """Hashes, copies and transcribes an upcoming upload; publishes its hash and path in job.progress."""
+    job.progress["stage"] = "Hashing upload"
+    media_hash = hash_buffer(buffer)
+    video_path = content_path(media_hash, filename)
+    job.progress["hash"] = media_hash
+    # The session may have reached this file first and ingested it itself (path claimed as None)
+    if job.progress.setdefault("path", video_path) != video_path:
+        return None
+    job.progress["stage"] = "Copying upload"
+    write_buffer(buffer, video_path)
+    return run_transcription_job(job, client, video_path, model_size, media_hash)
+
+def prefetch_upcoming(file_map, current_index):
+    """
+    Queues copy + transcription for the next `batch_lookahead` items of the batch,
+    so moving to the next video doesn't wait on Whisper.
+    """
+    lookahead = st.session_state.get("batch_lookahead", BATCH_PREFETCH_LOOKAHEAD)
+    prefetch = st.session_state.prefetch
+    model_size = st.session_state.get("model_size", WHISPER_MODEL_SIZE)
+    upcoming = st.session_state.selected_batch[current_index + 1:current_index + 1 + lookahead]
+    for filename in upcoming:
+        uploaded_file = file_map.get(filename)
+        if uploaded_file is None:
+            continue
+        if filename in prefetch and prefetch[filename]["file_id"] == uploaded_file.file_id:
+            continue
+        # Hashing happens in the job too: a large upload would stall every rerun here
+        prefetch[filename] = {
+            "file_id": uploaded_file.file_id,
+            "job": get_job_executor().submit(
+                "transcribe", run_prefetch_job, get_transcriber_client(),
+                uploaded_file.getbuffer(), filename, model_size, label=filename, owner=get_session_id()
+            )
+        }
+
+@st.fragment(run_every=1.0)
+def show_job_progress(job_id):
+    """Polls a background job; reruns the whole app once it finishes so results get applied."""
+    job = get_job_executor().get(job_id)
+    if job is None:
+        return
+    if not job.is_active:
+        st.rerun(scope="app")
+    if job.kind == "render" and job.progress.get("stage") == "Rendering":
+        frame = job.progress.get("frame", 0)
+        total = job.progress.get("total") or "?"
+        st.progress(job.fraction, text=f"🔥 Rendering frame {frame}/{total} @ {job.progress.get('fps', 0)} fps")
+    else:
+        icon = "🔥" if job.kind == "render" else "🎙️"
+        st.info(f"{icon} {job.progress.get('stage', 'Queued (waiting for a free worker)')}...")
+
+@st.cache_data
+def get_video_duration(video_path):
+    from moviepy.video.io.VideoFileClip import VideoFileClip
+    with VideoFileClip(video_path) as clip:
+        return clip.duration
+
+def get_regroup_rules():
+    """Collects the caption density controls into regrouper rules (0 = rule off)."""
+    state = st.session_state
+    max_width_pct = state.get("regroup_max_width_pct", 0)
+    return {
+        "max_words": state.get("regroup_max_words", 3) or None,
+        "max_chars": state.get("regroup_max_chars", 0) or None,
+        "max_width_px": int(VIDEO_WIDTH_VERTICAL * max_width_pct / 100) or None,
+        "font_path": FONT_BOLD,
+        "fontsize": 70,
+        "max_duration": state.get("regroup_max_duration", 0.0) or None,
+        "punctuation_break": state.get("regroup_punctuation", False),
+        "pause_gap": state.get("regroup_pause_gap", 0.0) or None,
+    }
+
+def build_track(words):
+    """Chunks cached (texts, times) words with the current density rules into a SubtitleTrack."""
+    texts, times = words
+    return SubtitleTrack.from_words(texts, times, regroup_words(texts, times, **get_regroup_rules()))
+
+# --- Windowed Subtitle Editor ---
+# The grid only ever holds EDITOR_PAGE_ROWS rows. Pending edits live in the data_editor's
+# widget state (row deltas) and are spliced into the full track by segment id whenever
+# the window or the track changes.
+def set_subtitles(track):
+    """Replaces the whole track and starts a fresh editor widget for it."""
+    st.session_state.subtitles = track
+    st.session_state.editor_rev = st.session_state.get("editor_rev", 0) + 1
+
+def editor_key():
+    return f"subtitle_editor_{st.session_state.get('editor_rev', 0)}"
+
+def editor_window():
+    """(first, last) segment indices currently shown in the editor."""
+    total = len(st.session_state.subtitles)
+    first = min(max(0, st.session_state.get("editor_first", 0)), max(0, total - 1))
+    return first, min(total, first + EDITOR_PAGE_ROWS)
+
+def editor_changes():
+    """The editor widget's pending deltas, or None if nothing was edited."""
+    changes = st.session_state.get(editor_key())
+    if changes and (changes.get("edited_rows") or changes.get("added_rows") or changes.get("deleted_rows")):
+        return changes
+    return None
+
+def apply_editor_changes(rows, changes):
+    """Applies data_editor deltas (positions relative to `rows`) to the window rows."""
+    records = rows.to_dict("records")
+    for pos, values in changes.get("edited_rows", {}).items():
+        records[int(pos)].update(values)
+    deleted = {int(pos) for pos in changes.get("deleted_rows", [])}
+    records = [r for i, r in enumerate(records) if i not in deleted]
+    records.extend(dict(r) for r in changes.get("added_rows", []))
+    return records
+
+def commit_editor_edits():
+    """Merges the window's pending edits into st.session_state.subtitles."""
+    changes = editor_changes()
+    if changes is None:
+        return
+    first, last = editor_window()
+    track = st.session_state.subtitles
+    rows = apply_editor_changes(track.to_editor_rows(first, last), changes)
+    set_subtitles(track.splice_editor_rows(rows, first, last))
+    log_edit({"op": "splice", "first": first, "last": last, "rows": rows})
+
+def show_editor_row(index):
+    """Moves the editor window so segment `index` is near the top (commits pending edits first)."""
+    commit_editor_edits()
+    st.session_state.editor_first = max(0, index - 3)
+
+def page_editor(step):
+    commit_editor_edits()
+    first, _ = editor_window()
+    st.session_state.editor_first = max(0, first + step * EDITOR_PAGE_ROWS)
+
+def jump_editor_to_time():
+    show_editor_row(st.session_state.subtitles.segment_at(st.session_state.editor_jump_time))
+
+def search_editor(step=0):
+    """Finds segments containing the search text; step=1 moves to the next hit."""
+    commit_editor_edits()
+    hits = st.session_state.subtitles.search(st.session_state.get("editor_search", ""))
+    st.session_state.editor_hits = len(hits)
+    if not len(hits):
+        return
+    current = st.session_state.get("editor_hit", -1)
+    if step:
+        later = hits[hits > current]
+        target = int(later[0]) if len(later) else int(hits[0])
+    else:
+        target = int(hits[0])
+    st.session_state.editor_hit = target
+    show_editor_row(target)
+
+# --- Project Autosave ---
+# Transcript, edits and style are saved per video (media hash), so a refresh, restart
+# or re-upload resumes instantly. See projects.py for the snapshot + journal layout.
+STYLE_STATE_KEYS = [
+    "selected_style", "font_source_mode", "preset_font_choice", "google_font_name_input", "custom_font_path",
+    "cust_fontsize", "cust_stroke_width", "cust_letter_spacing", "cust_line_spacing", "chk_karaoke",
+    "cust_color", "cust_inactive_color", "cust_stroke_color"
+]
+
+@st.cache_resource
+def get_project_store():
+    return ProjectStore()
+
+def style_state():
+    return {key: st.session_state[key] for key in STYLE_STATE_KEYS if key in st.session_state}
+
+def log_edit(op):
+    """Journals an edit to the current video's project (call after updating session state)."""
+    media_hash = st.session_state.get("media_hash")
+    store = get_project_store()
+    model_size = st.session_state.get("model_size", WHISPER_MODEL_SIZE)
+    # Journal position this session's state reflects, as (media hash, seq)
+    known_hash, seq = st.session_state.get("project_seq") or (None, None)
+    try:
+        seq, due = store.append(media_hash, op, seq if known_hash == media_hash else None)
+        if due:
+            store.compact(media_hash, st.session_state.words, st.session_state.subtitles, style_state(), model_size, seq)
+    except ProjectConflict:
+        # Edited in another tab meanwhile: save this session's state whole rather than mixing the two
+        st.warning("This video was also edited in another tab; saved the edits shown here over those.")
+        seq = store.create(media_hash, st.session_state.words, st.session_state.subtitles, style_state(), model_size)
+    st.session_state.project_seq = (media_hash, seq)
+
+def start_project(words):
+    """Saves a fresh transcription as the video's project."""
+    media_hash = st.session_state.get("media_hash")
+    if media_hash:
+        seq = get_project_store().create(media_hash, words, st.session_state.subtitles, style_state(),
+                                         st.session_state.get("model_size", WHISPER_MODEL_SIZE))
+        st.session_state.project_seq = (media_hash, seq)
+    st.session_state.saved_style = style_state()
+    st.session_state.saved_draft = None
+
+def resume_project():
+    """Restores the current video's saved project. Returns False if there is none."""
+    project = None
+    media_hash = st.session_state.get("media_hash")
+    if get_project_store().exists(media_hash):
+        project = get_project_store().load(media_hash)
+    if project is None:
+        return False
+    st.session_state.words = project.words
+    set_subtitles(project.track)
+    st.session_state.editor_first = 0
+    st.session_state.update(project.style)
+    st.session_state.saved_style = project.style
+    st.session_state.saved_draft = None
+    st.session_state.transcribed = True
+    st.session_state.project_resumed = project.edits
+    st.session_state.project_seq = (media_hash, project.seq)
+    return True
+
+def discard_project():
+    """Drops saved edits: back to the plain transcript with the current density rules."""
+    set_subtitles(build_track(st.session_state.words))
+    st.session_state.editor_first = 0
+    start_project(st.session_state.words)
+    st.session_state.project_resumed = None
+
+def autosave_style():
+    style = style_state()
+    if style != st.session_state.get("saved_style"):
+        st.session_state.saved_style = style
+        log_edit({"op": "style", "values": style})
+
+def autosave_draft(rows, first, last):
+    """Saves the editor window's uncommitted edits (rows = the window shown in the grid)."""
+    changes = editor_changes()
+    if changes == st.session_state.get("saved_draft"):
+        return
+    st.session_state.saved_draft = copy.deepcopy(changes)
+    store = get_project_store()
+    if changes:
+        store.save_draft(st.session_state.get("media_hash"), first, last, apply_editor_changes(rows, changes))
+    else:
+        store.clear_draft(st.session_state.get("media_hash"))
+
+# --- Caption Files ---
+def import_captions(uploaded_file):
+    """Uses an uploaded SRT/VTT/ASS/JSON file as the transcript. Returns False if it has no captions."""
+    try:
+        text = uploaded_file.getvalue().decode("utf-8-sig", errors="replace")
+        segments = parse_subtitles(text, format_for(uploaded_file.name))
+    except (ValueError, KeyError, TypeError) as e:
+        st.error(f"Could not read {uploaded_file.name}: {e}")
+        return False
+    if not segments:
+        st.error(f"No captions found in {uploaded_file.name}.")
+        return False
+    st.session_state.words = words_to_arrays([w for seg in segments for w in seg["words"]])
+    set_subtitles(SubtitleTrack.from_segments(segments))
+    st.session_state.editor_first = 0
+    st.session_state.transcribed = True
+    start_project(st.session_state.words)
+    return True
+
+def export_captions(track, fmt):
+    """Writes the edited captions next to the video's render (captioned_<name>.<ext>) and returns the path."""
+    root = os.path.splitext(f"captioned_{st.session_state.selected_file['name']}")[0]
+    return write_subtitles(track, os.path.join(OUTPUT_DIR, root + FORMATS[fmt]), fmt)
+
+# --- Workspace (disk quotas) ---
+@st.cache_resource
+def get_workspace():
+    return WorkspaceManager()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_workspace_usage():
+    # Walks every workspace file: refreshed after ingests, renders and purges rather than on every rerun
+    return get_workspace().usage()
+
+def enforce_quotas():
+    get_workspace().enforce()
+    get_workspace_usage.clear()
+
+def get_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "default"
+
+def pin_session_files():
+    """Tells the workspace which files this session still needs, so they are never evicted."""
+    state = st.session_state
+    paths = [state.get("local_video_path")]
+    # Every output of the batch, not just the current one: the ZIP / move step reads them all at the end
+    names = list(state.get("selected_batch", []))
+    if state.get("selected_file"):
+        names.append(state.selected_file["name"])
+    paths.extend(os.path.join(OUTPUT_DIR, f"captioned_{name}") for name in names)
+    executor = get_job_executor()
+    for entry in state.get("prefetch", {}).values():
+        job = executor.get(entry["job"])
+        if job:
+            paths.append(job.progress.get("path"))
+    get_workspace().pin(get_session_id(), paths)
 
 # --- Cleanup Function ---
 def cleanup_temp_files():
-    """Removes all files in TEMP_DIR and OUTPUT_DIR to save space."""
+    """Removes files in TEMP_DIR that no active session is using (caches are left to the quota)."""
     try:
-        shutil.rmtree(TEMP_DIR)
-        os.makedirs(TEMP_DIR, exist_ok=True)
-        # We might want to keep output for a bit, but user requested cleanup to save space.
-        # Let's clean temp mainly.
-        st.success(f"Cleaned up {TEMP_DIR}")
+        workspace = get_workspace()
+        # This session resets its state right after, so drop its own pins first
+        workspace.pin(get_session_id(), [])
+        removed = workspace.purge("temp")
+        get_workspace_usage.clear()
+        st.success(f"Cleaned up {len(removed)} files in {TEMP_DIR}")
     except Exception as e:
         st.error(f"Error cleaning up: {e}")
 
 # --- Main App ---
 def main():
     # --- Runtime Setup ---
-    # Ensure fonts are available (Download from Google if missing)
-    download_google_fonts()
+    # Ensure fonts are available (verified once per process, missing ones fetched in the background)
+    get_font_status()
+    transcriber_client = get_transcriber_client()
 
     # --- Custom CSS (Brutalist Theme) ---
     st.markdown("""
@@ -124,31 +512,96 @@ def main():
         st.header("⚙️ Configuration")
         
 
-        if st.button("🧹 Purge Temp Files"):
+        if st.button("🧹 Purge Temp Files", help="Keeps cached transcripts, renders and caption layers (trimmed by the disk quota)"):
             cleanup_temp_files()
             # Reset state to prevent trying to load deleted files
             st.session_state.selected_file = None
             st.session_state.local_video_path = None
-            st.session_state.subtitles = []
+            st.session_state.loaded_file_id = None
+            st.session_state.media_hash = None
+            set_subtitles(SubtitleTrack.empty())
+            st.session_state.pop("words", None)
+            st.session_state.prefetch = {}
             st.session_state.transcribed = False
             st.session_state.batch_index = 0
             st.rerun()
+        usage = get_workspace_usage()
+        for area, (used, quota) in usage.items():
+            used_mb = used / (1024 * 1024)
+            if quota:
+                st.progress(min(1.0, used / quota), text=f"{area.title()}: {used_mb:.0f} / {quota / (1024 * 1024):.0f} MB")
+            else:
+                st.caption(f"{area.title()}: {used_mb:.0f} MB")
+        cpu = get_scheduler().usage()
+        st.caption(f"CPU: {cpu['in_use']}/{cpu['total']} threads busy" + (f", {cpu['waiting']} job(s) waiting" if cpu["waiting"] else ""))
+        st.divider()
+        st.subheader("Whisper Model")
+        st.selectbox(
+            "Model Size",
+            WHISPER_MODEL_SIZES,
+            index=WHISPER_MODEL_SIZES.index(WHISPER_MODEL_SIZE),
+            key="model_size",
+            help="Smaller = faster drafts, larger = more accurate finals. Loaded models stay warm."
+        )
+        try:
+            server = transcriber_client.status()
+            loaded = [size for size, _ in server["loaded"]]
+            queue_note = f", {server['queued']} queued" if server["queued"] else ""
+            st.caption(f"Loaded: {', '.join(loaded) if loaded else 'warming up...'} ({server['used_mb']} MB{queue_note})")
+        except Exception as e:
+            st.caption(f"Transcription server unavailable: {e}")
+        st.number_input(
+            "Batch Prefetch Lookahead",
+            value=BATCH_PREFETCH_LOOKAHEAD, min_value=0, max_value=5, step=1,
+            key="batch_lookahead",
+            help="Upcoming batch videos to copy & transcribe in the background while you edit the current one."
+        )
         st.divider()
         st.subheader("Timestamp Sync")
-        sync_offset = st.number_input("Global Offset (ms)", value=0, step=100, help="Positive = Later, Negative = Earlier")
-        if st.button("Apply Offset"):
+        sync_mode = st.radio("Mode", ["Offset", "Stretch (FPS)", "Drift Anchors"], horizontal=True, key="sync_mode")
+        # The modes are exclusive: the offset only applies in Offset mode
+        sync_offset = 0
+        sync_stretch = 1.0
+        sync_anchors = None
+        if sync_mode == "Offset":
+            sync_offset = st.number_input("Global Offset (ms)", value=0, step=100, help="Positive = Later, Negative = Earlier")
+        elif sync_mode == "Stretch (FPS)":
+            col_fps_1, col_fps_2 = st.columns(2)
+            with col_fps_1:
+                source_fps = st.number_input("From FPS", value=25.0, min_value=1.0, step=0.001, format="%.3f")
+            with col_fps_2:
+                target_fps = st.number_input("To FPS", value=23.976, min_value=1.0, step=0.001, format="%.3f")
+            sync_stretch = stretch_for_fps(source_fps, target_fps)
+        elif sync_mode == "Drift Anchors":
+            anchors_text = st.text_area(
+                "Anchors (current = correct, seconds)",
+                placeholder="12.5 = 12.9\n600.0 = 601.8",
+                help="One point per line. Times between anchors are corrected linearly."
+            )
+        if st.button("Apply Timing"):
             if st.session_state.subtitles:
-                offset_seconds = sync_offset / 1000.0
-                for sub in st.session_state.subtitles:
-                    sub['start'] += offset_seconds
-                    sub['end'] += offset_seconds
-                    # Adjust words if present (for Dynamic Pop)
-                    if 'words' in sub and sub['words']:
-                         for w in sub['words']:
-                             w['start'] += offset_seconds
-                             w['end'] += offset_seconds
-                st.success(f"Applied {sync_offset}ms offset!")
-                st.rerun() # Refresh editor
+                try:
+                    if sync_mode == "Drift Anchors":
+                        sync_anchors = parse_anchors(anchors_text)
+                    duration = None
+                    if st.session_state.get("local_video_path"):
+                        duration = get_video_duration(st.session_state.local_video_path)
+                    commit_editor_edits()
+                    set_subtitles(transform_times(
+                        st.session_state.subtitles,
+                        offset=sync_offset / 1000.0,
+                        stretch=sync_stretch,
+                        anchors=sync_anchors,
+                        duration=duration
+                    ))
+                    log_edit({
+                        "op": "timing", "offset": sync_offset / 1000.0, "stretch": sync_stretch,
+                        "anchors": sync_anchors, "duration": duration
+                    })
+                    st.success(f"Applied timing ({sync_mode})!")
+                    st.rerun() # Refresh editor
+                except ValueError as e:
+                    st.error(f"Invalid anchors: {e}")
             else:
                 st.warning("No subtitles to sync.")
         
@@ -165,7 +618,7 @@ def main():
     if "local_video_path" not in st.session_state:
         st.session_state.local_video_path = None
     if "subtitles" not in st.session_state:
-        st.session_state.subtitles = []
+        set_subtitles(SubtitleTrack.empty())
     if "transcribed" not in st.session_state:
         st.session_state.transcribed = False
     if "selected_batch" not in st.session_state:
@@ -177,6 +630,10 @@ def main():
     
     if "processing_started" not in st.session_state:
         st.session_state.processing_started = False
+    if "prefetch" not in st.session_state:
+        st.session_state.prefetch = {}
+
+    pin_session_files()
     
     # --- Content Source (Drag & Drop) ---
     st.subheader("1. 📂 Content Source")
@@ -233,20 +690,26 @@ def main():
                     st.markdown("### ☁️ Download All")
                     st.info("Best for Cloud usage.")
                     
-                    zip_base_name = os.path.join(TEMP_DIR, "captioned_videos")
-                    # Create zip (overwrite if exists)
-                    shutil.make_archive(zip_base_name, 'zip', OUTPUT_DIR)
-                    zip_file_path = zip_base_name + ".zip"
-                    
-                    with open(zip_file_path, "rb") as f:
-                        st.download_button(
-                            label="📦 Download ZIP Archive",
-                            data=f,
-                            file_name="captioned_videos.zip",
-                            mime="application/zip",
-                            type="primary",
-                            use_container_width=True
-                        )
+                    output_files = [
+                        os.path.join(OUTPUT_DIR, f) for f in os.listdir(OUTPUT_DIR)
+                        if os.path.isfile(os.path.join(OUTPUT_DIR, f)) and ".part" not in f
+                    ]
+
+                    # Built lazily on click (off the script thread) and cached by output content,
+                    # so reruns of this page cost nothing
+                    def load_batch_archive():
+                        with open(build_batch_archive(output_files), "rb") as f:
+                            return f.read()
+
+                    st.download_button(
+                        label="📦 Download ZIP Archive",
+                        data=load_batch_archive,
+                        file_name="captioned_videos.zip",
+                        mime="application/zip",
+                        type="primary",
+                        use_container_width=True,
+                        disabled=not output_files
+                    )
 
                 # OPTION B: LOCAL SAVE (Local Friendly)
                 with col_local:
@@ -260,14 +723,20 @@ def main():
                     if st.button("📂 Move Files to Folder", use_container_width=True):
                         if local_dest and os.path.exists(local_dest):
                             try:
-                                files = os.listdir(OUTPUT_DIR)
+                                files = [f for f in os.listdir(OUTPUT_DIR) if f.endswith(".mp4") and ".part" not in f]
                                 count = 0
+                                export_bar = st.progress(0.0, text="Exporting...")
                                 for f in files:
-                                    if f.endswith(".mp4"):
-                                        src = os.path.join(OUTPUT_DIR, f)
-                                        dst = os.path.join(local_dest, f)
-                                        shutil.copy2(src, dst) # Copy preserves metadata
-                                        count += 1
+                                    src = os.path.join(OUTPUT_DIR, f)
+                                    # Hardlink on the same filesystem, parallel copy otherwise
+                                    export_file(
+                                        src, local_dest,
+                                        progress=lambda done, total, f=f: export_bar.progress(
+                                            (count + done / max(total, 1)) / len(files), text=f"Exporting {f}..."
+                                        )
+                                    )
+                                    count += 1
+                                export_bar.empty()
                                 
                                 st.success(f"Successfully moved {count} videos to `{local_dest}`")
                                 
@@ -304,16 +773,38 @@ def main():
                 st.error(f"File '{current_filename}' missing from upload state.")
                 st.stop()
 
-            # --- Auto-Load / Download Logic ---
-            # We need to save the BytesIO to a physical temp file for ffmpeg/processing
-            expected_temp_path = os.path.join(TEMP_DIR, current_filename)
-            
-            if st.session_state.local_video_path != expected_temp_path:
+            # --- Pipelining: copy & transcribe upcoming queue items in the background ---
+            if is_batch:
+                prefetch_upcoming(file_map, current_index)
+
+            # --- Auto-Load / Ingestion Logic ---
+            # Uploads are stored content-addressed (TEMP_DIR/<sha>.<ext>) for ffmpeg/processing
+            if st.session_state.get("loaded_file_id") != uploaded_file.file_id:
+                 prefetched = st.session_state.prefetch.pop(current_filename, None)
+                 if prefetched and prefetched["file_id"] != uploaded_file.file_id:
+                     prefetched = None
+                 prefetch_job = get_job_executor().get(prefetched["job"]) if prefetched else None
+                 # A job that hasn't hashed the upload yet is dropped (its path claimed as None): ingest here
+                 if prefetch_job and prefetch_job.progress.setdefault("path", None) is None:
+                     prefetch_job = None
+                 if prefetch_job and (prefetch_job.is_active or os.path.exists(prefetch_job.progress["path"])):
+                     # Already copied / transcribing (or done): just adopt the job
+                     st.session_state.local_video_path = prefetch_job.progress["path"]
+                     st.session_state.media_hash = prefetch_job.progress["hash"]
+                     st.session_state.loaded_file_id = uploaded_file.file_id
+                     st.session_state.selected_file = {'name': current_filename}
+                     st.session_state.transcribed = False
+                     st.session_state.transcribe_job = prefetch_job.id
+                     st.rerun()
+
                  with st.spinner(f"⬇️ Preparing {current_filename}..."):
-                     with open(expected_temp_path, "wb") as f:
-                         f.write(uploaded_file.getbuffer())
-                     
-                     st.session_state.local_video_path = expected_temp_path
+                     media_hash, video_path = ingest_upload(uploaded_file)
+                     get_workspace().pin(get_session_id(), [video_path])
+                     enforce_quotas()
+
+                     st.session_state.local_video_path = video_path
+                     st.session_state.media_hash = media_hash
+                     st.session_state.loaded_file_id = uploaded_file.file_id
                      st.session_state.selected_file = {'name': current_filename}
                      st.session_state.transcribed = False 
                      
@@ -324,55 +815,134 @@ def main():
 
             # Display Video
             if st.session_state.local_video_path:
-                st.video(st.session_state.local_video_path)
+                # A prefetched upload may still be copying in the background
+                if os.path.exists(st.session_state.local_video_path):
+                    st.video(st.session_state.local_video_path)
 
                 # --- Transcription ---
                 st.subheader("2. 📝 Transcription")
+
+                # This video was worked on before: pick up where it was left instead of transcribing
+                if not st.session_state.transcribed and not st.session_state.get("transcribe_job") and resume_project():
+                    st.session_state.auto_transcribe_trigger = False
                 
                 # Check for Auto-Transcribe Trigger
                 if st.session_state.get("auto_transcribe_trigger", False):
                      st.session_state.auto_transcribe_trigger = False # Reset
-                     with st.spinner("🎙️ Auto-Transcribing for Batch Queue..."):
-                        try:
-                            transcriber = get_transcriber()
-                            results = transcriber.transcribe_video(st.session_state.local_video_path)
-                            st.session_state.subtitles = results
+                     start_transcription(st.session_state.local_video_path)
+
+                # Collect finished transcription (ignore jobs for a video we already left)
+                transcribe_job = get_job_executor().get(st.session_state.get("transcribe_job"))
+                if transcribe_job and transcribe_job.label != st.session_state.local_video_path:
+                    transcribe_job = None
+                    st.session_state.transcribe_job = None
+                if transcribe_job and not transcribe_job.is_active:
+                    st.session_state.transcribe_job = None
+                    if transcribe_job.status == DONE:
+                        # A prefetched transcription must not overwrite a saved project for the same video
+                        if not resume_project():
+                            st.session_state.words = transcribe_job.result
+                            set_subtitles(build_track(st.session_state.words))
+                            st.session_state.editor_first = 0
                             st.session_state.transcribed = True
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"Error during transcription: {e}")
+                            start_project(st.session_state.words)
+                    else:
+                        st.error(f"Error during transcription: {transcribe_job.error}")
+                    transcribe_job = None
 
-                if not st.session_state.transcribed:
+                if transcribe_job:
+                    show_job_progress(transcribe_job.id)
+                elif not st.session_state.transcribed:
                     if st.button("Start Transcription (faster-whisper)"):
-                        status_text = st.empty()
-                        status_text.text("⏳ Loading Whisper Model...")
-                        try:
-                            transcriber = get_transcriber()
-                            status_text.text("🎙️ Transcribing audio...")
-                            results = transcriber.transcribe_video(st.session_state.local_video_path)
-                            st.session_state.subtitles = results
-                            st.session_state.transcribed = True
-                            status_text.success("Transcription complete!")
-                            st.rerun()
-                        except Exception as e:
-                            status_text.error(f"Error during transcription: {e}")
+                        start_transcription(st.session_state.local_video_path)
+                        st.rerun()
+                    # Captions from another tool: use them as the transcript, no Whisper pass
+                    caption_file = st.file_uploader(
+                        "...or import existing captions",
+                        type=[ext.lstrip(".") for ext in EXTENSIONS],
+                        key=f"caption_import_{st.session_state.get('loaded_file_id')}"
+                    )
+                    if caption_file is not None and import_captions(caption_file):
+                        st.rerun()
                 
                 # --- Editing & Review ---
                 if st.session_state.transcribed:
                     st.success("✅ Transcribed")
+                    if st.session_state.get("project_resumed") is not None:
+                        col_r1, col_r2 = st.columns([3, 1])
+                        col_r1.info(f"Resumed saved project ({st.session_state.project_resumed} edits since the last snapshot).")
+                        col_r2.button("Discard Saved Edits", on_click=discard_project,
+                                      help="Back to the plain transcript. The Whisper pass is kept.")
                     st.subheader("3. ✏️ Review & Edit")
-                    
-                    edited_data = st.data_editor(
-                        st.session_state.subtitles, 
+
+                    # Re-chunk from the cached word timings (no Whisper pass)
+                    with st.expander("📏 Caption Density"):
+                        col_d1, col_d2, col_d3 = st.columns(3)
+                        with col_d1:
+                            st.number_input("Max Words", value=3, min_value=0, step=1, key="regroup_max_words", help="0 = no limit")
+                            st.number_input("Max Characters", value=0, min_value=0, step=5, key="regroup_max_chars", help="0 = no limit")
+                        with col_d2:
+                            st.number_input("Max Width (% of 1080px)", value=0, min_value=0, max_value=100, step=5, key="regroup_max_width_pct", help="Measured with the Roboto Bold preset font. 0 = no limit")
+                            st.number_input("Max Duration (s)", value=0.0, min_value=0.0, step=0.5, key="regroup_max_duration", help="0 = no limit")
+                        with col_d3:
+                            st.number_input("Break on Pause (s)", value=0.0, min_value=0.0, step=0.1, key="regroup_pause_gap", help="0 = off")
+                            st.checkbox("Break on Punctuation", key="regroup_punctuation")
+                        if st.button("Re-chunk Captions", disabled="words" not in st.session_state,
+                                     help="Discards text edits made in the table below."):
+                            set_subtitles(build_track(st.session_state.words))
+                            log_edit({"op": "rechunk", "rules": get_regroup_rules()})
+                            st.rerun()
+
+                    # Windowed editor: only EDITOR_PAGE_ROWS rows go to the browser
+                    track = st.session_state.subtitles
+                    first, last = editor_window()
+                    col_e1, col_e2, col_e3 = st.columns([2, 1, 1.4])
+                    with col_e1:
+                        st.text_input("Search captions", key="editor_search", on_change=search_editor,
+                                      placeholder="Find text...")
+                        if st.session_state.get("editor_search"):
+                            hits = st.session_state.get("editor_hits", 0)
+                            st.button(f"Next match ({hits} found)", on_click=search_editor, args=(1,), disabled=not hits)
+                    with col_e2:
+                        st.number_input("Jump to (s)", min_value=0.0, step=1.0, key="editor_jump_time",
+                                        on_change=jump_editor_to_time)
+                    with col_e3:
+                        st.caption(f"Rows {first + 1 if len(track) else 0}–{last} of {len(track)}")
+                        col_prev, col_next = st.columns(2)
+                        col_prev.button("◀ Prev", on_click=page_editor, args=(-1,), disabled=first == 0, use_container_width=True)
+                        col_next.button("Next ▶", on_click=page_editor, args=(1,), disabled=last >= len(track), use_container_width=True)
+
+                    window_rows = track.to_editor_rows(first, last)
+                    edited_rows = st.data_editor(
+                        window_rows,
+                        key=editor_key(),
                         num_rows="dynamic",
+                        hide_index=True,
                         column_config={
-                            "words": None
+                            "id": None
                         }
                     )
+                    # Unchanged window: the track is used as is, no per-row work
+                    edited_data = track.splice_editor_rows(edited_rows, first, last) if editor_changes() else track
+                    autosave_draft(window_rows, first, last)
+
+                    with st.expander("📤 Export Captions"):
+                        col_x1, col_x2 = st.columns([2, 1])
+                        export_format = col_x1.selectbox("Format", list(FORMATS), key="caption_export_format",
+                                                         format_func=lambda f: f"{f.upper()} ({FORMATS[f]})")
+                        col_x2.write("")
+                        col_x2.write("")
+                        if col_x2.button("Export", use_container_width=True):
+                            st.session_state.caption_export = export_captions(edited_data, export_format)
+                        export_path = st.session_state.get("caption_export")
+                        if export_path and os.path.exists(export_path):
+                            with open(export_path, "rb") as f:
+                                st.download_button(f"⬇️ Download {os.path.basename(export_path)}", data=f,
+                                                   file_name=os.path.basename(export_path))
                     
                     # --- Rendering ---
                     st.subheader("4. 🎨 Style & Render")
-                    selected_style = st.selectbox("Choose Caption Style", STYLES)
+                    selected_style = st.selectbox("Choose Caption Style", STYLES, key="selected_style")
                     
                     # Style Customization
                     # Style Customization
@@ -398,11 +968,7 @@ def main():
                              final_font_path = FONT_BOLD # Default
                              
                              if font_mode == "Presets":
-                                 font_map = {
-                                     "Roboto Bold": FONT_BOLD,
-                                     "Roboto Regular": FONT_MINIMAL,
-                                     "Anton Impact": FONT_IMPACT
-                                 }
+                                 font_map = PRESET_FONTS
                                  current_font_selection = st.selectbox(
                                      "Choose Preset", 
                                      list(font_map.keys()),
@@ -473,7 +1039,7 @@ def main():
                         # --- COLUMN 3: LIVE PREVIEW ---
                         with col_preview:
                              st.markdown("**Live Preview**")
-                             if st.session_state.local_video_path and st.session_state.subtitles:
+                             if st.session_state.local_video_path and edited_data:
                                   # Container to keep height stable?
                                   preview_container = st.container()
                                   try:
@@ -481,7 +1047,7 @@ def main():
                                       # We generate preview for the CURRENT config
                                       preview_frame = renderer.generate_preview_frame(
                                           st.session_state.local_video_path,
-                                          st.session_state.subtitles,
+                                          edited_data,
                                           selected_style,
                                           style_config
                                       )
@@ -519,6 +1085,8 @@ def main():
                                      st.session_state.cust_color = data.get("color", "#FFFF00")
                                      st.session_state.cust_stroke_color = data.get("stroke_color", "#000000")
                                      st.session_state.chk_karaoke = data.get("karaoke", False)
+                                     st.session_state.cust_letter_spacing = data.get("letter_spacing", 0)
+                                     st.session_state.cust_line_spacing = data.get("line_spacing", 0)
                                      if "inactive_color" in data:
                                           st.session_state.cust_inactive_color = data.get("inactive_color")
                                      
@@ -557,7 +1125,9 @@ def main():
                                         "color": cust_color,
                                         "inactive_color": cust_inactive_color,
                                         "stroke_color": cust_stroke_color,
-                                        "karaoke": chk_karaoke
+                                        "karaoke": chk_karaoke,
+                                        "letter_spacing": cust_letter_spacing,
+                                        "line_spacing": cust_line_spacing
                                     }
                                     presets_mgr.save_preset(new_preset_name, config_to_save)
                                     st.success(f"Saved: {new_preset_name}")
@@ -565,9 +1135,10 @@ def main():
                                 else:
                                     st.warning("Enter a name.")
 
+                    autosave_style()
+
                     output_filename = f"captioned_{st.session_state.selected_file['name']}"
                     output_path = os.path.join(OUTPUT_DIR, output_filename)
-                    is_rendered = os.path.exists(output_path)
                     
                     st.divider()
                     
@@ -577,19 +1148,42 @@ def main():
                     # --- ACTION AREA ---
                     
                     # STEP 1: ALWAYS SHOW BURN BUTTON
-                    if st.button("🔥 Burn Captions", type="primary", use_container_width=True):
-                         with st.spinner("Rendering video (MoviePy)..."):
-                             renderer = VideoRenderer()
-                             final_path = renderer.render_video(
+                    # Renders run on the shared job executor so the page stays editable meanwhile
+                    render_job = get_job_executor().get(st.session_state.get("render_job"))
+                    if render_job and not render_job.is_active:
+                        st.session_state.render_job = None
+                        if render_job.status == DONE:
+                            st.success(f"Rendering complete! Saved to {render_job.result}")
+                            enforce_quotas()
+                        else:
+                            st.error(f"Error during rendering: {render_job.error}")
+                        render_job = None
+                    # After collecting the job, so a render that just finished shows its actions
+                    is_rendered = os.path.exists(output_path) and render_job is None
+
+                    if st.button("🔥 Burn Captions", type="primary", use_container_width=True, disabled=render_job is not None):
+                         # Identical media + subtitles + style was rendered before: reuse it
+                         cache_key = render_cache_key(st.session_state.media_hash, edited_data, selected_style, style_config)
+                         cache_path = render_cache_path(cache_key, os.path.splitext(output_path)[1])
+                         if os.path.exists(cache_path):
+                             link_or_copy(cache_path, output_path)
+                             st.rerun()
+                         else:
+                             st.session_state.render_job = get_job_executor().submit(
+                                 "render", run_render_job,
                                  st.session_state.local_video_path,
-                                 edited_data,
+                                 edited_data.copy(),
                                  selected_style,
                                  output_path,
-                                 style_config=style_config
+                                 dict(style_config),
+                                 cache_path,
+                                 label=output_filename,
+                                 owner=get_session_id()
                              )
-                         st.success(f"Rendering complete! Saved to {output_path}")
-                         # Force re-check of file existence by updating state or just rerun
-                         st.rerun()
+                             st.rerun()
+
+                    if render_job:
+                        show_job_progress(render_job.id)
 
                     # STEP 2: POST-RENDER ACTIONS (If file exists)
                     if is_rendered:
@@ -619,8 +1213,7 @@ def main():
                             if st.button("📂 Move to Folder"):
                                 if local_dest and os.path.exists(local_dest):
                                     try:
-                                        dst = os.path.join(local_dest, output_filename)
-                                        shutil.copy2(output_path, dst)
+                                        export_file(output_path, local_dest)
                                         st.success(f"Saved to `{local_dest}`")
                                         if remember:
                                             st.session_state.saved_local_path = local_dest
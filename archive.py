@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from typing import Dict, List, Tuple
+from ingest import hash_file
+from settings import CACHE_DIR
+
+ARCHIVE_DIR = os.path.join(CACHE_DIR, "archives")
+
+# (path, size, mtime_ns) -> sha256, so unchanged outputs are hashed once per process
+_hash_cache: Dict[Tuple[str, int, int], str] = {}
+_build_lock = threading.Lock()
+
+
+def _cached_file_hash(path: str) -> str:
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _hash_cache:
+        _hash_cache[key] = hash_file(path)
+    return _hash_cache[key]
+
+
+def archive_manifest(paths: List[str]) -> List[Tuple[str, int, str]]:
+    """(archive name, size, sha256) for each file, sorted by name."""
+    manifest = []
+    for path in sorted(paths, key=os.path.basename):
+        manifest.append((os.path.basename(path), os.path.getsize(path), _cached_file_hash(path)))
+    return manifest
+
+
+def manifest_key(manifest: List[Tuple[str, int, str]]) -> str:
+    return hashlib.sha256(json.dumps(manifest).encode()).hexdigest()
+
+
+def build_batch_archive(paths: List[str], archive_dir: str = ARCHIVE_DIR) -> str:
+    """
+    Builds (or reuses) a ZIP of `paths` and returns its path.
+
+    Entries are STORED, not deflated: MP4s are already compressed, so deflate only burns CPU.
+    zipfile streams each file in chunks, so memory stays flat regardless of batch size.
+    The archive is named by a hash of the outputs' content, so reruns with the same
+    outputs return the existing file immediately.
+    """
+    manifest = archive_manifest(paths)
+    archive_path = os.path.join(archive_dir, f"{manifest_key(manifest)}.zip")
+
+    with _build_lock:
+        if os.path.exists(archive_path):
+            return archive_path
+
+        os.makedirs(archive_dir, exist_ok=True)
+        by_name = {os.path.basename(p): p for p in paths}
+        partial_path = archive_path + ".part"
+        with zipfile.ZipFile(partial_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for name, _, _ in manifest:
+                zf.write(by_name[name], arcname=name)
+        os.replace(partial_path, archive_path)
+
+    return archive_path
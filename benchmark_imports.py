@@ -0,0 +1,108 @@
+"""
+Import-time benchmark for cold starts.
+
+    python benchmark_imports.py             # app + modules, 5 fresh interpreters each
+    python benchmark_imports.py --top 15    # also list the slowest imports under app
+
+Each module is imported in a fresh interpreter (streamlit preloaded, as under
+`streamlit run`). Exits non-zero if app exceeds its budget or if importing it drags in
+a module that should only load once transcription or rendering runs.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+MODULES = ["app", "renderer", "styles", "font_catalog", "subtitle_track", "jobs", "utils", "captionme", "transcriber"]
+
+# Must not be imported just to show the landing page
+DEFERRED_MODULES = ["faster_whisper", "ctranslate2", "moviepy", "imageio", "imageio_ffmpeg", "IPython", "pandas", "googleapiclient"]
+
+APP_BUDGET_MS = 500
+
+PROBE = """
+import json, sys, time
+import streamlit
+t = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - t) * 1000
+print(json.dumps({{"ms": elapsed, "loaded": sorted(m for m in {deferred!r} if m in sys.modules)}}))
+"""
+
+
+def measure(module: str, runs: int) -> Tuple[float, List[str]]:
+    """Median import time (ms) over fresh interpreters, plus deferred modules it loaded."""
+    times = []
+    loaded: List[str] = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, deferred=DEFERRED_MODULES)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip()}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        times.append(result["ms"])
+        loaded = result["loaded"]
+    return statistics.median(times), loaded
+
+
+def slowest_imports(module: str, top: int) -> List[Tuple[int, str]]:
+    """Cumulative microseconds per import under `module`, from python -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import streamlit; import {module}"],
+        capture_output=True, text=True
+    )
+    rows: Dict[str, int] = {}
+    seen_streamlit = False
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if name == "streamlit":
+            # Everything before this line is streamlit's own startup
+            seen_streamlit = True
+            continue
+        if seen_streamlit:
+            rows[name] = int(cumulative_us)
+    return sorted(((us, name) for name, us in rows.items()), reverse=True)[:top]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure cold import times.")
+    parser.add_argument("modules", nargs="*", default=MODULES, help="Modules to measure.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module (median is reported).")
+    parser.add_argument("--budget-ms", type=float, default=APP_BUDGET_MS, help="Budget for importing app.")
+    parser.add_argument("--top", type=int, default=0, help="Show the N slowest imports under app.")
+    args = parser.parse_args(argv)
+
+    failed = False
+    print(f"{'module':<16}{'median ms':>12}  deferred modules loaded")
+    for module in args.modules:
+        try:
+            ms, loaded = measure(module, args.runs)
+        except RuntimeError as e:
+            print(f"{module:<16}{'error':>12}  {e}")
+            failed = True
+            continue
+        print(f"{module:<16}{ms:>12.1f}  {', '.join(loaded) or '-'}")
+        if module == "app":
+            if ms > args.budget_ms:
+                print(f"  app import exceeds budget ({ms:.0f} ms > {args.budget_ms:.0f} ms)")
+                failed = True
+            if loaded:
+                print(f"  app imports {', '.join(loaded)} at startup; import them where they are used")
+                failed = True
+
+    if args.top:
+        print("\nSlowest imports under app (cumulative ms):")
+        for us, name in slowest_imports("app", args.top):
+            print(f"{us / 1000:>10.1f}  {name}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
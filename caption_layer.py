@@ -0,0 +1,280 @@
+import hashlib
+import io
+import json
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import numpy as np
+from settings import CACHE_DIR, SPRITE_CACHE_MB
+
+LAYER_MAGIC = b"CMLAYER1"
+# Bump when the renderer's drawing changes, so stale layers are never reused
+LAYER_VERSION = 2
+COMPRESS_LEVEL = 1 # Sprites are mostly transparent; fast zlib already shrinks them ~10x
+
+Sprite = Union[np.ndarray, Callable[[], np.ndarray]]
+
+
+def layer_cache_path(subtitles, style: str, style_config: Optional[Dict[str, Any]], video_size: Tuple[int, int]) -> str:
+    """Cache location for the rasterized captions of a track + style at a video size (the video itself doesn't matter)."""
+    from styles import style_params
+    from subtitle_track import SubtitleTrack
+    track = subtitles if isinstance(subtitles, SubtitleTrack) else SubtitleTrack.from_segments(list(subtitles))
+    digest = hashlib.sha256()
+    digest.update(f"v{LAYER_VERSION}".encode())
+    digest.update(track.content_hash().encode())
+    digest.update(json.dumps(style_params(style, style_config), sort_keys=True, default=str).encode())
+    digest.update(json.dumps([int(v) for v in video_size]).encode())
+    return os.path.join(CACHE_DIR, "overlays", f"{digest.hexdigest()}.layer")
+
+
+class CaptionLayer:
+    """
+    Rasterized captions for one track + style + video size, independent of the video
+    they are burned into.
+
+    Sprites are RGBA arrays (or callables producing them on first use). A group places
+    a sprite on screen for [start, end). A karaoke group also has word states: while
+    a state's [start, end] covers t (first match wins) its sprite replaces the group's idle one.
+
+    Nothing is rasterized up front: clips draw (or read back) a sprite the first time it
+    becomes visible and keep at most `cache_mb` of them (as uint8 RGBA), least recently
+    shown first out, so memory stays flat however long the video is.
+
+    A layer can be recorded to a single .layer file while it is first used: sprites are
+    compressed and appended as they are produced, finish() adds the index. Loading that
+    file later gives the same clips without any PIL work, so re-encodes only decode,
+    overlay and encode. File layout: magic, zlib sprite blobs, npz index, index offset.
+    """
+
+    def __init__(self, video_size: Tuple[int, int], cache_mb: int = SPRITE_CACHE_MB):
+        self.video_size = (int(video_size[0]), int(video_size[1]))
+        self.cache_bytes = cache_mb * 1024 * 1024
+        self._frames: "OrderedDict[int, np.ndarray]" = OrderedDict() # sprite -> RGBA
+        self._frames_bytes = 0
+        self._sources: List[Optional[Sprite]] = []
+        self._shapes: List[Tuple[int, int]] = []
+        self._stored: Dict[int, Tuple[int, int]] = {} # sprite -> (offset, length) in the file
+        self.groups: List[Tuple[float, float, int, int, int]] = [] # start, end, x, y, idle sprite
+        self.states: List[Tuple[int, int, float, float]] = [] # group, sprite, start, end
+        self._fd: Optional[int] = None
+        self._end = 0 # write position while recording
+        self._path: Optional[str] = None
+        self._part: Optional[str] = None
+        self._lock = threading.Lock()
+
+    # --- Building ---
+
+    def add_sprite(self, sprite: Sprite, shape: Optional[Tuple[int, int]] = None) -> int:
+        """Adds an RGBA sprite, or a callable producing one (then `shape` = (h, w) is required)."""
+        if isinstance(sprite, np.ndarray):
+            shape = sprite.shape[:2]
+        self._sources.append(sprite)
+        self._shapes.append((int(shape[0]), int(shape[1])))
+        index = len(self._sources) - 1
+        if self.recording and isinstance(sprite, np.ndarray):
+            self._store(index, sprite)
+        return index
+
+    def place(self, sprite: int, start: float, end: float, y: Optional[float] = None, x: Optional[float] = None) -> int:
+        """
+        Shows sprite with its top left at (x, y), None = centered on that axis.
+        Coordinates are truncated exactly like MoviePy's ('center', y) positions.
+        """
+        h, w = self._shapes[sprite]
+        width, height = self.video_size
+        x = int((width - w) / 2) if x is None else int(x)
+        y = int((height - h) / 2) if y is None else int(y)
+        self.groups.append((float(start), float(end), x, y, sprite))
+        return len(self.groups) - 1
+
+    def add_state(self, group: int, sprite: int, start: float, end: float):
+        self.states.append((group, sprite, float(start), float(end)))
+
+    # --- Sprites ---
+
+    @property
+    def recording(self) -> bool:
+        return self._fd is not None and self._path is not None
+
+    def shape(self, sprite: int) -> Tuple[int, int]:
+        return self._shapes[sprite]
+
+    def sprite(self, index: int) -> np.ndarray:
+        """The RGBA array of a sprite (read from the layer file, or produced and recorded now)."""
+        source = self._sources[index]
+        if isinstance(source, np.ndarray):
+            return source
+        if index in self._stored:
+            return self._read(index)
+        rgba = source()
+        if self.recording:
+            self._store(index, rgba)
+        return rgba
+
+    def _store(self, index: int, rgba: np.ndarray):
+        blob = zlib.compress(np.ascontiguousarray(rgba, dtype=np.uint8).tobytes(), COMPRESS_LEVEL)
+        with self._lock:
+            if index in self._stored:
+                return
+            os.pwrite(self._fd, blob, self._end)
+            self._stored[index] = (self._end, len(blob))
+            self._end += len(blob)
+
+    def _read(self, index: int) -> np.ndarray:
+        offset, length = self._stored[index]
+        h, w = self._shapes[index]
+        data = zlib.decompress(os.pread(self._fd, length, offset))
+        return np.frombuffer(data, dtype=np.uint8).reshape(h, w, 4)
+
+    # --- Recording / loading ---
+
+    def record(self, path: str) -> "CaptionLayer":
+        """Starts writing this layer to path (visible there only after finish())."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique temp name: two jobs may record the same captions at once
+        self._fd, self._part = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix=".part")
+        self._path = path
+        os.pwrite(self._fd, LAYER_MAGIC, 0)
+        self._end = len(LAYER_MAGIC)
+        for index, source in enumerate(self._sources):
+            if isinstance(source, np.ndarray):
+                self._store(index, source)
+        return self
+
+    def finish(self):
+        """Stores any sprite not produced yet, writes the index and publishes the file."""
+        if not self.recording:
+            return
+        for index in range(len(self._sources)):
+            if index not in self._stored:
+                self._store(index, self.sprite(index))
+        n = len(self._sources)
+        offsets = np.array([self._stored[i][0] for i in range(n)], dtype=np.int64)
+        lengths = np.array([self._stored[i][1] for i in range(n)], dtype=np.int64)
+        index = io.BytesIO()
+        np.savez(
+            index,
+            video_size=np.array(self.video_size, dtype=np.int64),
+            sprite_offsets=offsets,
+            sprite_lengths=lengths,
+            sprite_shapes=np.array(self._shapes, dtype=np.int64).reshape(-1, 2),
+            groups=np.array(self.groups, dtype=np.float64).reshape(-1, 5),
+            states=np.array(self.states, dtype=np.float64).reshape(-1, 4),
+        )
+        os.pwrite(self._fd, index.getvalue() + struct.pack("<Q", self._end), self._end)
+        os.fsync(self._fd)
+        os.replace(self._part, self._path)
+        self._path = None # keep the descriptor for reads until close()
+
+    def discard(self):
+        """Abandons a recording (failed render)."""
+        if self.recording:
+            self._path = None
+            self.close()
+            try:
+                os.remove(self._part)
+            except OSError:
+                pass
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    @classmethod
+    def load(cls, path: str) -> Optional["CaptionLayer"]:
+        """Opens a finished layer file (sprites are read on use). None if missing or unreadable."""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            size = os.fstat(fd).st_size
+            if os.pread(fd, len(LAYER_MAGIC), 0) != LAYER_MAGIC:
+                raise ValueError("not a caption layer")
+            (index_offset,) = struct.unpack("<Q", os.pread(fd, 8, size - 8))
+            with np.load(io.BytesIO(os.pread(fd, size - 8 - index_offset, index_offset)), allow_pickle=False) as index:
+                layer = cls(tuple(index["video_size"]))
+                shapes = index["sprite_shapes"]
+                for i, (offset, length) in enumerate(zip(index["sprite_offsets"], index["sprite_lengths"])):
+                    layer._sources.append(None)
+                    layer._shapes.append((int(shapes[i, 0]), int(shapes[i, 1])))
+                    layer._stored[i] = (int(offset), int(length))
+                layer.groups = [(s, e, int(x), int(y), int(sp)) for s, e, x, y, sp in index["groups"].tolist()]
+                layer.states = [(int(g), int(sp), s, e) for g, sp, s, e in index["states"].tolist()]
+        except Exception as e:
+            os.close(fd)
+            print(f"Ignoring unreadable caption layer {path}: {e}")
+            return None
+        layer._fd = fd
+        return layer
+
+    # --- MoviePy clips ---
+
+    def frame(self, sprite: int, fetch: Callable[[], np.ndarray]) -> np.ndarray:
+        """RGBA of a sprite from the bounded cache, fetching it on a miss (the latest one stays even if over budget)."""
+        rgba = self._frames.get(sprite)
+        if rgba is not None:
+            self._frames.move_to_end(sprite)
+            return rgba
+        rgba = fetch()
+        self._frames[sprite] = rgba
+        self._frames_bytes += rgba.nbytes
+        while self._frames_bytes > self.cache_bytes and len(self._frames) > 1:
+            _, dropped = self._frames.popitem(last=False)
+            self._frames_bytes -= dropped.nbytes
+        return rgba
+
+    def clips(self, producer=None) -> List[Any]:
+        """
+        MoviePy clips for compositing, in drawing order: one lazy VideoClip per group. Sprites
+        are fetched through the producer (see overlay_producer.py) when one is given, which
+        then draws them ahead of the encoder in timeline order.
+        """
+        states_by_group: Dict[int, List[Tuple[int, float, float]]] = {}
+        for group, sprite, start, end in self.states:
+            states_by_group.setdefault(group, []).append((sprite, start, end))
+
+        return [self._group_clip(g, start, end, idle, states_by_group.get(g, []), producer).set_position((x, y))
+                for g, (start, end, x, y, idle) in enumerate(self.groups)]
+
+    def _group_clip(self, group: int, start: float, end: float, idle: int,
+                    states: List[Tuple[int, float, float]], producer) -> Any:
+        from moviepy.video.VideoClip import VideoClip
+        h, w = self._shapes[idle]
+
+        if producer is not None:
+            # Queue states in the order they first appear; the idle state shows up before
+            # the first word or, if the group opens on a word, in the first pause after it
+            idle_at = start if not states or states[0][1] > start else states[0][2]
+            first_seen = sorted([(s, i, sprite) for i, (sprite, s, _) in enumerate(states)] + [(idle_at, -1, idle)])
+            for _, _, sprite in first_seen:
+                producer.add((group, sprite), lambda sprite=sprite: self.sprite(sprite))
+
+        def active_sprite(t):
+            # t is time relative to clip start
+            current_abs_time = start + t
+            for sprite, s, e in states:
+                if s <= current_abs_time <= e:
+                    return sprite
+            return idle
+
+        def frame_at(t):
+            sprite = active_sprite(t)
+            if producer is not None:
+                return self.frame(sprite, lambda: producer.get((group, sprite), lambda: self.sprite(sprite)))
+            return self.frame(sprite, lambda: self.sprite(sprite))
+
+        # Sized from the sprite: passing make_frame to the constructor would draw t=0 just to measure it.
+        # RGB channels as drawn (transparent background is black); alpha becomes a 0-1 mask on read,
+        # so the cache holds 4 bytes per pixel rather than a float mask too
+        clip = VideoClip(duration=end - start)
+        clip.make_frame, clip.size = (lambda t: frame_at(t)[:, :, :3]), (w, h)
+        mask_clip = VideoClip(duration=end - start, ismask=True)
+        mask_clip.make_frame, mask_clip.size = (lambda t: frame_at(t)[:, :, 3] / 255.0), (w, h)
+        return clip.set_mask(mask_clip).set_start(start).set_end(end)
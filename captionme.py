@@ -0,0 +1,211 @@
+"""
+Headless batch runner.
+
+    python -m captionme videos/ --preset "My Custom Style" --workers 2
+    python -m captionme "shoots/*.mov" --style "Dynamic Pop" --output-dir /srv/captions
+    python -m captionme videos/ --export-captions srt vtt   # also write caption sidecars
+
+A caption file next to a video (clip.mp4 + clip.srt/.vtt/.ass/.json) is used instead of
+transcribing it, unless --ignore-captions is given.
+
+Progress is recorded in <output-dir>/.captionme_progress.json, so re-running the same
+command skips files that were already rendered.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional
+from settings import (
+    OUTPUT_DIR, STYLES, STYLE_BOLD_REEL, WHISPER_MODEL_SIZE, WHISPER_COMPUTE_TYPE, PRESETS_FILE
+)
+from subtitle_formats import FORMATS as CAPTION_FORMATS, find_sidecar
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv")
+PROGRESS_FILE = ".captionme_progress.json"
+
+# Per-process model registry (each pool worker loads its models once)
+_registry = None
+_cpu_threads = 0
+
+
+def collect_inputs(patterns: List[str]) -> List[str]:
+    """Expands folders and glob patterns into a sorted, de-duplicated list of video files."""
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, f) for f in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS):
+                found.append(os.path.abspath(path))
+    return sorted(set(found))
+
+
+def output_path_for(video_path: str, output_dir: str, disambiguate: bool = False) -> str:
+    """
+    Same naming as the app: captioned_<filename>. With disambiguate, a short hash of the
+    input path is added (captioned_<name>_<hash><ext>) for inputs sharing a file name.
+    """
+    name = os.path.basename(video_path)
+    if disambiguate:
+        stem, ext = os.path.splitext(name)
+        name = f"{stem}_{hashlib.sha256(video_path.encode()).hexdigest()[:8]}{ext}"
+    return os.path.join(output_dir, f"captioned_{name}")
+
+
+def output_paths(videos: List[str], output_dir: str) -> Dict[str, str]:
+    """Output path per input. Inputs with the same file name (e.g. from recursive globs) never share one."""
+    counts = Counter(os.path.basename(video) for video in videos)
+    return {video: output_path_for(video, output_dir, disambiguate=counts[os.path.basename(video)] > 1)
+            for video in videos}
+
+
+def load_progress(output_dir: str) -> Dict[str, Any]:
+    path = os.path.join(output_dir, PROGRESS_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: ignoring unreadable progress file {path}: {e}")
+        return {}
+
+
+def save_progress(output_dir: str, progress: Dict[str, Any]):
+    """Writes the progress file atomically so an interrupted run never corrupts it."""
+    path = os.path.join(output_dir, PROGRESS_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(progress, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def _init_worker(cpu_threads: int):
+    global _cpu_threads
+    _cpu_threads = cpu_threads
+
+
+def process_video(video_path: str, output_path: str, style: str, style_config: Optional[Dict[str, Any]],
+                  model_size: str, regroup_rules: Optional[Dict[str, Any]], captions_path: Optional[str] = None,
+                  export_formats: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Transcribes (or reads captions_path) and renders one file. Runs inside a pool worker."""
+    global _registry
+    from renderer import VideoRenderer
+    from subtitle_track import SubtitleTrack
+    from subtitle_formats import FORMATS, load_subtitles, write_subtitles
+
+    started = time.time()
+    if captions_path:
+        track = SubtitleTrack.from_segments(load_subtitles(captions_path))
+    else:
+        from model_registry import ModelRegistry
+        from regrouper import regroup_words
+        if _registry is None:
+            _registry = ModelRegistry(cpu_threads=_cpu_threads)
+        transcriber = _registry.get(model_size, WHISPER_COMPUTE_TYPE)
+        texts, times = transcriber.transcribe_words(video_path)
+        track = SubtitleTrack.from_words(texts, times, regroup_words(texts, times, **(regroup_rules or {})))
+
+    VideoRenderer().render_video(video_path, track, style, output_path, style_config=style_config, logger=None,
+                               threads=_cpu_threads or None)
+    for fmt in export_formats or []:
+        write_subtitles(track, os.path.splitext(output_path)[0] + FORMATS[fmt], fmt)
+
+    result = {"output": output_path, "segments": len(track), "seconds": round(time.time() - started, 1)}
+    if captions_path:
+        result["captions"] = captions_path
+    return result
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="captionme", description="Transcribe and burn captions into videos without the UI.")
+    parser.add_argument("inputs", nargs="+", help="Video files, folders or glob patterns")
+    parser.add_argument("--style", choices=STYLES, default=STYLE_BOLD_REEL, help="Base caption style")
+    parser.add_argument("--preset", help="Preset name from the presets file (font, colors, karaoke)")
+    parser.add_argument("--presets-file", default=PRESETS_FILE)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--model", default=WHISPER_MODEL_SIZE, help="Whisper model size")
+    parser.add_argument("--max-words", type=int, default=3, help="Max words per caption")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel worker processes (each loads its own model)")
+    parser.add_argument("--force", action="store_true", help="Re-render files already marked done")
+    parser.add_argument("--ignore-captions", action="store_true",
+                        help="Transcribe even when a caption file sits next to the video")
+    parser.add_argument("--export-captions", nargs="+", choices=list(CAPTION_FORMATS), default=[],
+                        metavar="FORMAT", help=f"Also write the captions as sidecar files ({', '.join(CAPTION_FORMATS)})")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    videos = collect_inputs(args.inputs)
+    if not videos:
+        print("No video files found.")
+        return 1
+
+    style_config = None
+    if args.preset:
+        from presets_manager import PresetsManager
+        style_config = PresetsManager(args.presets_file).build_style_config(args.preset)
+        if style_config is None:
+            print(f"Preset '{args.preset}' not found in {args.presets_file}.")
+            return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    progress = load_progress(args.output_dir)
+
+    pending = []
+    outputs = output_paths(videos, args.output_dir)
+    for video in videos:
+        out = outputs[video]
+        entry = progress.get(video, {})
+        if not args.force and entry.get("status") == "done" and os.path.exists(out):
+            print(f"Skipping (done): {video}")
+            continue
+        pending.append((video, out))
+
+    if not pending:
+        print("Nothing to do.")
+        return 0
+
+    workers = max(1, args.workers)
+    # Split the cores between workers so CTranslate2 threads don't oversubscribe
+    cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+    regroup_rules = {"max_words": args.max_words or None}
+    print(f"Processing {len(pending)} of {len(videos)} videos with {workers} worker(s)...")
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cpu_threads,)) as pool:
+        futures = {
+            pool.submit(
+                process_video, video, out, args.style, style_config, args.model, regroup_rules,
+                None if args.ignore_captions else find_sidecar(video), args.export_captions
+            ): video
+            for video, out in pending
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            video = futures[future]
+            try:
+                result = future.result()
+                progress[video] = {"status": "done", **result}
+                print(f"[{i}/{len(pending)}] Done: {video} -> {result['output']} ({result['seconds']}s)")
+            except Exception as e:
+                failed += 1
+                progress[video] = {"status": "failed", "error": str(e)}
+                print(f"[{i}/{len(pending)}] Failed: {video}: {e}")
+            save_progress(args.output_dir, progress)
+
+    print(f"Finished: {len(pending) - failed} rendered, {failed} failed.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
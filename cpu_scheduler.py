@@ -0,0 +1,124 @@
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional
+from settings import CPU_THREAD_BUDGET
+
+
+class CpuLease:
+    """Threads granted to one job. Release it (or use it as a context manager) when the job ends."""
+
+    def __init__(self, scheduler: "CpuScheduler", owner: str, threads: int):
+        self.scheduler = scheduler
+        self.owner = owner
+        self.threads = threads
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.scheduler._release(self)
+
+    def __enter__(self) -> "CpuLease":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _Waiter:
+    def __init__(self, owner: str, min_threads: int, max_threads: int, seq: int):
+        self.owner = owner
+        self.min_threads = min_threads
+        self.max_threads = max_threads
+        self.seq = seq
+        self.granted = 0
+
+
+class CpuScheduler:
+    """
+    Hands out CPU thread budgets to transcription and render jobs of this process so that
+    together they never use more than `total_threads` (libx264 and CTranslate2 each
+    default to every core, which oversubscribes the machine under mixed load).
+
+    Fair queueing: the next grant goes to the waiting job whose owner (session) currently
+    holds the fewest threads, oldest first among equals. The head of that order is never
+    bypassed, so large requests can't starve.
+    """
+
+    def __init__(self, total_threads: int = CPU_THREAD_BUDGET):
+        self.total_threads = max(1, total_threads)
+        self._in_use = 0
+        self._by_owner: Dict[str, int] = {}
+        self._waiting: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, owner: str, min_threads: int = 1, max_threads: Optional[int] = None,
+                on_wait: Optional[Callable[[], None]] = None) -> CpuLease:
+        """
+        Blocks until at least min_threads are free and it's this job's turn.
+        Grants up to max_threads (default: everything free). on_wait is called once if the job has to queue.
+        """
+        min_threads = max(1, min(min_threads, self.total_threads))
+        max_threads = max(min_threads, min(max_threads or self.total_threads, self.total_threads))
+        waiter = _Waiter(owner or "", min_threads, max_threads, next(self._seq))
+        with self._cond:
+            self._waiting.append(waiter)
+            self._dispatch()
+            if not waiter.granted and on_wait:
+                on_wait()
+            while not waiter.granted:
+                self._cond.wait()
+        return CpuLease(self, waiter.owner, waiter.granted)
+
+    def record(self, owner: str, threads: int) -> CpuLease:
+        """
+        Counts threads a job is already using (e.g. a transcription the shared server started)
+        without waiting: work under way must never be held up by a lease. The total may
+        exceed the budget until it's released; new grants wait meanwhile.
+        """
+        threads = max(1, min(threads, self.total_threads))
+        with self._cond:
+            self._in_use += threads
+            self._by_owner[owner or ""] = self._by_owner.get(owner or "", 0) + threads
+        return CpuLease(self, owner or "", threads)
+
+    def _dispatch(self):
+        """Grants threads to waiters in fair order while the head of the queue fits."""
+        while self._waiting:
+            head = min(self._waiting, key=lambda w: (self._by_owner.get(w.owner, 0), w.seq))
+            free = self.total_threads - self._in_use
+            if free < head.min_threads:
+                break
+            head.granted = min(head.max_threads, free)
+            self._in_use += head.granted
+            self._by_owner[head.owner] = self._by_owner.get(head.owner, 0) + head.granted
+            self._waiting.remove(head)
+        self._cond.notify_all()
+
+    def _release(self, lease: CpuLease):
+        with self._cond:
+            self._in_use -= lease.threads
+            remaining = self._by_owner.get(lease.owner, 0) - lease.threads
+            if remaining > 0:
+                self._by_owner[lease.owner] = remaining
+            else:
+                self._by_owner.pop(lease.owner, None)
+            self._dispatch()
+
+    def usage(self) -> Dict[str, int]:
+        with self._cond:
+            return {"total": self.total_threads, "in_use": self._in_use, "waiting": len(self._waiting)}
+
+
+_scheduler: Optional[CpuScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> CpuScheduler:
+    """Process-wide scheduler shared by every session's jobs."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = CpuScheduler()
+        return _scheduler
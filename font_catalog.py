@@ -0,0 +1,350 @@
+import json
+import os
+import struct
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from settings import FONTS_DIR, FALLBACK_FAMILIES
+
+CATALOG_PATH = os.path.join(FONTS_DIR, ".catalog.json")
+CATALOG_VERSION = 1
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+MAX_CODEPOINT = 0x110000
+
+SYSTEM_FONT_DIRS = [
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    os.path.expanduser("~/.fonts"),
+    os.path.expanduser("~/.local/share/fonts"),
+    "/Library/Fonts",
+    "/System/Library/Fonts",
+    os.path.expanduser("~/Library/Fonts"),
+    os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts"),
+]
+
+Ranges = List[Tuple[int, int]]
+
+
+# --- cmap parsing (no fontTools dependency) ---
+
+def _sfnt_tables(data: bytes) -> Dict[bytes, Tuple[int, int]]:
+    """Table tag -> (offset, length) of the first face (TTC collections use face 0)."""
+    base = 0
+    if data[:4] == b"ttcf":
+        base = struct.unpack(">I", data[12:16])[0]
+    num_tables = struct.unpack(">H", data[base + 4:base + 6])[0]
+    tables = {}
+    for i in range(num_tables):
+        rec = base + 12 + i * 16
+        tag, _, offset, length = struct.unpack(">4sIII", data[rec:rec + 16])
+        tables[tag] = (offset, length)
+    return tables
+
+
+def _cmap_format4(data: bytes, off: int) -> Ranges:
+    seg_count = struct.unpack(">H", data[off + 6:off + 8])[0] // 2
+    arr = lambda start: np.frombuffer(data, dtype=">u2", count=seg_count, offset=start).astype(np.int64)
+    ends = arr(off + 14)
+    starts = arr(off + 16 + seg_count * 2)
+    range_offsets_pos = off + 16 + seg_count * 6
+    range_offsets = arr(range_offsets_pos)
+
+    ranges = []
+    for i in range(seg_count):
+        start, end = int(starts[i]), int(ends[i])
+        if start == 0xFFFF or end < start:
+            continue
+        if range_offsets[i] == 0:
+            ranges.append((start, end))
+            continue
+        # Glyph ids come from glyphIdArray; drop chars that map to glyph 0 (.notdef)
+        codes = np.arange(start, end + 1)
+        pos = range_offsets_pos + i * 2 + int(range_offsets[i]) + (codes - start) * 2
+        pos = pos[pos + 2 <= len(data)]
+        glyphs = np.array([struct.unpack(">H", data[p:p + 2])[0] for p in pos], dtype=np.int64)
+        covered = codes[:len(glyphs)][glyphs != 0]
+        ranges.extend(_to_ranges(covered))
+    return ranges
+
+
+def _cmap_format12(data: bytes, off: int) -> Ranges:
+    n_groups = struct.unpack(">I", data[off + 12:off + 16])[0]
+    groups = np.frombuffer(data, dtype=">u4", count=n_groups * 3, offset=off + 16).reshape(-1, 3)
+    return [(int(a), int(b)) for a, b, _ in groups]
+
+
+def _to_ranges(codes: np.ndarray) -> Ranges:
+    if not len(codes):
+        return []
+    breaks = np.flatnonzero(np.diff(codes) != 1)
+    starts = np.concatenate(([codes[0]], codes[breaks + 1]))
+    ends = np.concatenate((codes[breaks], [codes[-1]]))
+    return [(int(a), int(b)) for a, b in zip(starts, ends)]
+
+
+def read_coverage(path: str) -> Tuple[Ranges, bool]:
+    """Returns (codepoint ranges, scalable) for a font file. scalable is False for bitmap-only fonts."""
+    with open(path, "rb") as f:
+        data = f.read()
+    tables = _sfnt_tables(data)
+    scalable = b"glyf" in tables or b"CFF " in tables or b"CFF2" in tables
+    if b"cmap" not in tables:
+        return [], scalable
+    cmap_off = tables[b"cmap"][0]
+    num = struct.unpack(">H", data[cmap_off + 2:cmap_off + 4])[0]
+    subtables = {}
+    for i in range(num):
+        rec = cmap_off + 4 + i * 8
+        platform, encoding, offset = struct.unpack(">HHI", data[rec:rec + 8])
+        sub_off = cmap_off + offset
+        fmt = struct.unpack(">H", data[sub_off:sub_off + 2])[0]
+        subtables[(platform, encoding, fmt)] = sub_off
+    # Prefer full-Unicode (format 12) tables, then BMP (format 4)
+    for key in [(3, 10, 12), (0, 4, 12), (0, 6, 12), (0, 3, 12)]:
+        if key in subtables:
+            return _cmap_format12(data, subtables[key]), scalable
+    for key in [(3, 1, 4), (0, 3, 4), (0, 1, 4), (0, 0, 4), (3, 0, 4)]:
+        if key in subtables:
+            return _cmap_format4(data, subtables[key]), scalable
+    return [], scalable
+
+
+def ranges_to_bitset(ranges: Ranges) -> np.ndarray:
+    """Packed coverage bitset over all Unicode codepoints (~136 KB)."""
+    bits = np.zeros(MAX_CODEPOINT, dtype=bool)
+    for start, end in ranges:
+        bits[start:min(end, MAX_CODEPOINT - 1) + 1] = True
+    return np.packbits(bits)
+
+
+def covers(bitset: np.ndarray, codepoints: np.ndarray) -> np.ndarray:
+    """Vectorized bit test: which codepoints are in the packed bitset."""
+    codepoints = np.minimum(codepoints, MAX_CODEPOINT - 1)
+    return ((bitset[codepoints >> 3] >> (7 - (codepoints & 7))) & 1).astype(bool)
+
+
+def _codepoints(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("utf-32-le"), dtype="<u4").astype(np.int64)
+
+
+class FontCatalog:
+    """
+    Index of installed fonts (FONTS_DIR + system font dirs) with family, style and
+    cmap coverage, persisted to fonts/.catalog.json so scans only parse new/changed files.
+
+    fallback_chain(primary) gives the fonts to try, in order, for characters the primary
+    font lacks; split_runs(text, primary) cuts a string into runs per font.
+    Coverage is tested against precomputed bitsets, so no font file is opened while drawing.
+    """
+
+    def __init__(self, dirs: Optional[List[str]] = None, index_path: str = CATALOG_PATH):
+        self.dirs = dirs if dirs is not None else [FONTS_DIR] + SYSTEM_FONT_DIRS
+        self.index_path = index_path
+        self.fonts: Dict[str, Dict] = {}
+        self._bitsets: Dict[str, np.ndarray] = {}
+        self._chains: Dict[str, List[str]] = {}
+        self._char_cache: Dict[Tuple[str, int], Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    # --- Index ---
+
+    def load(self) -> "FontCatalog":
+        """Loads the persisted index and rescans the font dirs (parsing only new/changed files)."""
+        cached = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r") as f:
+                    index = json.load(f)
+                if index.get("version") == CATALOG_VERSION:
+                    cached = {entry["path"]: entry for entry in index["fonts"]}
+            except Exception as e:
+                print(f"Ignoring unreadable font catalog: {e}")
+
+        fonts = {}
+        changed = False
+        for path in self._scan():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = cached.get(path)
+            if not entry or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+                entry = self._index_font(path, stat)
+                changed = True
+            if entry:
+                fonts[path] = entry
+        if changed or len(fonts) != len(cached):
+            self._save(fonts)
+
+        with self._lock:
+            self.fonts = fonts
+            self._bitsets.clear()
+            self._chains.clear()
+            self._char_cache.clear()
+        return self
+
+    def _scan(self) -> List[str]:
+        paths = []
+        for root in self.dirs:
+            if not os.path.isdir(root):
+                continue
+            for dirpath, _, filenames in os.walk(root):
+                for name in filenames:
+                    if name.lower().endswith(FONT_EXTENSIONS):
+                        paths.append(os.path.abspath(os.path.join(dirpath, name)))
+        return sorted(set(paths))
+
+    def _index_font(self, path: str, stat) -> Optional[Dict]:
+        try:
+            ranges, scalable = read_coverage(path)
+        except Exception as e:
+            print(f"Font catalog: skipping {path}: {e}")
+            return None
+        family, style = os.path.splitext(os.path.basename(path))[0], ""
+        try:
+            from PIL import ImageFont
+            family, style = ImageFont.truetype(path, 12).getname()
+        except Exception:
+            pass
+        return {
+            "path": path,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "family": family,
+            "style": style,
+            "scalable": scalable,
+            "glyphs": int(sum(b - a + 1 for a, b in ranges)),
+            "ranges": ranges,
+        }
+
+    def _save(self, fonts: Dict[str, Dict]):
+        try:
+            partial_path = self.index_path + ".part"
+            with open(partial_path, "w") as f:
+                json.dump({"version": CATALOG_VERSION, "fonts": list(fonts.values())}, f)
+            os.replace(partial_path, self.index_path)
+        except OSError as e:
+            print(f"Could not persist font catalog: {e}")
+
+    # --- Lookup ---
+
+    def bitset(self, path: str) -> Optional[np.ndarray]:
+        with self._lock:
+            if path not in self._bitsets:
+                entry = self.fonts.get(path)
+                if entry is None:
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        return None
+                    entry = self._index_font(path, stat)
+                    if entry is None:
+                        return None
+                    self.fonts[path] = entry
+                self._bitsets[path] = ranges_to_bitset(entry["ranges"])
+            return self._bitsets[path]
+
+    def fallback_chain(self, primary: str) -> List[str]:
+        """primary, then FALLBACK_FAMILIES in order, then remaining scalable fonts by coverage."""
+        primary = os.path.abspath(primary)
+        with self._lock:
+            if primary in self._chains:
+                return self._chains[primary]
+            primary_entry = self.fonts.get(primary, {})
+            candidates = [e for e in self.fonts.values() if e["scalable"] and e["path"] != primary]
+
+            def rank(entry):
+                family = entry["family"]
+                preferred = FALLBACK_FAMILIES.index(family) if family in FALLBACK_FAMILIES else len(FALLBACK_FAMILIES)
+                # Same style as the primary first (Bold stays bold), then broadest coverage
+                return (preferred, entry["style"] != primary_entry.get("style"), -entry["glyphs"], entry["path"])
+
+            chain = [primary] + [e["path"] for e in sorted(candidates, key=rank)]
+            self._chains[primary] = chain
+            return chain
+
+    def font_for_char(self, char: str, primary: str) -> Optional[str]:
+        """First font in primary's fallback chain that has a glyph for char (None if nothing does)."""
+        key = (primary, ord(char))
+        if key in self._char_cache:
+            return self._char_cache[key]
+        cp = np.array([ord(char)], dtype=np.int64)
+        found = None
+        for path in self.fallback_chain(primary):
+            bits = self.bitset(path)
+            if bits is not None and covers(bits, cp)[0]:
+                found = path
+                break
+        self._char_cache[key] = found
+        return found
+
+    def split_runs(self, text: str, primary: str) -> List[Tuple[str, str]]:
+        """
+        Splits text into (substring, font path) runs. Characters no font covers (and
+        whitespace/control chars) stay with the primary font.
+        """
+        primary = os.path.abspath(primary)
+        bits = self.bitset(primary)
+        if bits is None or not text:
+            return [(text, primary)]
+        cps = _codepoints(text)
+        missing = ~covers(bits, cps) & (cps > 0x20)
+        if not missing.any():
+            return [(text, primary)]
+
+        runs: List[Tuple[str, str]] = []
+        for char, is_missing in zip(text, missing):
+            path = (self.font_for_char(char, primary) or primary) if is_missing else primary
+            if runs and runs[-1][1] == path:
+                runs[-1] = (runs[-1][0] + char, path)
+            else:
+                runs.append((char, path))
+        return runs
+
+
+_catalog: Optional[FontCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> FontCatalog:
+    """Process-wide catalog, scanned once on first use."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = FontCatalog().load()
+        return _catalog
+
+
+def warm_catalog():
+    """Scans the catalog in a daemon thread, so the first render (not page load) is what may wait on it."""
+    threading.Thread(target=get_catalog, name="font-catalog", daemon=True).start()
+
+
+# --- PIL helpers used by the renderer ---
+
+@lru_cache(maxsize=4096)
+def _font_runs(text: str, path: str, size: int) -> Tuple[Tuple[str, Optional[str]], ...]:
+    primary = os.path.abspath(path)
+    return tuple((seg, None if p == primary else p) for seg, p in get_catalog().split_runs(text, primary))
+
+
+def font_runs(text: str, font) -> List[Tuple[str, object]]:
+    """
+    Splits text into (substring, PIL font) runs: the given font wherever it has the glyphs,
+    fallback fonts at the same size elsewhere. Memoized per (text, font), so per-frame
+    redraws of the same caption never touch the catalog again.
+    """
+    path = getattr(font, "path", None)
+    if not text or not isinstance(path, str):
+        return [(text, font)]
+    runs = _font_runs(text, path, font.size)
+    if len(runs) == 1 and runs[0][1] is None:
+        return [(text, font)]
+    from fonts import load_font
+    return [(seg, font if p is None else load_font(p, font.size)) for seg, p in runs]
+
+
+def text_length(draw, text: str, font) -> float:
+    """draw.textlength over the font runs of text."""
+    return sum(draw.textlength(seg, font=f) for seg, f in font_runs(text, font))
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+from settings import FONTS_DIR, FONT_BOLD, FONT_MINIMAL, FONT_IMPACT
+
+# Base fonts the styles rely on (Raw GitHub URLs for Google Fonts)
+BASE_FONTS = {
+    "Anton-Regular.ttf": "https://github.com/google/fonts/raw/main/ofl/anton/Anton-Regular.ttf",
+    "Roboto-Regular.ttf": "https://github.com/google/fonts/raw/main/apache/roboto/Roboto-Regular.ttf",
+    "Roboto-Bold.ttf": "https://github.com/google/fonts/raw/main/apache/roboto/Roboto-Bold.ttf"
+}
+
+MANIFEST_PATH = os.path.join(FONTS_DIR, ".manifest.json")
+
+# Tried in order when a requested font file is missing (bundled first, then common system fonts)
+FALLBACK_FONTS = [
+    FONT_BOLD,
+    FONT_MINIMAL,
+    FONT_IMPACT,
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "/Library/Fonts/Arial.ttf",
+]
+
+FONT_HEADERS = (b'\x00\x01\x00\x00', b'OTTO', b'true', b'typ1')
+
+_manifest_lock = threading.Lock()
+
+
+def load_manifest() -> Dict[str, Dict[str, object]]:
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    try:
+        with open(MANIFEST_PATH, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_manifest(manifest: Dict[str, Dict[str, object]]):
+    partial_path = MANIFEST_PATH + ".part"
+    with open(partial_path, "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(partial_path, MANIFEST_PATH)
+
+
+def verify_font_file(path: str) -> Optional[str]:
+    """Returns the file's sha256 if it looks like a real font (size + magic bytes), else None."""
+    try:
+        if os.path.getsize(path) < 1000:
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if data[:4] not in FONT_HEADERS:
+        return None
+    return hashlib.sha256(data).hexdigest()
+
+
+def record_font(path: str) -> bool:
+    """Verifies a font file and adds it to the manifest. Returns False if it's not a valid font."""
+    sha = verify_font_file(path)
+    if sha is None:
+        return False
+    with _manifest_lock:
+        manifest = load_manifest()
+        manifest[os.path.basename(path)] = {"sha256": sha, "size": os.path.getsize(path)}
+        save_manifest(manifest)
+    return True
+
+
+def _is_verified(filename: str, manifest: Dict[str, Dict[str, object]]) -> bool:
+    """Cheap check: manifest entry exists and the size still matches (no re-hashing)."""
+    entry = manifest.get(filename)
+    path = os.path.join(FONTS_DIR, filename)
+    return bool(entry) and os.path.exists(path) and os.path.getsize(path) == entry.get("size")
+
+
+def _download_missing(missing: Dict[str, str], downloaded: list):
+    """Downloads fonts, appending each one that arrived to `downloaded`."""
+    from utils import download_file
+    for filename, url in missing.items():
+        path = os.path.join(FONTS_DIR, filename)
+        print(f"Downloading font: {filename}...")
+        if download_file(url, path) and record_font(path):
+            downloaded.append(filename)
+
+
+def bootstrap_fonts(background: bool = True) -> Dict[str, list]:
+    """
+    One-time font check (call once per process, e.g. through st.cache_resource).
+
+    Fonts already in the manifest are trusted after a size check. Unknown files are hashed
+    and recorded; corrupt ones are removed. Missing fonts are downloaded in a daemon thread
+    (or inline with background=False). Until they arrive, resolve_font_path falls back to
+    whatever bundled/system font exists. status["downloaded"] lists the missing fonts that
+    actually arrived (filled in by the thread when downloading in the background).
+    """
+    os.makedirs(FONTS_DIR, exist_ok=True)
+    manifest = load_manifest()
+    status = {"verified": [], "missing": [], "downloaded": []}
+    missing = {}
+    for filename, url in BASE_FONTS.items():
+        path = os.path.join(FONTS_DIR, filename)
+        if _is_verified(filename, manifest):
+            status["verified"].append(filename)
+            continue
+        if os.path.exists(path):
+            if record_font(path):
+                status["verified"].append(filename)
+                continue
+            print(f"Found corrupt font {filename}. Deleting...")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        missing[filename] = url
+        status["missing"].append(filename)
+
+    if missing:
+        if background:
+            threading.Thread(target=_download_missing, args=(missing, status["downloaded"]),
+                             name="font-bootstrap", daemon=True).start()
+        else:
+            _download_missing(missing, status["downloaded"])
+    return status
+
+
+def resolve_font_path(font_path: Optional[str]) -> Optional[str]:
+    """Returns font_path if it exists, otherwise the first available fallback font (or None)."""
+    if font_path and os.path.exists(font_path):
+        return font_path
+    for candidate in FALLBACK_FONTS:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+_thread_fonts = threading.local()
+
+
+def use_thread_fonts():
+    """
+    Makes load_font return fonts private to the calling thread. FreeType faces must not
+    be drawn with from several threads at once (see overlay_producer.py).
+    """
+    _thread_fonts.cache = {}
+
+
+def load_font(font_path: Optional[str], fontsize: int):
+    """Loads a FreeType font (cached per resolved path/size), falling back cleanly when it's missing."""
+    key = (resolve_font_path(font_path), int(fontsize))
+    cache = getattr(_thread_fonts, "cache", None)
+    if cache is None:
+        return _load_resolved_font(*key)
+    if key not in cache:
+        cache[key] = _load_resolved_font.__wrapped__(*key)
+    return cache[key]
+
+
+@lru_cache(maxsize=64)
+def _load_resolved_font(resolved: Optional[str], fontsize: int):
+    from PIL import ImageFont
+    if resolved:
+        try:
+            return ImageFont.truetype(resolved, fontsize)
+        except Exception:
+            pass
+    try:
+        return ImageFont.load_default(size=fontsize)
+    except Exception:
+        return ImageFont.load_default()
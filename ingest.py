@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from settings import TEMP_DIR, CACHE_DIR
+
+CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+
+
+def hash_buffer(buffer) -> str:
+    """SHA-256 of an in-memory upload, hashed through a memoryview (no copy)."""
+    view = memoryview(buffer)
+    digest = hashlib.sha256()
+    for i in range(0, len(view), CHUNK_SIZE):
+        digest.update(view[i:i + CHUNK_SIZE])
+    return digest.hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file on disk, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_path(media_hash: str, filename: str, dest_dir: str = TEMP_DIR) -> str:
+    """Content-addressed location for an upload: <dest_dir>/<sha>.<ext>."""
+    ext = os.path.splitext(filename)[1].lower()
+    return os.path.join(dest_dir, f"{media_hash}{ext}")
+
+
+def write_buffer(buffer, path: str) -> bool:
+    """
+    Streams an in-memory buffer to `path` in chunks (via a .part file).
+    Returns False without writing when the file is already present.
+    """
+    if os.path.exists(path):
+        return False
+    view = memoryview(buffer)
+    partial_path = path + ".part"
+    with open(partial_path, "wb") as f:
+        for i in range(0, len(view), CHUNK_SIZE):
+            f.write(view[i:i + CHUNK_SIZE])
+    os.replace(partial_path, path)
+    return True
+
+
+def ingest_upload(uploaded_file, dest_dir: str = TEMP_DIR) -> Tuple[str, str]:
+    """
+    Stores a Streamlit UploadedFile content-addressed. Re-uploads of the same bytes
+    (under any name) cost no extra disk write. Returns (sha256, path).
+    """
+    buffer = uploaded_file.getbuffer()
+    media_hash = hash_buffer(buffer)
+    path = content_path(media_hash, uploaded_file.name, dest_dir)
+    write_buffer(buffer, path)
+    return media_hash, path
+
+
+# --- Transcription cache (keyed by media hash + model) ---
+
+def _transcript_path(media_hash: str, model_size: str) -> str:
+    return os.path.join(CACHE_DIR, "transcripts", f"{media_hash}.{model_size}.npz")
+
+
+def load_cached_words(media_hash: Optional[str], model_size: str) -> Optional[Tuple[List[str], np.ndarray]]:
+    """Returns cached (texts, times) for this media and model, or None."""
+    if not media_hash:
+        return None
+    path = _transcript_path(media_hash, model_size)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return [str(t) for t in data["texts"]], data["times"]
+    except Exception as e:
+        print(f"Ignoring unreadable transcript cache {path}: {e}")
+        return None
+
+
+def save_cached_words(media_hash: Optional[str], model_size: str, words: Tuple[List[str], np.ndarray]):
+    if not media_hash:
+        return
+    texts, times = words
+    path = _transcript_path(media_hash, model_size)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = path + ".part.npz"
+    np.savez(partial_path, texts=np.array(texts, dtype=str), times=times)
+    os.replace(partial_path, path)
+
+
+# --- Render cache (keyed by media hash + subtitles + style) ---
+
+def render_cache_key(media_hash: str, track, style: str, style_config: Optional[Dict[str, Any]]) -> str:
+    digest = hashlib.sha256()
+    digest.update(media_hash.encode())
+    digest.update(track.content_hash().encode())
+    digest.update(style.encode())
+    digest.update(json.dumps(style_config or {}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def render_cache_path(key: str, ext: str = ".mp4") -> str:
+    return os.path.join(CACHE_DIR, "renders", f"{key}{ext}")
+
+
+def link_or_copy(src: str, dst: str):
+    """Hardlinks src to dst (replacing dst), falling back to a copy across filesystems."""
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    partial_path = dst + ".part"
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+    try:
+        os.link(src, partial_path)
+    except OSError:
+        shutil.copy2(src, partial_path)
+    os.replace(partial_path, dst)
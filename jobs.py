@@ -0,0 +1,122 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from proglog import ProgressBarLogger
+from settings import MAX_CONCURRENT_JOBS, JOB_RETENTION_SECONDS
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    """A unit of background work (transcription or render) and its observable progress."""
+
+    def __init__(self, kind: str, label: str = "", owner: str = ""):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.label = label
+        # Session that submitted the job (CPU is shared fairly between owners)
+        self.owner = owner
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Filled by the job function (e.g. frame, total, fps for renders)
+        self.progress: Dict[str, Any] = {}
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def fraction(self) -> float:
+        total = self.progress.get("total") or 0
+        if self.status == DONE:
+            return 1.0
+        if not total:
+            return 0.0
+        return min(1.0, self.progress.get("frame", 0) / total)
+
+
+class RenderProgressLogger(ProgressBarLogger):
+    """
+    MoviePy (proglog) logger that publishes frame count and encoding fps into a Job.
+    Pass it as write_videofile(logger=...).
+    """
+
+    def __init__(self, job: Job):
+        super().__init__()
+        self.job = job
+        self._bar_started = None
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        # MoviePy iterates frames on the "t" bar (the audio pass uses "chunk")
+        if bar != "t":
+            return
+        if attr == "total":
+            self.job.progress["total"] = value
+            self._bar_started = time.time()
+        elif attr == "index":
+            elapsed = time.time() - (self._bar_started or time.time())
+            self.job.progress["frame"] = value + 1
+            self.job.progress["fps"] = round((value + 1) / elapsed, 1) if elapsed > 0 else 0.0
+
+
+class JobExecutor:
+    """
+    Process-wide executor shared by every Streamlit session (create it via st.cache_resource).
+    Sessions keep only job ids; at most `max_workers` jobs run at once, the rest queue.
+    """
+
+    def __init__(self, max_workers: int = MAX_CONCURRENT_JOBS, retention_seconds: int = JOB_RETENTION_SECONDS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="captionme-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        self.retention_seconds = retention_seconds
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, label: str = "", owner: str = "", **kwargs) -> str:
+        """Runs fn(job, *args, **kwargs) in the pool. Returns the job id."""
+        job = Job(kind, label, owner)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        if not job_id:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_jobs(self) -> List[Job]:
+        with self._lock:
+            return [j for j in self._jobs.values() if j.is_active]
+
+    def _run(self, job: Job, fn, args, kwargs):
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = DONE
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+
+    def _prune(self):
+        """Forgets finished jobs older than the retention window."""
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished < cutoff]:
+            del self._jobs[job_id]
@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from settings import (
+    WHISPER_MODEL_SIZE, WHISPER_DEVICE, WHISPER_COMPUTE_TYPE,
+    WHISPER_CPU_THREADS, WHISPER_NUM_WORKERS, MODEL_MEMORY_BUDGET_MB
+)
+
+# Approximate resident size (MB) of each model with int8 weights.
+# float16/float32 roughly double/quadruple this.
+MODEL_SIZE_MB = {
+    "tiny": 75,
+    "base": 150,
+    "small": 500,
+    "medium": 1500,
+    "large-v2": 3000,
+    "large-v3": 3000,
+}
+
+COMPUTE_TYPE_FACTOR = {
+    "int8": 1.0,
+    "int8_float16": 1.0,
+    "float16": 2.0,
+    "float32": 4.0,
+}
+
+
+def estimate_model_mb(model_size: str, compute_type: str) -> int:
+    """Rough memory estimate used for the registry budget."""
+    base = MODEL_SIZE_MB.get(model_size, MODEL_SIZE_MB["medium"])
+    return int(base * COMPUTE_TYPE_FACTOR.get(compute_type, 1.0))
+
+
+class ModelRegistry:
+    """
+    Holds several loaded Transcribers keyed by (model_size, compute_type).
+    Models are evicted least-recently-used first once the memory budget is exceeded.
+    Loading happens once per key; concurrent callers wait on the same load.
+    """
+
+    def __init__(self, memory_budget_mb: int = MODEL_MEMORY_BUDGET_MB, device: str = WHISPER_DEVICE,
+                 cpu_threads: int = WHISPER_CPU_THREADS, num_workers: int = WHISPER_NUM_WORKERS):
+        self.memory_budget_mb = memory_budget_mb
+        self.device = device
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self._models: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+        self._loading: Dict[Tuple[str, str], threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_size: str = WHISPER_MODEL_SIZE, compute_type: str = WHISPER_COMPUTE_TYPE):
+        """Returns a loaded Transcriber, loading (and evicting) if needed."""
+        key = (model_size, compute_type)
+        while True:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key]
+                pending = self._loading.get(key)
+                if pending is None:
+                    pending = threading.Event()
+                    self._loading[key] = pending
+                    break
+            # Someone else is loading this model, wait and re-check
+            pending.wait()
+
+        try:
+            from transcriber import Transcriber
+            transcriber = Transcriber(
+                model_size=model_size, device=self.device, compute_type=compute_type,
+                cpu_threads=self.cpu_threads, num_workers=self.num_workers
+            )
+            with self._lock:
+                self._models[key] = transcriber
+                self._evict(keep=key)
+            return transcriber
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            pending.set()
+
+    def warm_async(self, model_size: str = WHISPER_MODEL_SIZE, compute_type: str = WHISPER_COMPUTE_TYPE) -> threading.Thread:
+        """Starts loading a model in a background thread so the first job doesn't block on it."""
+        def _warm():
+            try:
+                self.get(model_size, compute_type)
+            except Exception as e:
+                print(f"Model warm-up failed for {model_size}/{compute_type}: {e}")
+
+        thread = threading.Thread(target=_warm, name=f"warm-{model_size}", daemon=True)
+        thread.start()
+        return thread
+
+    def is_loaded(self, model_size: str, compute_type: str = WHISPER_COMPUTE_TYPE) -> bool:
+        with self._lock:
+            return (model_size, compute_type) in self._models
+
+    def loaded_keys(self):
+        """Loaded (model_size, compute_type) keys, least recently used first."""
+        with self._lock:
+            return list(self._models.keys())
+
+    def used_mb(self) -> int:
+        with self._lock:
+            return self._used_mb()
+
+    def evict(self, model_size: str, compute_type: str = WHISPER_COMPUTE_TYPE) -> bool:
+        with self._lock:
+            return self._models.pop((model_size, compute_type), None) is not None
+
+    def _used_mb(self) -> int:
+        return sum(estimate_model_mb(size, ctype) for size, ctype in self._models)
+
+    def _evict(self, keep: Optional[Tuple[str, str]] = None):
+        """Drops least recently used models until within budget. Never drops `keep`."""
+        while self._used_mb() > self.memory_budget_mb:
+            victim = next((k for k in self._models if k != keep), None)
+            if victim is None:
+                break
+            print(f"Evicting Whisper model {victim[0]}/{victim[1]} (memory budget {self.memory_budget_mb} MB)")
+            del self._models[victim]
@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+from settings import OVERLAY_WORKERS, OVERLAY_BUFFER_FRAMES
+from fonts import use_thread_fonts
+
+Rasterize = Callable[[], Any]
+
+
+class OverlayProducer:
+    """
+    Rasterizes overlay frames ahead of the encoder in a thread pool.
+
+    Clips register their frames with add() in timeline order while the render is being
+    assembled. Workers then produce them into a bounded ring buffer (at most `buffer_size`
+    pending or finished frames) that the encoding thread drains in order through get().
+    A key the producer hasn't reached (seeks, previews, overlapping clips) is rasterized
+    on the calling thread, so results never depend on the pool.
+
+    Worker threads load their own fonts (fonts.use_thread_fonts): the rasterize callables
+    must fetch fonts through fonts.load_font rather than capture shared font objects.
+    """
+
+    def __init__(self, workers: int = OVERLAY_WORKERS, buffer_size: int = OVERLAY_BUFFER_FRAMES):
+        self.workers = max(1, workers)
+        self.buffer_size = max(1, buffer_size)
+        self._schedule: List[Tuple[Hashable, Rasterize]] = []
+        self._next = 0
+        self._buffer: "OrderedDict[Hashable, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, key: Hashable, rasterize: Rasterize):
+        self._schedule.append((key, rasterize))
+
+    def start(self) -> "OverlayProducer":
+        if self._schedule and self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="overlay", initializer=use_thread_fonts)
+            with self._lock:
+                self._fill()
+        return self
+
+    def _fill(self):
+        while self._pool and len(self._buffer) < self.buffer_size and self._next < len(self._schedule):
+            key, rasterize = self._schedule[self._next]
+            self._next += 1
+            self._buffer[key] = self._pool.submit(rasterize)
+
+    def get(self, key: Hashable, rasterize: Rasterize) -> Any:
+        """The frame for key, from the buffer if it was produced ahead, otherwise rasterized now."""
+        with self._lock:
+            future = None
+            if key in self._buffer:
+                # The encoder has moved past everything queued before this key
+                while True:
+                    queued_key, future = self._buffer.popitem(last=False)
+                    if queued_key == key:
+                        break
+                    future.cancel()
+                self.hits += 1
+                self._fill()
+            else:
+                self.misses += 1
+        return future.result() if future is not None else rasterize()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        self._buffer.clear()
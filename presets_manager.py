@@ -1,9 +1,10 @@
 import json
 import os
 import streamlit as st
+from settings import PRESETS_FILE, PRESET_FONTS, FONT_BOLD
 
 class PresetsManager:
-    def __init__(self, filepath="presets.json"):
+    def __init__(self, filepath=PRESETS_FILE):
         self.filepath = filepath
         self.presets = self._load_presets_from_disk()
 
@@ -44,3 +45,31 @@ class PresetsManager:
         if name in self.presets:
             del self.presets[name]
             self.save_to_disk()
+
+    def build_style_config(self, name):
+        """
+        Turns a saved preset into the style_config dict expected by VideoRenderer.
+        Google fonts are fetched on demand. Returns None if the preset doesn't exist.
+        """
+        data = self.get_preset(name)
+        if data is None:
+            return None
+
+        font_path = FONT_BOLD
+        if data.get("font_mode", "Presets") == "Presets":
+            font_path = PRESET_FONTS.get(data.get("font_selection"), FONT_BOLD)
+        elif data.get("font_selection"):
+            from utils import fetch_google_font
+            font_path = fetch_google_font(data["font_selection"]) or FONT_BOLD
+
+        return {
+            "font": font_path,
+            "fontsize": data.get("fontsize", 70),
+            "color": data.get("color", "#FFFF00"),
+            "inactive_color": data.get("inactive_color", "#FFFFFF"),
+            "stroke_color": data.get("stroke_color", "#000000"),
+            "stroke_width": data.get("stroke_width", 2),
+            "karaoke": data.get("karaoke", False),
+            "letter_spacing": data.get("letter_spacing", 0),
+            "line_spacing": data.get("line_spacing", 0)
+        }
@@ -0,0 +1,258 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from settings import PROJECTS_DIR, PROJECT_COMPACT_OPS
+from subtitle_track import SubtitleTrack
+from regrouper import regroup_words
+from timing import transform_times
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only coordinated within this process
+    fcntl = None
+
+FORMAT_VERSION = 1
+TRACK_FIELDS = ("word_times", "word_buf", "word_offsets", "seg_words", "seg_times", "seg_buf", "seg_offsets")
+
+
+class ProjectState(NamedTuple):
+    """Everything needed to resume editing a video without recomputing anything."""
+    words: Tuple[List[str], np.ndarray] # Whisper (texts, times), for re-chunking
+    track: SubtitleTrack
+    style: Dict[str, Any] # Style widget values (session_state keys)
+    model_size: str
+    edits: int # Journal entries replayed on top of the snapshot
+    seq: int # Journal position this state reflects (pass it to append / compact)
+
+
+class ProjectConflict(Exception):
+    """The project was written by another session (tab or process) since the caller last read it."""
+
+
+def _json_default(value):
+    # numpy scalars from DataFrame records
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def replay(track: SubtitleTrack, words: Tuple[List[str], np.ndarray], op: Dict[str, Any]) -> SubtitleTrack:
+    """Applies one journal entry to a track."""
+    kind = op["op"]
+    if kind == "splice":
+        return track.splice_editor_rows(op["rows"], op["first"], op["last"])
+    if kind == "timing":
+        return transform_times(track, offset=op["offset"], stretch=op["stretch"],
+                               anchors=op.get("anchors"), duration=op.get("duration"))
+    if kind == "rechunk":
+        texts, times = words
+        return SubtitleTrack.from_words(texts, times, regroup_words(texts, times, **op["rules"]))
+    raise ValueError(f"Unknown journal op {kind!r}")
+
+
+class ProjectStore:
+    """
+    Per-video projects under PROJECTS_DIR/<media hash>/ (outside TEMP_DIR, so purges and
+    quota eviction never touch them):
+
+        base.npz       snapshot: words, SubtitleTrack arrays, style, journal seq it covers
+        journal.jsonl  append-only edits since the snapshot (splice / timing / rechunk / style)
+        draft.json     the editor window's uncommitted edits (overwritten, not journaled)
+
+    Every PROJECT_COMPACT_OPS entries the caller's current state is written as the new
+    snapshot and the journal starts over. Entries carry a sequence number, so a crash
+    between writing the snapshot and truncating the journal never replays an edit twice.
+
+    Several sessions (tabs, app processes) may open the same video. Writes take a lock
+    on the project directory and re-read the sequence number from disk; a writer whose
+    state is behind it (another session wrote since) gets ProjectConflict instead of
+    interleaving its edits with the other's. create() never reuses a sequence number.
+    Share one instance per process (st.cache_resource).
+    """
+
+    def __init__(self, root: str = PROJECTS_DIR, compact_ops: int = PROJECT_COMPACT_OPS):
+        self.root = root
+        self.compact_ops = compact_ops
+        self._lock = threading.Lock()
+
+    def _path(self, media_hash: str, name: str) -> str:
+        return os.path.join(self.root, media_hash, name)
+
+    @contextmanager
+    def _locked(self, media_hash: str):
+        """Exclusive access to one project, across threads and processes."""
+        os.makedirs(os.path.join(self.root, media_hash), exist_ok=True)
+        with self._lock, open(self._path(media_hash, ".lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def exists(self, media_hash: Optional[str]) -> bool:
+        return bool(media_hash) and os.path.exists(self._path(media_hash, "base.npz"))
+
+    # --- Snapshot ---
+
+    def _write_base(self, media_hash: str, words, track: SubtitleTrack, style: Dict[str, Any],
+                    model_size: str, seq: int):
+        texts, times = words
+        meta = {"version": FORMAT_VERSION, "seq": seq, "style": style, "model_size": model_size}
+        arrays = {name: np.asarray(getattr(track, name)) for name in TRACK_FIELDS}
+        path = self._path(media_hash, "base.npz")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = path + ".part.npz"
+        np.savez(partial_path, texts=np.array(texts, dtype=str), times=np.asarray(times),
+                 meta=np.array(json.dumps(meta, default=_json_default)), **arrays)
+        os.replace(partial_path, path)
+
+    def create(self, media_hash: str, words, track: SubtitleTrack, style: Optional[Dict[str, Any]] = None,
+               model_size: str = "") -> int:
+        """
+        Starts (or restarts) a project from a fresh transcription, or from a session's whole
+        state after a ProjectConflict. Returns its sequence number.
+        """
+        with self._locked(media_hash):
+            try:
+                # Past any seq another session may still hold, so its next write conflicts
+                seq = self._journal_seq(media_hash)[0] + 1 if self.exists(media_hash) else 0
+            except Exception:
+                seq = 0 # unreadable snapshot: nobody can be editing it
+            self._write_base(media_hash, words, track, style or {}, model_size, seq=seq)
+            for name in ("journal.jsonl", "draft.json"):
+                if os.path.exists(self._path(media_hash, name)):
+                    os.remove(self._path(media_hash, name))
+            return seq
+
+    def compact(self, media_hash: str, words, track: SubtitleTrack, style: Dict[str, Any], model_size: str = "",
+                seq: Optional[int] = None):
+        """
+        Writes the current state (at journal position `seq`) as the snapshot and empties the journal.
+        Raises ProjectConflict if the journal moved past `seq`: the snapshot would drop those edits.
+        """
+        with self._locked(media_hash):
+            last_seq, _ = self._journal_seq(media_hash)
+            if seq is not None and seq != last_seq:
+                raise ProjectConflict(f"Project {media_hash} is at edit {last_seq}, not {seq}")
+            self._write_base(media_hash, words, track, style, model_size, seq=last_seq)
+            with open(self._path(media_hash, "journal.jsonl"), "w"):
+                pass
+
+    # --- Journal ---
+
+    def _read_journal(self, media_hash: str) -> List[Dict[str, Any]]:
+        path = self._path(media_hash, "journal.jsonl")
+        if not os.path.exists(path):
+            return []
+        ops = []
+        with open(path) as f:
+            for line in f:
+                try:
+                    ops.append(json.loads(line))
+                except ValueError:
+                    # Torn last line from a crash mid-append; everything before it is intact
+                    break
+        return ops
+
+    def _journal_seq(self, media_hash: str) -> Tuple[int, int]:
+        """(last seq, journal entries since the snapshot), read from disk (call under _locked)."""
+        base_seq = self._base_seq(media_hash)
+        ops = [op for op in self._read_journal(media_hash) if op["seq"] > base_seq]
+        return (ops[-1]["seq"], len(ops)) if ops else (base_seq, 0)
+
+    def _base_seq(self, media_hash: str) -> int:
+        with np.load(self._path(media_hash, "base.npz"), allow_pickle=False) as data:
+            return json.loads(str(data["meta"]))["seq"]
+
+    def append(self, media_hash: Optional[str], op: Dict[str, Any], seq: Optional[int] = None) -> Tuple[Optional[int], bool]:
+        """
+        Journals one edit made on top of journal position `seq` (None = don't check).
+        Returns (new seq, whether the journal is due for compact()), or (None, False) without a project.
+        Raises ProjectConflict if another session wrote the project since `seq`.
+        """
+        if not self.exists(media_hash):
+            return None, False
+        with self._locked(media_hash):
+            return self._append(media_hash, op, seq)
+
+    def _append(self, media_hash: str, op: Dict[str, Any], seq: Optional[int]) -> Tuple[int, bool]:
+        last_seq, count = self._journal_seq(media_hash)
+        if seq is not None and seq != last_seq:
+            raise ProjectConflict(f"Project {media_hash} is at edit {last_seq}, not {seq}")
+        line = json.dumps({**op, "seq": last_seq + 1}, default=_json_default)
+        with open(self._path(media_hash, "journal.jsonl"), "a") as f:
+            f.write(line + "\n")
+        if op["op"] != "style":
+            # Any track change starts a fresh editor widget, so the draft is either in this op or obsolete
+            self._drop_draft(media_hash)
+        return last_seq + 1, count + 1 >= self.compact_ops
+
+    # --- Draft (uncommitted editor window) ---
+
+    def save_draft(self, media_hash: Optional[str], first: int, last: int, rows: List[Dict[str, Any]]):
+        if not self.exists(media_hash):
+            return
+        path = self._path(media_hash, "draft.json")
+        with open(path + ".part", "w") as f:
+            json.dump({"first": first, "last": last, "rows": rows}, f, default=_json_default)
+        os.replace(path + ".part", path)
+
+    def _drop_draft(self, media_hash: str):
+        try:
+            os.remove(self._path(media_hash, "draft.json"))
+        except OSError:
+            pass
+
+    def clear_draft(self, media_hash: Optional[str]):
+        if media_hash:
+            self._drop_draft(media_hash)
+
+    # --- Load ---
+
+    def load(self, media_hash: str) -> Optional[ProjectState]:
+        """Snapshot + journal replay (+ a pending draft, journaled now as a splice). None if unreadable."""
+        with self._locked(media_hash):
+            return self._load(media_hash)
+
+    def _load(self, media_hash: str) -> Optional[ProjectState]:
+        try:
+            with np.load(self._path(media_hash, "base.npz"), allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                words = ([str(t) for t in data["texts"]], data["times"])
+                arrays = {name: data[name] for name in TRACK_FIELDS}
+            arrays["word_buf"], arrays["seg_buf"] = str(arrays["word_buf"]), str(arrays["seg_buf"])
+            track = SubtitleTrack(**arrays)
+            style = meta.get("style", {})
+            ops = [op for op in self._read_journal(media_hash) if op["seq"] > meta["seq"]]
+            seq = ops[-1]["seq"] if ops else meta["seq"]
+            for op in ops:
+                if op["op"] == "style":
+                    style = op["values"]
+                else:
+                    track = replay(track, words, op)
+        except Exception as e:
+            print(f"Ignoring unreadable project {media_hash}: {e}")
+            return None
+
+        draft_path = self._path(media_hash, "draft.json")
+        if os.path.exists(draft_path):
+            try:
+                with open(draft_path) as f:
+                    draft = json.load(f)
+                op = {"op": "splice", "first": draft["first"], "last": draft["last"], "rows": draft["rows"]}
+                track = replay(track, words, op)
+                seq, _ = self._append(media_hash, op, seq)
+                ops.append(op)
+            except Exception as e:
+                print(f"Ignoring unreadable draft for {media_hash}: {e}")
+                self._drop_draft(media_hash)
+        return ProjectState(words, track, style, meta.get("model_size", ""), len(ops), seq)
+
+    def delete(self, media_hash: str):
+        with self._locked(media_hash):
+            for name in ("base.npz", "journal.jsonl", "draft.json"):
+                try:
+                    os.remove(self._path(media_hash, name))
+                except OSError:
+                    pass
@@ -0,0 +1,148 @@
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import numpy as np
+
+# Columns of the word timing array
+START, END, PROB = 0, 1, 2
+
+SENTENCE_PUNCTUATION = ".?!…"
+CLAUSE_PUNCTUATION = ",;:"
+
+# Default chunking matches the original behaviour (3 words per caption, no other limits)
+DEFAULT_REGROUP_RULES = {
+    "max_words": 3,
+    "max_chars": None,
+    "max_width_px": None,
+    "font_path": None,
+    "fontsize": 70,
+    "max_duration": None,
+    "punctuation_break": False,
+    "pause_gap": None,
+}
+
+
+def words_to_arrays(words: Sequence[Any]) -> Tuple[List[str], np.ndarray]:
+    """
+    Converts faster-whisper Word objects (or word dicts) to (texts, times).
+    times is a float array of shape (N, 3) holding start, end, probability.
+    """
+    texts = []
+    times = np.empty((len(words), 3), dtype=np.float64)
+    for i, w in enumerate(words):
+        if isinstance(w, dict):
+            texts.append(w['word'])
+            times[i] = (w['start'], w['end'], w.get('probability', 1.0))
+        else:
+            texts.append(w.word)
+            times[i] = (w.start, w.end, w.probability)
+    return texts, times
+
+
+def _word_widths(texts: Sequence[str], font_path: Optional[str], fontsize: int) -> Tuple[np.ndarray, float]:
+    """Measures each word once with PIL. Returns (widths, space_width)."""
+    from PIL import Image, ImageDraw
+    from fonts import load_font
+    from font_catalog import text_length
+    font = load_font(font_path, fontsize)
+    draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+    cache: Dict[str, float] = {}
+    widths = np.empty(len(texts), dtype=np.float64)
+    for i, t in enumerate(texts):
+        t = t.strip()
+        if t not in cache:
+            cache[t] = text_length(draw, t, font)
+        widths[i] = cache[t]
+    return widths, draw.textlength(" ", font=font)
+
+
+def regroup_words(texts: Sequence[str], times: np.ndarray, max_words: Optional[int] = 3,
+                  max_chars: Optional[int] = None, max_width_px: Optional[int] = None,
+                  font_path: Optional[str] = None, fontsize: int = 70,
+                  max_duration: Optional[float] = None, punctuation_break: bool = False,
+                  pause_gap: Optional[float] = None) -> List[Tuple[int, int]]:
+    """
+    Splits a word sequence into caption chunks.
+    Returns a list of (first, last+1) word index ranges.
+
+    A new chunk starts before word i when adding it would exceed max_words, max_chars,
+    max_width_px (measured with the given font) or max_duration, when the previous word
+    ends with punctuation (if punctuation_break), or when the silence before word i is
+    at least pause_gap seconds.
+    """
+    n = len(texts)
+    if n == 0:
+        return []
+
+    stripped = [t.strip() for t in texts]
+    lengths = np.fromiter((len(t) for t in stripped), dtype=np.int64, count=n)
+
+    # Hard breaks are independent of the running chunk, so compute them in one pass
+    hard_break = np.zeros(n, dtype=bool)
+    if pause_gap is not None:
+        hard_break[1:] |= (times[1:, START] - times[:-1, END]) >= pause_gap
+    if punctuation_break:
+        ends_sentence = np.fromiter(
+            (bool(t) and t[-1] in SENTENCE_PUNCTUATION + CLAUSE_PUNCTUATION for t in stripped),
+            dtype=bool, count=n
+        )
+        hard_break[1:] |= ends_sentence[:-1]
+
+    widths, space_w = (None, 0.0)
+    if max_width_px:
+        widths, space_w = _word_widths(stripped, font_path, fontsize)
+
+    ranges = []
+    first = 0
+    count = 0
+    chars = 0
+    width = 0.0
+    for i in range(n):
+        if count:
+            split = hard_break[i]
+            if not split and max_words and count + 1 > max_words:
+                split = True
+            if not split and max_chars and chars + 1 + lengths[i] > max_chars:
+                split = True
+            if not split and widths is not None and width + space_w + widths[i] > max_width_px:
+                split = True
+            if not split and max_duration and times[i, END] - times[first, START] > max_duration:
+                split = True
+            if split:
+                ranges.append((first, i))
+                first, count, chars, width = i, 0, 0, 0.0
+
+        chars += lengths[i] + (1 if count else 0)
+        if widths is not None:
+            width += widths[i] + (space_w if count else 0.0)
+        count += 1
+
+    ranges.append((first, n))
+    return ranges
+
+
+def build_segments(texts: Sequence[str], times: np.ndarray, ranges: Sequence[Tuple[int, int]]) -> List[Dict[str, Any]]:
+    """Builds the segment dicts used by the Data Editor and Renderer from index ranges."""
+    results = []
+    for first, last in ranges:
+        results.append({
+            "start": float(times[first, START]),
+            "end": float(times[last - 1, END]),
+            "text": " ".join(t.strip() for t in texts[first:last]),
+            "words": [
+                {
+                    "word": texts[i],
+                    "start": float(times[i, START]),
+                    "end": float(times[i, END]),
+                    "probability": float(times[i, PROB])
+                }
+                for i in range(first, last)
+            ]
+        })
+    return results
+
+
+def regroup(texts: Sequence[str], times: np.ndarray, rules: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Convenience wrapper: chunk the cached words with `rules` and build segment dicts."""
+    params = dict(DEFAULT_REGROUP_RULES)
+    if rules:
+        params.update(rules)
+    return build_segments(texts, times, regroup_words(texts, times, **params))
@@ -1,15 +1,22 @@
 import os
 import shutil
 import subprocess
-from typing import List, Dict, Any, Optional, Tuple, Union
+from functools import partial
+from typing import Callable, List, Dict, Any, Optional, Tuple, Union
 import numpy as np
 from PIL import Image, ImageFont, ImageDraw
-from moviepy.editor import VideoFileClip, ImageClip, CompositeVideoClip, ColorClip, VideoClip
 from settings import (
     STYLE_BOLD_REEL, STYLE_MINIMALIST, STYLE_DYNAMIC_POP,
-    FONT_BOLD, FONT_MINIMAL, FONT_IMPACT,
-    VIDEO_WIDTH_VERTICAL, VIDEO_HEIGHT_VERTICAL
+    VIDEO_WIDTH_VERTICAL, VIDEO_HEIGHT_VERTICAL, OVERLAY_WORKERS
 )
+from subtitle_track import SubtitleTrack
+from font_catalog import font_runs, text_length
+from fonts import load_font
+from overlay_producer import OverlayProducer
+from caption_layer import CaptionLayer, layer_cache_path
+from styles import CompiledStyle, compile_style, SHADOW_COLOR, SHADOW_OFFSET
+
+Subtitles = Union[SubtitleTrack, List[Dict[str, Any]]]
 
 class VideoRenderer:
     def __init__(self):
@@ -26,7 +33,7 @@ class VideoRenderer:
         current_line = []
         
         def get_width(t):
-            base_w = dummy_draw.textlength(t, font=font)
+            base_w = text_length(dummy_draw, t, font)
             if len(t) > 1:
                 return base_w + (len(t) - 1) * letter_spacing
             return base_w
@@ -56,8 +63,11 @@ class VideoRenderer:
         """Helper to draw text with letter spacing using Baseline alignment."""
         x, y = xy
         
-        # If no spacing, just draw
-        if letter_spacing == 0:
+        # Characters the font lacks are drawn with fallback fonts from the catalog
+        runs = font_runs(text, font)
+
+        # If no spacing (and a single font), just draw
+        if letter_spacing == 0 and len(runs) == 1:
             draw.text(xy, text, font=font, fill=fill, anchor=anchor, stroke_width=stroke_width, stroke_fill=stroke_fill)
             return
             
@@ -71,7 +81,7 @@ class VideoRenderer:
         # (Only simple mapping implemented for common use cases in this app)
         if anchor == 'mm':
             # Horizontal: Center
-            base_w = dummy_draw.textlength(text, font=font)
+            base_w = text_length(dummy_draw, text, font)
             total_w = base_w + (len(text) - 1) * letter_spacing
             current_x = x - total_w / 2
             
@@ -92,36 +102,24 @@ class VideoRenderer:
         # Default/Expected: 'ls' (Left Baseline)
         # We iterate characters drawing at Baseline to keep them aligned.
         
-        for char in text:
-            draw.text((current_x, current_y), char, font=font, fill=fill, stroke_width=stroke_width, stroke_fill=stroke_fill, anchor='ls')
-            w = dummy_draw.textlength(char, font=font)
-            current_x += w + letter_spacing
+        # Fallback runs share the primary font's baseline.
+        if letter_spacing == 0:
+            for segment, run_font in runs:
+                draw.text((current_x, current_y), segment, font=run_font, fill=fill, stroke_width=stroke_width, stroke_fill=stroke_fill, anchor='ls')
+                current_x += dummy_draw.textlength(segment, font=run_font)
+            return
 
-    def _create_pil_text_image(self, text, font_path, fontsize, color, stroke_color=None, stroke_width=0, size=None, letter_spacing=0, line_spacing=0):
-        """
-        Creates a numpy array image of text using PIL.
-        Returns: numpy array (height, width, 4) suitable for ImageClip.
-        """
-        if not isinstance(text, str):
-            text = str(text)
-        
-        # 1. Load Font
-        fontsize = int(fontsize) # Ensure int
+        for segment, run_font in runs:
+            for char in segment:
+                draw.text((current_x, current_y), char, font=run_font, fill=fill, stroke_width=stroke_width, stroke_fill=stroke_fill, anchor='ls')
+                w = dummy_draw.textlength(char, font=run_font)
+                current_x += w + letter_spacing
+
+    def _layout_text_image(self, text, font, stroke_width=0, letter_spacing=0, line_spacing=0) -> Dict[str, Any]:
+        """Measures a text image for _create_pil_text_image (its size is known before drawing)."""
         stroke_width = int(stroke_width)
-        
-        if not os.path.exists(font_path):
-            pass # Suppress warning spam or log once
-        
-        try:
-            font = ImageFont.truetype(font_path, fontsize)
-        except:
-            font = ImageFont.load_default()
-            try:
-                font = ImageFont.load_default(size=fontsize)
-            except:
-                pass
 
-        # 3. Create Image (with ample padding for strokes/glows)
+        # Create Image (with ample padding for strokes/glows)
         dummy_draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
         
         lines = text.split('\n')
@@ -134,7 +132,7 @@ class VideoRenderer:
         max_w = 0
         line_widths = []
         for line in lines:
-            base_w = dummy_draw.textlength(line, font=font)
+            base_w = text_length(dummy_draw, line, font)
             if len(line) > 1:
                 w = base_w + (len(line) - 1) * letter_spacing
             else:
@@ -144,13 +142,32 @@ class VideoRenderer:
             
         W = int(max_w + stroke_width * 2 + 40)
         H = int(total_h + stroke_width * 2 + 40)
+        return {"lines": lines, "line_widths": line_widths, "ascent": ascent, "line_height": line_height,
+                "total_h": total_h, "W": W, "H": H}
+
+    def _create_pil_text_image(self, text, font, color, stroke_color=None, stroke_width=0, letter_spacing=0, line_spacing=0, layout=None):
+        """
+        Creates a numpy array image of text using PIL.
+        font is a loaded font (from the CompiledStyle), colors are RGBA tuples.
+        layout is the text's _layout_text_image, if already measured.
+        Returns: numpy array (height, width, 4) suitable for ImageClip.
+        """
+        if not isinstance(text, str):
+            text = str(text)
+        
+        stroke_width = int(stroke_width)
+        if layout is None:
+            layout = self._layout_text_image(text, font, stroke_width, letter_spacing, line_spacing)
+        lines, line_widths = layout["lines"], layout["line_widths"]
+        ascent, line_height, total_h = layout["ascent"], layout["line_height"], layout["total_h"]
+        W, H = layout["W"], layout["H"]
         
         img = Image.new('RGBA', (W, H), (0, 0, 0, 0))
         draw = ImageDraw.Draw(img)
         
         # Shadow Settings
-        shadow_offset = (4, 4)
-        shadow_color = (0, 0, 0, 160)
+        shadow_offset = SHADOW_OFFSET
+        shadow_color = SHADOW_COLOR
         
         # Draw Lines
         # Calculate visual top start
@@ -188,179 +205,190 @@ class VideoRenderer:
             
         return np.array(img)
 
-    def render_video(self, video_path: str, subtitles: List[Dict[str, Any]], style: str, output_path: str, style_config: Optional[Dict[str, Any]] = None) -> str:
+    def render_video(self, video_path: str, subtitles: Subtitles, style: str, output_path: str, style_config: Optional[Dict[str, Any]] = None, logger: Any = "bar", threads: Optional[int] = None) -> str:
         """
         Renders the video with burned-in subtitles.
+        subtitles can be a SubtitleTrack or a list of segment dicts.
+        logger is handed to MoviePy (e.g. jobs.RenderProgressLogger for progress polling).
+        threads caps the x264 encoder threads (None = ffmpeg decides, usually every core).
+        The rasterized captions are cached as a CaptionLayer, so re-encoding the same
+        captions and style (another video, or after a failed render) skips all text drawing.
         """
+        # MoviePy is imported on first use (not via moviepy.editor, which also pulls in IPython & co.)
+        from moviepy.video.io.VideoFileClip import VideoFileClip
+        from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
         video = VideoFileClip(video_path)
         
-        # Generator for creating clips
-        subtitle_clips = []
-        
-        if style_config and style_config.get("karaoke"):
-            subtitle_clips = self._create_karaoke_clips(subtitles, video.size, style_config, base_style=style)
-        elif style == STYLE_BOLD_REEL:
-            subtitle_clips = self._create_bold_reel_clips(subtitles, video.size, style_config)
-        elif style == STYLE_MINIMALIST:
-            subtitle_clips = self._create_minimalist_clips(subtitles, video.size, style_config)
-        elif style == STYLE_DYNAMIC_POP:
-            subtitle_clips = self._create_dynamic_pop_clips(subtitles, video.size, style_config)
-        else:
-             # Default fallback
-             subtitle_clips = self._create_bold_reel_clips(subtitles, video.size, style_config)
+        layer_path = layer_cache_path(subtitles, style, style_config, video.size)
+        layer = CaptionLayer.load(layer_path)
+        if layer is None:
+            # Resolve colors, fonts and metrics once for the whole render
+            compiled = compile_style(style, style_config, video.size)
+            layer = self._build_layer(subtitles, compiled).record(layer_path)
+        # Karaoke frames are rasterized (or read back) by a small pool while the encoder works (sharing the render's threads)
+        producer = OverlayProducer(workers=min(OVERLAY_WORKERS, threads or OVERLAY_WORKERS))
+        subtitle_clips = layer.clips(producer)
 
         final_video = CompositeVideoClip([video] + subtitle_clips)
-        final_video.write_videofile(output_path, codec="libx264", audio_codec="aac")
+        # Write to a temp name first so a half-written file never looks like a finished render
+        root, ext = os.path.splitext(output_path)
+        partial_path = f"{root}.part{ext}"
+        # MoviePy's intermediate audio file goes next to it (by default it lands in the working directory)
+        audio_path = f"{root}.part.m4a"
+        try:
+            try:
+                producer.start()
+                final_video.write_videofile(partial_path, codec="libx264", audio_codec="aac", temp_audiofile=audio_path,
+                                            logger=logger, threads=threads)
+            finally:
+                # Stopped before the layer below is touched: workers may still be recording sprites into it
+                producer.close()
+        except BaseException:
+            # Failed or cancelled: leave neither a half-written video nor a half-recorded layer behind
+            for path in (partial_path, audio_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            layer.discard()
+            layer.close()
+            raise
+        os.replace(partial_path, output_path)
+
+        try:
+            layer.finish()
+        except OSError as e:
+            # The render is done; the layer is only a cache
+            print(f"Could not save caption layer {layer_path}: {e}")
+            layer.discard()
+        finally:
+            layer.close()
         
         return output_path
 
-    def _create_bold_reel_clips(self, subtitles: List[Dict[str, Any]], video_size: Tuple[int, int], config: Optional[Dict[str, Any]] = None) -> List[Any]:
-        w, h = video_size
-        clips = []
-        
-        # Defaults
-        font_path = FONT_BOLD
-        fontsize = 70
-        color = 'yellow'
-        stroke_color = 'black'
-        stroke_width = 4 # slightly thicker for PIL
-        letter_spacing = 0
-        line_spacing = 0
-        
-        if config:
-            font_path = config.get('font', font_path)
-            fontsize = config.get('fontsize', fontsize)
-            color = config.get('color', color)
-            stroke_color = config.get('stroke_color', stroke_color)
-            stroke_width = config.get('stroke_width', stroke_width)
-            letter_spacing = config.get('letter_spacing', 0)
-            line_spacing = config.get('line_spacing', 0)
+    def _create_clips(self, subtitles: Subtitles, style: CompiledStyle, producer: Optional[OverlayProducer] = None) -> List[Any]:
+        """MoviePy clips for a compiled style (via an in-memory CaptionLayer). Only karaoke clips use the producer."""
+        return self._build_layer(subtitles, style).clips(producer)
+
+    def _build_layer(self, subtitles: Subtitles, style: CompiledStyle) -> CaptionLayer:
+        """Dispatches to the layer builder for a compiled style."""
+        layer = CaptionLayer(style.video_size)
+        if style.karaoke:
+            self._add_karaoke_captions(layer, subtitles, style)
+        elif style.name == STYLE_MINIMALIST:
+            self._add_minimalist_captions(layer, subtitles, style)
+        elif style.name == STYLE_DYNAMIC_POP:
+            self._add_dynamic_pop_captions(layer, subtitles, style)
+        else:
+            self._add_bold_reel_captions(layer, subtitles, style)
+        return layer
+
+    def _text_rasterizer(self, text: str, font_path: Optional[str], fontsize: int, color,
+                         stroke_color=None, stroke_width=0, letter_spacing=0, line_spacing=0) -> Tuple[Callable[[], np.ndarray], Tuple[int, int]]:
+        """A text image's drawing function and (h, w): measured now, drawn only when called."""
+        layout = self._layout_text_image(text, load_font(font_path, fontsize), stroke_width, letter_spacing, line_spacing)
+
+        def rasterize():
+            # Fetched here, not captured: producer threads each get their own font objects
+            font = load_font(font_path, fontsize)
+            return self._create_pil_text_image(text, font, color, stroke_color, stroke_width,
+                                               letter_spacing=letter_spacing, line_spacing=line_spacing, layout=layout)
+
+        return rasterize, (layout["H"], layout["W"])
+
+    def _text_sprite(self, layer: CaptionLayer, text: str, font_path: Optional[str], fontsize: int, color,
+                     stroke_color=None, stroke_width=0, letter_spacing=0, line_spacing=0) -> int:
+        """Adds a text image sprite: measured now, drawn the first time it is shown."""
+        rasterize, shape = self._text_rasterizer(text, font_path, fontsize, color, stroke_color, stroke_width,
+                                                 letter_spacing=letter_spacing, line_spacing=line_spacing)
+        return layer.add_sprite(rasterize, shape=shape)
+
+    def _boxed_sprites(self, layer: CaptionLayer, style: CompiledStyle, rasterizers: List[Callable[[], np.ndarray]],
+                       shape: Tuple[int, int]) -> Tuple[List[int], int, int]:
+        """
+        Adds text images (all of `shape`) drawn over the compiled style's shared box sprite,
+        both centered at 0.75*h, so each caption is one overlay instead of a box and a text clip.
+        Returns the sprites and their common top left (x, y).
+
+        The merged sprite is stored as 8-bit straight RGBA, so where anti-aliased text edges
+        or shadows overlap the box, frames can differ from compositing the two separately by
+        up to 2 levels. The box keeps its fixed full-width size: fitting it to the text
+        bounds would change the Minimalist look and is left for a separate change.
+        """
+        video_w, video_h = style.video_size
+        text_h, text_w = shape
+        box_h, box_w = style.box.shape[:2]
+        # Where the box and the text sit on screen (truncated like MoviePy positions)
+        box_x, box_y = int((video_w - box_w) / 2), int(0.75*video_h - box_h/2)
+        text_x, text_y = int((video_w - text_w) / 2), int(0.75*video_h - text_h/2)
+        x, y = min(box_x, text_x), min(box_y, text_y)
+        size = (max(box_y + box_h, text_y + text_h) - y, max(box_x + box_w, text_x + text_w) - x)
+
+        def boxed(rasterize):
+            out = np.zeros(size + (4,), dtype=np.float32)
+            out[box_y - y:box_y - y + box_h, box_x - x:box_x - x + box_w] = style.box
+            text = rasterize().astype(np.float32) / 255
+            text[:, :, :3] *= text[:, :, 3:]
+            # Premultiplied "over": text on top of the box
+            region = out[text_y - y:text_y - y + text_h, text_x - x:text_x - x + text_w]
+            region *= 1 - text[:, :, 3:]
+            region += text
+            # Back to straight alpha, which is what MoviePy composites (color + 0-1 mask)
+            alpha = out[:, :, 3:]
+            np.divide(out[:, :, :3], alpha, out=out[:, :, :3], where=alpha > 0)
+            return np.rint(out * 255).astype(np.uint8)
+
+        sprites = [layer.add_sprite(lambda rasterize=rasterize: boxed(rasterize), shape=size) for rasterize in rasterizers]
+        return sprites, x, y
+
+    def _add_bold_reel_captions(self, layer: CaptionLayer, subtitles: Subtitles, style: CompiledStyle):
+        w, h = style.video_size
 
         for sub in subtitles:
             text_content = str(sub.get('text', '') or "")
             try:
-                # Load font for measuring
-                try:
-                    font = ImageFont.truetype(font_path, int(fontsize))
-                except:
-                    font = ImageFont.load_default()
-
                 # Wrap text
-                max_width = int(w * 0.9)
-                wrapped_text = self._wrap_text_pixel(text_content, font, max_width, letter_spacing=letter_spacing)
+                wrapped_text = self._wrap_text_pixel(text_content, style.font, style.max_width, letter_spacing=style.letter_spacing)
 
-                img_array = self._create_pil_text_image(
-                    wrapped_text, font_path, fontsize, color, stroke_color, stroke_width, 
-                    letter_spacing=letter_spacing, line_spacing=line_spacing
+                sprite = self._text_sprite(
+                    layer, wrapped_text, style.font_path, style.fontsize, style.color, style.stroke_color, style.stroke_width, 
+                    letter_spacing=style.letter_spacing, line_spacing=style.line_spacing
                 )
                 
-                txt_clip = (ImageClip(img_array)
-                            .set_duration(sub['end'] - sub['start'])
-                            .set_start(sub['start'])
-                            .set_position(('center', 0.7*h)))
-                            
-                clips.append(txt_clip)
+                layer.place(sprite, sub['start'], sub['end'], y=0.7*h)
             except Exception as e:
                 print(f"PIL Text Error: {e}")
                 continue
-        return clips
 
-    def _create_minimalist_clips(self, subtitles: List[Dict[str, Any]], video_size: Tuple[int, int], config: Optional[Dict[str, Any]] = None) -> List[Any]:
-        w, h = video_size
-        clips = []
-        
-        # Defaults
-        font_path = FONT_MINIMAL
-        fontsize = 50
-        color = 'white'
-        
-        if config:
-            font_path = config.get('font', font_path)
-            fontsize = config.get('fontsize', fontsize)
-            color = config.get('color', color)
-        
+    def _add_minimalist_captions(self, layer: CaptionLayer, subtitles: Subtitles, style: CompiledStyle):
         for sub in subtitles:
             text_content = str(sub.get('text', '') or "")
             try:
-                # Load font for measuring
-                try:
-                    font = ImageFont.truetype(font_path, int(fontsize))
-                except:
-                    font = ImageFont.load_default()
-                
-                max_width = int(w * 0.9)
-                wrapped_text = self._wrap_text_pixel(text_content, font, max_width)
+                wrapped_text = self._wrap_text_pixel(text_content, style.font, style.max_width)
 
-                img_array = self._create_pil_text_image(
-                    wrapped_text, font_path, fontsize, color, stroke_width=0
+                rasterize, shape = self._text_rasterizer(
+                    wrapped_text, style.font_path, style.fontsize, style.color, stroke_width=0
                 )
                 
-                txt_clip = (ImageClip(img_array)
-                            .set_duration(sub['end'] - sub['start'])
-                            .set_start(sub['start'])
-                            .set_position('center')) # We'll adjust vertical below
-                
-                # Background box
-                box_height = 150 # fixed height for aesthetic
-                box_clip = (ColorClip(size=(w, box_height), color=(0,0,0))
-                            .set_opacity(0.6)
-                            .set_position(('center', 0.75*h - box_height/2))
-                            .set_duration(sub['end'] - sub['start'])
-                            .set_start(sub['start']))
-                
-                # Center text in box
-                # Text clip height might vary, we center it relative to the box center
-                # Box center Y is: 0.75*h
-                txt_clip = txt_clip.set_position(('center', 0.75*h - img_array.shape[0]/2))
-                
-                clips.append(box_clip)
-                clips.append(txt_clip)
+                # Background box (fixed height for aesthetic) with the text centered in it
+                # Text height might vary, we center it relative to the box center (0.75*h)
+                (sprite,), x, y = self._boxed_sprites(layer, style, [rasterize], shape)
+                layer.place(sprite, sub['start'], sub['end'], y=y, x=x)
             except Exception as e:
                 print(f"PIL Text Error: {e}")
                 continue
-        return clips
-
-    def _create_dynamic_pop_clips(self, subtitles: List[Dict[str, Any]], video_size: Tuple[int, int], config: Optional[Dict[str, Any]] = None) -> List[Any]:
-        w, h = video_size
-        clips = []
-        
-        # Defaults
-        font_path = FONT_IMPACT
-        fontsize = 100
-        color = 'white'
-        stroke_color = 'black'
-        stroke_width = 5
-        
-        if config:
-            font_path = config.get('font', font_path)
-            fontsize = config.get('fontsize', fontsize)
-            color = config.get('color', color)
-            stroke_color = config.get('stroke_color', stroke_color)
-            stroke_width = config.get('stroke_width', stroke_width)
 
+    def _add_dynamic_pop_captions(self, layer: CaptionLayer, subtitles: Subtitles, style: CompiledStyle):
         for sub in subtitles:
             words = sub.get('words', [])
             if not words:
                 # Fallback to full text
                 text_content = str(sub.get('text', '') or "")
                 try:
-                    # Load font for measuring
-                    try:
-                        font = ImageFont.truetype(font_path, int(fontsize*0.8))
-                    except:
-                        font = ImageFont.load_default()
+                    wrapped_text = self._wrap_text_pixel(text_content, style.small_font, style.max_width)
 
-                    max_width = int(w * 0.9)
-                    wrapped_text = self._wrap_text_pixel(text_content, font, max_width)
-
-                    img_array = self._create_pil_text_image(
-                        wrapped_text, font_path, int(fontsize*0.8), color, stroke_color, stroke_width
+                    sprite = self._text_sprite(
+                        layer, wrapped_text, style.font_path, style.small_fontsize, style.color, style.stroke_color, style.stroke_width
                     )
-                    txt_clip = (ImageClip(img_array)
-                                .set_duration(sub['end'] - sub['start'])
-                                .set_start(sub['start'])
-                                .set_position('center'))
-                    clips.append(txt_clip)
+                    layer.place(sprite, sub['start'], sub['end'])
                 except:
                      pass
                 continue
@@ -371,55 +399,19 @@ class VideoRenderer:
                 end = word_info['end']
                 
                 try:
-                    img_array = self._create_pil_text_image(
-                        word_text, font_path, fontsize, color, stroke_color, stroke_width
+                    sprite = self._text_sprite(
+                        layer, str(word_text), style.font_path, style.fontsize, style.color, style.stroke_color, style.stroke_width
                     )
                     
                     # Highlight/Pop effect? (Maybe scale?)
                     # For now just render it center
-                    txt_clip = (ImageClip(img_array)
-                                .set_duration(end - start)
-                                .set_start(start)
-                                .set_position('center'))
-                    
-                    clips.append(txt_clip)
+                    layer.place(sprite, start, end)
                 except Exception as e:
                     print(f"PIL Word Error: {e}")
                     continue
-                
-        return clips
-
-    def _create_karaoke_clips(self, subtitles: List[Dict[str, Any]], video_size: Tuple[int, int], config: Optional[Dict[str, Any]] = None, base_style: str = STYLE_BOLD_REEL) -> List[Any]:
-        w, h = video_size
-        clips = []
-
-        # Defaults based on Base Style
-        font_path = FONT_BOLD
-        fontsize = 70
-        stroke_width = 4
-        active_color = 'yellow'
-        inactive_color = 'white'
-        stroke_color = 'black' # Default stroke
-        
-        # Style Specific Defaults
-        if base_style == STYLE_MINIMALIST:
-            font_path = FONT_MINIMAL
-            fontsize = 50
-            stroke_width = 0
-            active_color = 'white' # Though user likely overrides
-        elif base_style == STYLE_DYNAMIC_POP:
-            font_path = FONT_IMPACT
-            fontsize = 100
-            stroke_width = 5
-        
-        # Override with Config
-        if config:
-            font_path = config.get('font', font_path)
-            fontsize = config.get('fontsize', fontsize)
-            active_color = config.get('color', active_color) 
-            inactive_color = config.get('inactive_color', inactive_color)
-            stroke_color = config.get('stroke_color', stroke_color)
-            stroke_width = config.get('stroke_width', stroke_width)
+
+    def _add_karaoke_captions(self, layer: CaptionLayer, subtitles: Subtitles, style: CompiledStyle):
+        w, h = style.video_size
 
         for sub in subtitles:
             words = sub.get('words', [])
@@ -428,111 +420,72 @@ class VideoRenderer:
             if not words:
                  text_content = str(sub.get('text', '') or "")
                  try:
-                     # Load font
-                     try:
-                         font = ImageFont.truetype(font_path, int(fontsize))
-                     except:
-                         font = ImageFont.load_default()
-                     
-                     max_width = int(w * 0.9)
-                     wrapped_text = self._wrap_text_pixel(text_content, font, max_width)
-
-                     img_array = self._create_pil_text_image(wrapped_text, font_path, fontsize, active_color, stroke_color, stroke_width)
-                     txt_clip = (ImageClip(img_array)
-                                 .set_duration(sub['end'] - sub['start'])
-                                 .set_start(sub['start'])
-                                 .set_position(('center', 0.7*h))) # Default Pos
+                     wrapped_text = self._wrap_text_pixel(text_content, style.font, style.max_width)
+
+                     rasterize, shape = self._text_rasterizer(wrapped_text, style.font_path, style.fontsize, style.color, style.stroke_color, style.stroke_width)
                      
-                     if base_style == STYLE_MINIMALIST:
-                         # Center and add box
-                         txt_clip = txt_clip.set_position('center')
-                         box_height = 150
-                         box_clip = (ColorClip(size=(w, box_height), color=(0,0,0))
-                                     .set_opacity(0.6)
-                                     .set_position(('center', 0.75*h - box_height/2))
-                                     .set_duration(sub['end'] - sub['start'])
-                                     .set_start(sub['start']))
-                         txt_clip = txt_clip.set_position(('center', 0.75*h - img_array.shape[0]/2))
-                         clips.append(box_clip)
-
-                     clips.append(txt_clip)
+                     if style.has_box:
+                         # Center on the box
+                         (sprite,), x, y = self._boxed_sprites(layer, style, [rasterize], shape)
+                     else:
+                         sprite, x, y = layer.add_sprite(rasterize, shape=shape), None, 0.7*h # Default Pos
+
+                     layer.place(sprite, sub['start'], sub['end'], y=y, x=x)
                  except:
                      pass
                  continue
             
-            # EFFICIENT VIDEO CLIP GENERATION
-            # Instead of creating N ImageClips (one per word), we create 1 VideoClip per sentence
-            # using a make_frame function that renders text on demand.
+            # EFFICIENT SENTENCE STATES
+            # Instead of one sprite per frame, the sentence gets one sprite per highlighted word
+            # (plus the no-word state), each drawn only when first needed.
             
             try:
-                max_width = int(w * 0.9)
-                sentence_clip = self._create_karaoke_sentence_clip(
-                    sub, font_path, fontsize, active_color, inactive_color, stroke_color, stroke_width, max_width,
-                    letter_spacing=config.get('letter_spacing', 0) if config else 0,
-                    line_spacing=config.get('line_spacing', 0) if config else 0
-                )
-                
-                # Positioning
-                pos = ('center', 0.7*h)
+                rasterize, shape = self._karaoke_sentence_rasterizer(sub, style)
+                # The no-word state, then one per word (in the order of sub['words'])
+                states = [partial(rasterize, i) for i in range(-1, len(words))]
                 
-                if base_style == STYLE_MINIMALIST:
-                    # Add background box clip (static)
-                    box_height = 150
-                    box_clip = (ColorClip(size=(w, box_height), color=(0,0,0))
-                                .set_opacity(0.6)
-                                .set_position(('center', 0.75*h - box_height/2))
-                                .set_duration(sentence_clip.duration)
-                                .set_start(sentence_clip.start))
-                    clips.append(box_clip)
-                    
-                    # Recenter text relative to box (approx using clip.size if available, or just same baseline)
-                    if hasattr(sentence_clip, 'h'):
-                        pos = ('center', 0.75*h - sentence_clip.h / 2)
-                    else:
-                         pos = ('center', 0.75*h - 50) # fallback
-
-                sentence_clip = sentence_clip.set_position(pos)
-                clips.append(sentence_clip)
+                if style.has_box:
+                    # Every state drawn over the background box, text recentered relative to it
+                    sprites, x, y = self._boxed_sprites(layer, style, states, shape)
+                else:
+                    sprites = [layer.add_sprite(state, shape=shape) for state in states]
+                    x, y = None, 0.7*h
+
+                group = layer.place(sprites[0], sub['start'], sub['end'], y=y, x=x)
+                for w_obj, sprite in zip(words, sprites[1:]):
+                    layer.add_state(group, sprite, w_obj['start'], w_obj['end'])
                 
             except Exception as e:
-                print(f"Karaoke VideoClip Error: {e}")
+                print(f"Karaoke Sentence Error: {e}")
                 continue
-                
-        return clips
 
-    def _create_karaoke_sentence_clip(self, sub, font_path, fontsize, active_color, inactive_color, stroke_color, stroke_width, max_width, letter_spacing=0, line_spacing=0):
+    def _karaoke_sentence_rasterizer(self, sub, style: CompiledStyle) -> Tuple[Callable[[int], np.ndarray], Tuple[int, int]]:
         """
-        Creates a single VideoClip for the whole sentence that highlights words over time.
-        Uses cached font and pre-calculated layout to save memory.
+        Lays out a sentence that highlights words over time. Returns its drawing function
+        (index into sub['words'] of the highlighted word, -1 = none) and (h, w).
+        Uses the compiled style's font/metrics and a pre-calculated layout to save memory.
         """
         words = sub.get('words', [])
-        start_time = sub['start']
-        end_time = sub['end']
-        duration = end_time - start_time
         
-        fontsize = int(fontsize)
-        try:
-            font = ImageFont.truetype(font_path, fontsize)
-        except:
-            font = ImageFont.load_default()
+        font = style.font
+        active_color, inactive_color = style.color, style.inactive_color
+        stroke_color, stroke_width = style.stroke_color, style.stroke_width
+        letter_spacing, line_spacing = style.letter_spacing, style.line_spacing
+        max_width = style.max_width
             
         dummy_draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
         
         # --- PRE-CALCULATE LAYOUT (Once per sentence) ---
-        try:
-            ascent, descent = font.getmetrics()
-        except:
-            ascent, descent = fontsize, fontsize * 0.2
-        
-        line_height = ascent + descent
-        space_width = dummy_draw.textlength(" ", font=font) * 0.8 # Tighter spacing for karaoke
+        ascent = style.ascent
+        line_height = style.line_height
+        space_width = style.space_width * 0.8 # Tighter spacing for karaoke
         
         processed_words = []
         for w_obj in words:
             txt = w_obj.get('text') or w_obj.get('word')
             if not txt:
                 continue
-            base_w = dummy_draw.textlength(txt, font=font)
+            base_w = text_length(dummy_draw, txt, font)
             # Add spacing only between chars, so (len-1) * spacing
             char_spacing_total = (len(txt) - 1) * letter_spacing if len(txt) > 1 else 0
             w_width = base_w + char_spacing_total
@@ -569,36 +522,20 @@ class VideoRenderer:
         W = int(max_total_width + padding_x)
         H = int(total_content_height + padding_y)
         
-        # --- MAKE_FRAME FUNCTION ---
-        # --- MAKE_FRAME FUNCTION ---
-        # Cache to avoid double rendering (Color + Mask)
-        # Simple specific cache for this clip instance
-        last_render = {"t": -1, "img": None}
-        
-        def render_rgba(t):
-            # Check cache (allow small float tolerance)
-            if abs(t - last_render["t"]) < 0.0001 and last_render["img"] is not None:
-                return last_render["img"]
-                
-            # t is time relative to clip start
-            current_abs_time = start_time + t
-            
-            # Identify active word index
-            active_idx = -1
-            for i, w_obj in enumerate(words):
-                if w_obj['start'] <= current_abs_time <= w_obj['end']:
-                    active_idx = i
-                    break
-            
+        # --- STATE RASTERIZATION ---
+        # The overlay only changes when the active word does: each state is rasterized once
+        # (ahead of time by the producer during renders) and reused for every frame it covers.
+        def rasterize(active_idx):
+            # Fetched here, not captured: producer threads each get their own font objects
+            font = load_font(style.font_path, style.fontsize)
+
             # Create Frame
             img = Image.new('RGBA', (W, H), (0,0,0,0))
             draw = ImageDraw.Draw(img)
             
             start_y = 20 + stroke_width
-            
-            start_y = 20 + stroke_width
-            shadow_offset = (4, 4)
-            shadow_color = (0, 0, 0, 160)
+            shadow_offset = SHADOW_OFFSET
+            shadow_color = SHADOW_COLOR
 
             # Pass 1: Shadows
             current_baseline_y = start_y + ascent # First line baseline
@@ -650,42 +587,17 @@ class VideoRenderer:
                     current_x += pwm['width'] + space_width
                 
                 current_baseline_y += line_height + vertical_spacing
-            
-            # Update cache
-            last_render["t"] = t
-            last_render["img"] = img
-            return img
-
-        def make_frame(t):
-            img = render_rgba(t)
-            # Return RGB part (H, W, 3)
-            return np.array(img.convert('RGB')) 
-            # Note: convert('RGB') drops alpha and puts black background if transparent?
-            # actually we want the color channels as they are. 
-            # If we just do np.array(img)[:,:,:3], that's raw RGB. 
-            # If the background is (0,0,0,0), RGB is (0,0,0). Correct.
-            return np.array(img)[:, :, :3]
-
-        def make_mask(t):
-            img = render_rgba(t)
-            # Return Alpha channel normalized 0-1 (H, W)
-            # Alpha is index 3
-            return np.array(img)[:, :, 3] / 255.0
-            
-        # Create VideoClip
-        clip = VideoClip(make_frame, duration=duration)
-        
-        # Create Mask Clip
-        mask_clip = VideoClip(make_mask, duration=duration, ismask=True)
-        clip = clip.set_mask(mask_clip)
-        
-        clip = clip.set_start(start_time).set_end(end_time)
-        return clip
 
-    def generate_preview_frame(self, video_path: str, subtitles: List[Dict[str, Any]], style: str, style_config: Optional[Dict[str, Any]] = None, time: Optional[float] = None) -> Any:
+            return np.array(img)
+
+        return rasterize, (H, W)
+
+    def generate_preview_frame(self, video_path: str, subtitles: Subtitles, style: str, style_config: Optional[Dict[str, Any]] = None, time: Optional[float] = None) -> Any:
         """
         Generates a single frame preview.
         """
+        from moviepy.video.io.VideoFileClip import VideoFileClip
+        from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
         video = VideoFileClip(video_path)
         
         if time is None:
@@ -696,10 +608,15 @@ class VideoRenderer:
         
         # Find active sub or dummy
         active_sub = None
-        for sub in subtitles:
-            if sub['start'] <= time <= sub['end']:
-                active_sub = sub
-                break
+        if isinstance(subtitles, SubtitleTrack):
+            idx = subtitles.find_segment(time)
+            if idx >= 0:
+                active_sub = subtitles.segment(idx)
+        else:
+            for sub in subtitles:
+                if sub['start'] <= time <= sub['end']:
+                    active_sub = sub
+                    break
         
         if not active_sub:
              # Dummy
@@ -707,17 +624,9 @@ class VideoRenderer:
 
         preview_subs = [active_sub]
         
-        subtitle_clips = []
-        
-        if style_config and style_config.get("karaoke"):
-             subtitle_clips = self._create_karaoke_clips(preview_subs, video.size, style_config, base_style=style)
-        elif style == STYLE_BOLD_REEL:
-            subtitle_clips = self._create_bold_reel_clips(preview_subs, video.size, style_config)
-        elif style == STYLE_DYNAMIC_POP:
-            subtitle_clips = self._create_dynamic_pop_clips(preview_subs, video.size, style_config)
-        elif style == STYLE_MINIMALIST: # Added back since it was removed in previous logic
-            subtitle_clips = self._create_minimalist_clips(preview_subs, video.size, style_config)
-
+        # Memoized by config hash, so preview reruns with unchanged settings skip compilation
+        compiled = compile_style(style, style_config, video.size)
+        subtitle_clips = self._create_clips(preview_subs, compiled)
             
         try:
              valid_clips = [c for c in subtitle_clips if c.start <= time <= c.end]
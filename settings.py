@@ -1,10 +1,14 @@
+import hashlib
 import os
+import tempfile
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMP_DIR = os.path.join(BASE_DIR, "temp_files")
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
 FONTS_DIR = os.path.join(BASE_DIR, "fonts") # Ensure you have fonts here if not system installed
+CACHE_DIR = os.path.join(TEMP_DIR, "cache") # Transcripts & renders keyed by media content hash
+PROJECTS_DIR = os.path.join(BASE_DIR, "projects") # Saved edits per video (outside TEMP_DIR: survives purges)
 
 # Drive Config
 DRIVE_FOLDER_ID = "1lil9WjBv1yutMHl9YrTyUyIhVKnrCgv3"
@@ -13,6 +17,8 @@ DRIVE_FOLDER_ID = "1lil9WjBv1yutMHl9YrTyUyIhVKnrCgv3"
 os.makedirs(TEMP_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(FONTS_DIR, exist_ok=True)
+os.makedirs(CACHE_DIR, exist_ok=True)
+os.makedirs(PROJECTS_DIR, exist_ok=True)
 
 # Styles
 STYLE_BOLD_REEL = "The Bold Reel"
@@ -26,8 +32,70 @@ FONT_BOLD = os.path.join(FONTS_DIR, "Roboto-Bold.ttf")
 FONT_MINIMAL = os.path.join(FONTS_DIR, "Roboto-Regular.ttf")
 FONT_IMPACT = os.path.join(FONTS_DIR, "Anton-Regular.ttf")
 
+# Font choices offered under "Presets" (also used to resolve saved presets)
+PRESET_FONTS = {
+    "Roboto Bold": FONT_BOLD,
+    "Roboto Regular": FONT_MINIMAL,
+    "Anton Impact": FONT_IMPACT
+}
+
+# Families tried first for characters the caption font lacks (emoji, CJK, other scripts),
+# before any other installed font that covers them. Bitmap-only fonts (e.g. color emoji) can't be scaled and are skipped.
+FALLBACK_FAMILIES = [
+    "Noto Sans", "Noto Emoji", "Noto Sans CJK SC", "Noto Sans Arabic",
+    "Noto Sans Devanagari", "DejaVu Sans", "Arial Unicode MS", "Segoe UI Emoji",
+]
+
 # AI Models
 WHISPER_MODEL_SIZE = "medium"
+WHISPER_MODEL_SIZES = ["tiny", "base", "small", "medium", "large-v3"]
+WHISPER_DEVICE = "cpu"
+WHISPER_COMPUTE_TYPE = "int8"
+WHISPER_CPU_THREADS = int(os.environ.get("CAPTIONME_CPU_THREADS", 0)) # 0 = let CTranslate2 decide
+WHISPER_NUM_WORKERS = int(os.environ.get("CAPTIONME_NUM_WORKERS", 1))
+# Memory budget for loaded models (MB). Least recently used models are evicted beyond this.
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("CAPTIONME_MODEL_BUDGET_MB", 3000))
+
+# CPU threads this process hands out to transcription and render jobs (see cpu_scheduler.py)
+CPU_THREAD_BUDGET = int(os.environ.get("CAPTIONME_CPU_BUDGET", os.cpu_count() or 4))
+# libx264 gains little beyond a few threads at caption-video resolutions; leave the rest to other jobs
+RENDER_MAX_THREADS = int(os.environ.get("CAPTIONME_RENDER_THREADS", 4))
+# Caption overlays are rasterized ahead of the encoder by this many threads (capped by the render's lease),
+# holding at most OVERLAY_BUFFER_FRAMES finished or pending overlay frames
+OVERLAY_WORKERS = int(os.environ.get("CAPTIONME_OVERLAY_WORKERS", 2))
+OVERLAY_BUFFER_FRAMES = 32
+# Caption sprites are drawn when first shown; at most this many MB of them stay in memory (least recently shown dropped)
+SPRITE_CACHE_MB = 64
+
+# Shared transcription server (one process owns the models for all sessions, see transcription_service.py)
+TRANSCRIBE_SERVER = os.environ.get("CAPTIONME_TRANSCRIBE_SERVER", "1") == "1"
+# Kept outside TEMP_DIR so workspace purges never remove it; hashed per checkout
+TRANSCRIBE_SOCKET = os.environ.get(
+    "CAPTIONME_TRANSCRIBE_SOCKET",
+    os.path.join(tempfile.gettempdir(), f"captionme-{hashlib.sha1(BASE_DIR.encode()).hexdigest()[:10]}.sock")
+)
+TRANSCRIBE_SERVER_WORKERS = int(os.environ.get("CAPTIONME_TRANSCRIBE_WORKERS", 1))
+TRANSCRIBE_THREAD_BUDGET = int(os.environ.get("CAPTIONME_TRANSCRIBE_THREADS", max(1, CPU_THREAD_BUDGET // 2)))
+TRANSCRIBE_SERVER_IDLE_SECONDS = 1800 # Auto-started servers exit (freeing the models) after this long idle
+
+# Workspace quotas (MB, 0 = unlimited). Least recently used, unreferenced files are evicted beyond these.
+TEMP_QUOTA_MB = int(os.environ.get("CAPTIONME_TEMP_QUOTA_MB", 20000))
+OUTPUT_QUOTA_MB = int(os.environ.get("CAPTIONME_OUTPUT_QUOTA_MB", 20000))
+
+# Background jobs (shared by all sessions of this server process).
+# Actual CPU use is bounded by CPU_THREAD_BUDGET; this caps jobs in flight (including those waiting for CPU)
+MAX_CONCURRENT_JOBS = int(os.environ.get("CAPTIONME_MAX_JOBS", 8))
+JOB_RETENTION_SECONDS = 3600
+# Batch queue items to copy & transcribe ahead of the one being reviewed
+BATCH_PREFETCH_LOOKAHEAD = int(os.environ.get("CAPTIONME_PREFETCH", 1))
+
+# Subtitle editor rows sent to the browser at once (the rest are paged/searched server-side)
+EDITOR_PAGE_ROWS = 50
+# Project journal entries before the current state is written as a new snapshot
+PROJECT_COMPACT_OPS = 100
+
+# Presets
+PRESETS_FILE = "presets.json"
 
 # Video
 VIDEO_HEIGHT_VERTICAL = 1920
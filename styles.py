@@ -0,0 +1,151 @@
+import json
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
+from settings import (
+    STYLE_BOLD_REEL, STYLE_MINIMALIST, STYLE_DYNAMIC_POP,
+    FONT_BOLD, FONT_MINIMAL, FONT_IMPACT
+)
+from fonts import load_font, resolve_font_path
+
+RGBA = Tuple[int, int, int, int]
+
+# Defaults per base style (what each _create_*_clips method used to hard-code)
+STYLE_DEFAULTS = {
+    STYLE_BOLD_REEL: {"font": FONT_BOLD, "fontsize": 70, "color": "yellow", "stroke_color": "black", "stroke_width": 4},
+    STYLE_MINIMALIST: {"font": FONT_MINIMAL, "fontsize": 50, "color": "white", "stroke_color": "black", "stroke_width": 0},
+    STYLE_DYNAMIC_POP: {"font": FONT_IMPACT, "fontsize": 100, "color": "white", "stroke_color": "black", "stroke_width": 5},
+}
+KARAOKE_DEFAULTS = {
+    STYLE_BOLD_REEL: {"color": "yellow"},
+    STYLE_MINIMALIST: {"color": "white"},
+    STYLE_DYNAMIC_POP: {"color": "yellow"},
+}
+
+SHADOW_COLOR: RGBA = (0, 0, 0, 160)
+SHADOW_OFFSET = (4, 4)
+BOX_HEIGHT = 150 # Minimalist background box
+BOX_OPACITY = 0.6
+MAX_WIDTH_RATIO = 0.9
+
+
+class CompiledStyle(NamedTuple):
+    """
+    A base style + style_config resolved once per render: RGBA colors, loaded fonts,
+    font metrics and the Minimalist box sprite. Immutable and shared between renders
+    and preview reruns through compile_style's memo.
+    """
+    name: str
+    karaoke: bool
+    font_path: Optional[str]
+    fontsize: int
+    font: Any
+    small_font: Any # Dynamic Pop full-text fallback (80% size)
+    small_fontsize: int
+    ascent: int
+    descent: int
+    line_height: int
+    space_width: float
+    color: RGBA
+    inactive_color: RGBA
+    stroke_color: Optional[RGBA]
+    stroke_width: int
+    letter_spacing: float
+    line_spacing: float
+    video_size: Tuple[int, int]
+    max_width: int
+    box: Optional[np.ndarray] # (BOX_HEIGHT, w, 4) premultiplied RGBA (0-1 floats), shared by every caption
+
+    @property
+    def has_box(self) -> bool:
+        return self.box is not None
+
+
+def _color(value: Any, default: str) -> RGBA:
+    try:
+        return ImageColor.getcolor(str(value), "RGBA")
+    except ValueError:
+        print(f"Unknown color {value!r}, using {default}")
+        return ImageColor.getcolor(default, "RGBA")
+
+
+def style_params(style: str, style_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Flattens base style defaults + style_config into the values a render actually uses."""
+    config = style_config or {}
+    karaoke = bool(config.get("karaoke"))
+    if style not in STYLE_DEFAULTS:
+        style = STYLE_BOLD_REEL
+    params = dict(STYLE_DEFAULTS[style])
+    params.update({"letter_spacing": 0, "line_spacing": 0, "inactive_color": "white"})
+    if karaoke:
+        params.update(KARAOKE_DEFAULTS[style])
+
+    for key in ("font", "fontsize", "color"):
+        params[key] = config.get(key, params[key])
+    if karaoke:
+        params["inactive_color"] = config.get("inactive_color", params["inactive_color"])
+    # Minimalist captions are never stroked; spacing only applies to Bold Reel and karaoke
+    if karaoke or style != STYLE_MINIMALIST:
+        params["stroke_color"] = config.get("stroke_color", params["stroke_color"])
+        params["stroke_width"] = config.get("stroke_width", params["stroke_width"])
+    if karaoke or style == STYLE_BOLD_REEL:
+        params["letter_spacing"] = config.get("letter_spacing", 0)
+        params["line_spacing"] = config.get("line_spacing", 0)
+
+    params["name"] = style
+    params["karaoke"] = karaoke
+    # Resolve now so a font downloaded later produces a new compiled style
+    params["font"] = resolve_font_path(params["font"])
+    return params
+
+
+def compile_style(style: str, style_config: Optional[Dict[str, Any]], video_size: Tuple[int, int]) -> CompiledStyle:
+    """Compiles (memoized by config hash and video size)."""
+    key = json.dumps(style_params(style, style_config), sort_keys=True, default=str)
+    return _compile(key, tuple(int(v) for v in video_size))
+
+
+@lru_cache(maxsize=32)
+def _compile(params_json: str, video_size: Tuple[int, int]) -> CompiledStyle:
+    params = json.loads(params_json)
+    w, _ = video_size
+    fontsize = int(params["fontsize"])
+    small_fontsize = int(float(params["fontsize"]) * 0.8)
+    font = load_font(params["font"], fontsize)
+    try:
+        ascent, descent = font.getmetrics()
+    except Exception:
+        ascent, descent = fontsize, int(fontsize * 0.2)
+    dummy_draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+
+    stroke_width = int(params["stroke_width"])
+    box = None
+    if params["name"] == STYLE_MINIMALIST:
+        # Black at BOX_OPACITY: premultiplied, the color channels stay 0
+        box = np.zeros((BOX_HEIGHT, w, 4), dtype=np.float32)
+        box[:, :, 3] = BOX_OPACITY
+        box.setflags(write=False)
+
+    return CompiledStyle(
+        name=params["name"],
+        karaoke=params["karaoke"],
+        font_path=params["font"],
+        fontsize=fontsize,
+        font=font,
+        small_font=load_font(params["font"], small_fontsize),
+        small_fontsize=small_fontsize,
+        ascent=ascent,
+        descent=descent,
+        line_height=ascent + descent,
+        space_width=dummy_draw.textlength(" ", font=font),
+        color=_color(params["color"], STYLE_DEFAULTS[params["name"]]["color"]),
+        inactive_color=_color(params["inactive_color"], "white"),
+        stroke_color=_color(params["stroke_color"], "black") if stroke_width else None,
+        stroke_width=stroke_width,
+        letter_spacing=params["letter_spacing"] or 0,
+        line_spacing=params["line_spacing"] or 0,
+        video_size=video_size,
+        max_width=int(w * MAX_WIDTH_RATIO),
+        box=box,
+    )
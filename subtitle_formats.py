@@ -0,0 +1,355 @@
+"""
+Caption files in and out: SubRip (.srt), WebVTT (.vtt), Advanced SubStation (.ass/.ssa)
+and CaptionME word JSON (.json, keeps per-word timings).
+
+Imports return the segment dicts Transcriber.transcribe_video returns (start, end, text,
+words), so existing captions replace the Whisper pass entirely. Cues without word timings
+get their words spread over the cue by character length; VTT inline timestamps and ASS
+\\k karaoke tags become real word timings.
+
+Exports iterate the segments one at a time (a SubtitleTrack yields them lazily) and write
+them straight to a .part file, so a long transcript is never built as one string.
+"""
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+FORMATS = {
+    "srt": ".srt",
+    "vtt": ".vtt",
+    "ass": ".ass",
+    "json": ".json",
+}
+EXTENSIONS = {".srt": "srt", ".vtt": "vtt", ".ass": "ass", ".ssa": "ass", ".json": "json"}
+JSON_FORMAT_NAME = "captionme-words"
+
+Segment = Dict[str, Any]
+Chunk = Tuple[str, float, float] # text with its own start/end
+
+_TAG_RE = re.compile(r"<[^>]*>")
+_ASS_BLOCK_RE = re.compile(r"\{([^}]*)\}")
+_ASS_KARAOKE_RE = re.compile(r"\\[kK][fo]?(\d+)")
+_VTT_INLINE_TIME_RE = re.compile(r"<((?:\d+:)?\d{1,2}:\d{2}\.\d{3})>")
+_CUE_TIME_RE = re.compile(
+    r"((?:\d+:)?\d{1,2}:\d{2}[,.]\d{1,3})\s*-->\s*((?:\d+:)?\d{1,2}:\d{2}[,.]\d{1,3})"
+)
+
+
+def format_for(path: str) -> str:
+    """Format name from a file extension. Raises ValueError for unsupported files."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in EXTENSIONS:
+        raise ValueError(f"Unsupported caption file '{os.path.basename(path)}' (expected {', '.join(sorted(EXTENSIONS))})")
+    return EXTENSIONS[ext]
+
+
+# --- Timestamps ---
+
+def parse_timestamp(value: str) -> float:
+    """'01:02:03,456', '02:03.456' (VTT) or '1:02:03.45' (ASS) -> seconds."""
+    parts = value.strip().replace(",", ".").split(":")
+    seconds = float(parts[-1])
+    for i, part in enumerate(reversed(parts[:-1])):
+        seconds += int(part) * 60 ** (i + 1)
+    return seconds
+
+
+def _split_time(t: float, scale: int) -> Tuple[int, int, int, int]:
+    units = max(0, int(round(t * scale)))
+    seconds, frac = divmod(units, scale)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return hours, minutes, seconds, frac
+
+
+def format_srt_time(t: float) -> str:
+    return "%02d:%02d:%02d,%03d" % _split_time(t, 1000)
+
+
+def format_vtt_time(t: float) -> str:
+    return "%02d:%02d:%02d.%03d" % _split_time(t, 1000)
+
+
+def format_ass_time(t: float) -> str:
+    return "%d:%02d:%02d.%02d" % _split_time(t, 100)
+
+
+# --- Words from timed text ---
+
+def timed_words(chunks: Iterable[Chunk]) -> List[Dict[str, Any]]:
+    """
+    Words with timings from consecutive timed chunks of a cue. A chunk holding several
+    words shares its span between them by character length; a word split across chunks
+    (ASS syllables) spans all of them.
+    """
+    words: List[Dict[str, Any]] = []
+    glue = False # the last chunk ended inside a word
+    for text, start, end in chunks:
+        tokens = text.split()
+        if not tokens:
+            glue = False
+            continue
+        total = sum(len(tok) for tok in tokens)
+        cursor = start
+        for i, tok in enumerate(tokens):
+            tok_end = cursor + (end - start) * len(tok) / total
+            if i == 0 and glue and words and not text[0].isspace():
+                words[-1]["word"] += tok
+                words[-1]["end"] = tok_end
+            else:
+                # Leading space, as in Whisper's word strings
+                words.append({"word": " " + tok, "start": cursor, "end": tok_end, "probability": 1.0})
+            cursor = tok_end
+        glue = not text[-1].isspace()
+    return words
+
+
+def make_segment(start: float, end: float, chunks: List[Chunk]) -> Optional[Segment]:
+    """A transcribe_video style segment from a cue's timed chunks (None for an empty cue)."""
+    words = timed_words(chunks)
+    if not words:
+        return None
+    return {
+        "start": start,
+        "end": end,
+        "text": " ".join(w["word"].strip() for w in words),
+        "words": words,
+    }
+
+
+def _clean(text: str) -> str:
+    """Cue markup removed: HTML-ish tags, stray ASS override blocks, line breaks -> spaces."""
+    text = _ASS_BLOCK_RE.sub("", _TAG_RE.sub("", text))
+    return text.replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">").replace("&nbsp;", " ")
+
+
+# --- Import ---
+
+def _blocks(text: str) -> List[List[str]]:
+    blocks, current = [], []
+    for line in text.splitlines():
+        if line.strip():
+            current.append(line.rstrip())
+        elif current:
+            blocks.append(current)
+            current = []
+    if current:
+        blocks.append(current)
+    return blocks
+
+
+def parse_srt(text: str) -> List[Segment]:
+    segments = []
+    for block in _blocks(text):
+        for i, line in enumerate(block):
+            match = _CUE_TIME_RE.search(line)
+            if match:
+                start, end = parse_timestamp(match.group(1)), parse_timestamp(match.group(2))
+                segment = make_segment(start, end, [(" ".join(_clean(l) for l in block[i + 1:]), start, end)])
+                if segment:
+                    segments.append(segment)
+                break
+    return segments
+
+
+def parse_vtt(text: str) -> List[Segment]:
+    segments = []
+    for block in _blocks(text.lstrip("\ufeff")):
+        if block[0].startswith(("WEBVTT", "NOTE", "STYLE", "REGION")):
+            continue
+        for i, line in enumerate(block):
+            match = _CUE_TIME_RE.search(line)
+            if not match:
+                continue
+            start, end = parse_timestamp(match.group(1)), parse_timestamp(match.group(2))
+            # Inline <00:00:01.500> timestamps mark where the following text starts (word-level cues)
+            parts = _VTT_INLINE_TIME_RE.split(" ".join(block[i + 1:]))
+            times = [start] + [parse_timestamp(t) for t in parts[1::2]] + [end]
+            chunks = [(_clean(chunk), times[j], times[j + 1]) for j, chunk in enumerate(parts[0::2])]
+            segment = make_segment(start, end, chunks)
+            if segment:
+                segments.append(segment)
+            break
+    return segments
+
+
+def _ass_chunks(text: str, start: float, end: float) -> List[Chunk]:
+    """Splits ASS dialogue text at \\k tags (centiseconds per syllable) into timed chunks."""
+    text = text.replace("\\N", " ").replace("\\n", " ").replace("\\h", " ")
+    chunks: List[Chunk] = []
+    cursor = start
+    pending = None # duration of the syllable that follows the last \k tag
+    pos = 0
+    for match in _ASS_BLOCK_RE.finditer(text + "{}"):
+        piece = text[pos:match.start()]
+        pos = match.end()
+        if piece:
+            if pending is None:
+                chunks.append((piece, cursor, cursor))
+            else:
+                chunks.append((piece, cursor, min(end, cursor + pending)))
+                cursor = min(end, cursor + pending)
+                pending = None
+        karaoke = _ASS_KARAOKE_RE.findall(match.group(1))
+        if karaoke:
+            pending = sum(int(k) for k in karaoke) / 100.0
+    if all(s == e for _, s, e in chunks):
+        # No karaoke timing: the whole line spans the event
+        return [("".join(piece for piece, _, _ in chunks), start, end)]
+    return chunks
+
+
+def parse_ass(text: str) -> List[Segment]:
+    segments = []
+    fields: Optional[List[str]] = None
+    in_events = False
+    for line in text.lstrip("\ufeff").splitlines():
+        line = line.strip()
+        if line.startswith("["):
+            in_events = line.lower() == "[events]"
+            continue
+        if not in_events:
+            continue
+        if line.lower().startswith("format:"):
+            fields = [f.strip().lower() for f in line.split(":", 1)[1].split(",")]
+        elif line.lower().startswith("dialogue:") and fields:
+            values = line.split(":", 1)[1].split(",", len(fields) - 1)
+            if len(values) < len(fields):
+                continue
+            event = dict(zip(fields, values))
+            start, end = parse_timestamp(event["start"]), parse_timestamp(event["end"])
+            segment = make_segment(start, end, _ass_chunks(event["text"], start, end))
+            if segment:
+                segments.append(segment)
+    segments.sort(key=lambda s: s["start"])
+    return segments
+
+
+def parse_word_json(text: str) -> List[Segment]:
+    """CaptionME word JSON ({"segments": [...]}) or a bare list of transcribe_video segments."""
+    data = json.loads(text)
+    raw = data.get("segments", []) if isinstance(data, dict) else data
+    segments = []
+    for seg in raw:
+        start, end = float(seg["start"]), float(seg["end"])
+        words = [
+            {"word": w.get("word") or w.get("text") or "", "start": float(w["start"]), "end": float(w["end"]),
+             "probability": float(w.get("probability", 1.0))}
+            for w in seg.get("words") or []
+        ]
+        if not words:
+            segment = make_segment(start, end, [(str(seg.get("text", "")), start, end)])
+            if segment:
+                segments.append(segment)
+            continue
+        text_value = seg.get("text")
+        segments.append({
+            "start": start,
+            "end": end,
+            "text": str(text_value) if text_value is not None else " ".join(w["word"].strip() for w in words),
+            "words": words,
+        })
+    return segments
+
+
+PARSERS = {"srt": parse_srt, "vtt": parse_vtt, "ass": parse_ass, "json": parse_word_json}
+
+
+def parse_subtitles(text: str, fmt: str) -> List[Segment]:
+    return PARSERS[fmt](text)
+
+
+def load_subtitles(path: str, fmt: Optional[str] = None) -> List[Segment]:
+    """Reads a caption file into transcribe_video style segments."""
+    fmt = fmt or format_for(path)
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        return parse_subtitles(f.read(), fmt)
+
+
+def find_sidecar(video_path: str) -> Optional[str]:
+    """A caption file next to the video with the same base name (video.srt, video.vtt, ...), if any."""
+    root = os.path.splitext(video_path)[0]
+    for ext in EXTENSIONS:
+        if os.path.exists(root + ext):
+            return root + ext
+    return None
+
+
+# --- Export ---
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: {width}
+PlayResY: {height}
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Roboto,70,&H00FFFFFF,&H0000FFFF,&H00000000,&H80000000,-1,0,0,0,100,100,0,0,1,4,2,2,60,60,300,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def _write_srt(f, subtitles: Iterable[Segment]):
+    for i, sub in enumerate(subtitles, 1):
+        f.write(f"{i}\n{format_srt_time(sub['start'])} --> {format_srt_time(sub['end'])}\n{sub['text']}\n\n")
+
+
+def _write_vtt(f, subtitles: Iterable[Segment]):
+    f.write("WEBVTT\n\n")
+    for sub in subtitles:
+        # "-->" inside cue text would end the cue
+        text = sub["text"].replace("-->", "->")
+        f.write(f"{format_vtt_time(sub['start'])} --> {format_vtt_time(sub['end'])}\n{text}\n\n")
+
+
+def _write_ass(f, subtitles: Iterable[Segment], video_size: Tuple[int, int]):
+    f.write(ASS_HEADER.format(width=video_size[0], height=video_size[1]))
+    for sub in subtitles:
+        # Braces would start override blocks
+        text = sub["text"].replace("{", "(").replace("}", ")").replace("\n", "\\N")
+        f.write(f"Dialogue: 0,{format_ass_time(sub['start'])},{format_ass_time(sub['end'])},Default,,0,0,0,,{text}\n")
+
+
+def _write_json(f, subtitles: Iterable[Segment]):
+    f.write('{"format": "%s", "version": 1, "segments": [' % JSON_FORMAT_NAME)
+    for i, sub in enumerate(subtitles):
+        f.write(",\n" if i else "\n")
+        f.write(json.dumps({
+            "start": float(sub["start"]),
+            "end": float(sub["end"]),
+            "text": sub["text"],
+            "words": [
+                {"word": w.get("word") or w.get("text") or "", "start": float(w["start"]), "end": float(w["end"]),
+                 "probability": float(w.get("probability", 1.0))}
+                for w in sub.get("words") or []
+            ],
+        }, ensure_ascii=False))
+    f.write("\n]}\n")
+
+
+def write_subtitles(subtitles: Iterable[Segment], path: str, fmt: Optional[str] = None,
+                    video_size: Tuple[int, int] = (1080, 1920)) -> str:
+    """
+    Streams subtitles (a SubtitleTrack or segment dicts) to path in the given format
+    (default: from the extension). The file appears atomically via a .part file.
+    """
+    fmt = fmt or format_for(path)
+    partial_path = path + ".part"
+    with open(partial_path, "w", encoding="utf-8", newline="\n") as f:
+        if fmt == "srt":
+            _write_srt(f, subtitles)
+        elif fmt == "vtt":
+            _write_vtt(f, subtitles)
+        elif fmt == "ass":
+            _write_ass(f, subtitles, video_size)
+        elif fmt == "json":
+            _write_json(f, subtitles)
+        else:
+            raise ValueError(f"Unknown caption format {fmt!r}")
+    os.replace(partial_path, path)
+    return path
@@ -0,0 +1,290 @@
+import hashlib
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Iterator
+import numpy as np
+from regrouper import START, END, PROB
+from aligner import realign_words
+
+
+def _pack(strings: Sequence[str]) -> Tuple[str, np.ndarray]:
+    """Packs strings into one buffer plus an offsets array of len(strings) + 1."""
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    if strings:
+        np.cumsum([len(s) for s in strings], out=offsets[1:])
+    return "".join(strings), offsets
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+class SubtitleTrack:
+    """
+    Columnar subtitle model.
+
+    Words live in flat arrays: word_times (N, 3) holds start, end, probability and the
+    word strings are packed into one text buffer with an offsets array. Segments are
+    (first, last+1) index ranges into the word arrays plus their own times and text.
+    Iterating yields the classic segment dicts, so the renderer can consume it directly.
+    """
+
+    def __init__(self, word_times: np.ndarray, word_buf: str, word_offsets: np.ndarray,
+                 seg_words: np.ndarray, seg_times: np.ndarray, seg_buf: str, seg_offsets: np.ndarray):
+        self.word_times = word_times
+        self.word_buf = word_buf
+        self.word_offsets = word_offsets
+        self.seg_words = seg_words
+        self.seg_times = seg_times
+        self.seg_buf = seg_buf
+        self.seg_offsets = seg_offsets
+
+    # --- Construction ---
+
+    @classmethod
+    def empty(cls) -> "SubtitleTrack":
+        return cls.from_words([], np.empty((0, 3)), [])
+
+    @classmethod
+    def from_words(cls, texts: Sequence[str], times: np.ndarray, ranges: Sequence[Tuple[int, int]],
+                   seg_texts: Optional[Sequence[str]] = None, seg_times: Optional[np.ndarray] = None) -> "SubtitleTrack":
+        """Builds a track from cached word timings and regrouper index ranges."""
+        word_buf, word_offsets = _pack(list(texts))
+        seg_words = np.asarray(ranges, dtype=np.int64).reshape(-1, 2)
+        word_times = np.asarray(times, dtype=np.float64).reshape(-1, 3)
+        if seg_texts is None:
+            seg_texts = [" ".join(t.strip() for t in texts[a:b]) for a, b in seg_words]
+        if seg_times is None:
+            seg_times = np.empty((len(seg_words), 2), dtype=np.float64)
+            if len(seg_words):
+                seg_times[:, 0] = word_times[seg_words[:, 0], START]
+                seg_times[:, 1] = word_times[seg_words[:, 1] - 1, END]
+        seg_buf, seg_offsets = _pack(list(seg_texts))
+        return cls(word_times, word_buf, word_offsets, seg_words,
+                   np.asarray(seg_times, dtype=np.float64).reshape(-1, 2), seg_buf, seg_offsets)
+
+    @classmethod
+    def from_segments(cls, segments: Sequence[Dict[str, Any]]) -> "SubtitleTrack":
+        """Builds a track from the segment dicts returned by Transcriber.transcribe_video."""
+        texts: List[str] = []
+        rows: List[Tuple[float, float, float]] = []
+        ranges = []
+        seg_texts = []
+        seg_times = np.empty((len(segments), 2), dtype=np.float64)
+        for i, sub in enumerate(segments):
+            first = len(texts)
+            for w in sub.get('words') or []:
+                texts.append(w.get('word') or w.get('text') or "")
+                rows.append((w['start'], w['end'], w.get('probability', 1.0)))
+            ranges.append((first, len(texts)))
+            seg_texts.append(str(sub.get('text', '') or ""))
+            seg_times[i] = (sub['start'], sub['end'])
+        times = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        return cls.from_words(texts, times, ranges, seg_texts=seg_texts, seg_times=seg_times)
+
+    def copy(self) -> "SubtitleTrack":
+        return SubtitleTrack(self.word_times.copy(), self.word_buf, self.word_offsets,
+                             self.seg_words, self.seg_times.copy(), self.seg_buf, self.seg_offsets)
+
+    def slice(self, first: int, last: int) -> "SubtitleTrack":
+        """Segments [first, last) and their words as a new track (array slices, no per-row work)."""
+        first, last = max(0, first), min(len(self), last)
+        if first >= last:
+            return SubtitleTrack.empty()
+        a, b = int(self.seg_words[first, 0]), int(self.seg_words[last - 1, 1])
+        word_offsets = self.word_offsets[a:b + 1]
+        seg_offsets = self.seg_offsets[first:last + 1]
+        return SubtitleTrack(
+            self.word_times[a:b],
+            self.word_buf[word_offsets[0]:word_offsets[-1]],
+            word_offsets - word_offsets[0],
+            self.seg_words[first:last] - a,
+            self.seg_times[first:last],
+            self.seg_buf[seg_offsets[0]:seg_offsets[-1]],
+            seg_offsets - seg_offsets[0],
+        )
+
+    @classmethod
+    def concat(cls, tracks: Sequence["SubtitleTrack"]) -> "SubtitleTrack":
+        """Joins tracks end to end (segment and word indices are shifted, nothing is re-parsed)."""
+        tracks = [t for t in tracks if len(t) or t.n_words]
+        if not tracks:
+            return cls.empty()
+        word_shift = np.cumsum([0] + [t.n_words for t in tracks[:-1]])
+        word_char_shift = np.cumsum([0] + [len(t.word_buf) for t in tracks[:-1]])
+        seg_char_shift = np.cumsum([0] + [len(t.seg_buf) for t in tracks[:-1]])
+        return cls(
+            np.concatenate([t.word_times for t in tracks]),
+            "".join(t.word_buf for t in tracks),
+            np.concatenate([[0]] + [t.word_offsets[1:] + shift for t, shift in zip(tracks, word_char_shift)]).astype(np.int64),
+            np.concatenate([t.seg_words + shift for t, shift in zip(tracks, word_shift)]).reshape(-1, 2),
+            np.concatenate([t.seg_times for t in tracks]).reshape(-1, 2),
+            "".join(t.seg_buf for t in tracks),
+            np.concatenate([[0]] + [t.seg_offsets[1:] + shift for t, shift in zip(tracks, seg_char_shift)]).astype(np.int64),
+        )
+
+    # --- Access ---
+
+    def __len__(self) -> int:
+        return len(self.seg_words)
+
+    @property
+    def n_words(self) -> int:
+        return len(self.word_times)
+
+    def word_text(self, i: int) -> str:
+        return self.word_buf[self.word_offsets[i]:self.word_offsets[i + 1]]
+
+    def segment_text(self, i: int) -> str:
+        return self.seg_buf[self.seg_offsets[i]:self.seg_offsets[i + 1]]
+
+    def segment_word_texts(self, i: int) -> List[str]:
+        first, last = self.seg_words[i]
+        return [self.word_text(j) for j in range(first, last)]
+
+    def segment(self, i: int) -> Dict[str, Any]:
+        """Materializes one segment as the classic dict (with its words list)."""
+        first, last = self.seg_words[i]
+        return {
+            "start": float(self.seg_times[i, 0]),
+            "end": float(self.seg_times[i, 1]),
+            "text": self.segment_text(i),
+            "words": [
+                {
+                    "word": self.word_text(j),
+                    "start": float(self.word_times[j, START]),
+                    "end": float(self.word_times[j, END]),
+                    "probability": float(self.word_times[j, PROB])
+                }
+                for j in range(first, last)
+            ]
+        }
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.segment(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self.segment(i)
+
+    def content_hash(self) -> str:
+        """Stable hash of all timings and text (used as a render cache key)."""
+        digest = hashlib.sha256()
+        for arr in (self.word_times, self.word_offsets, self.seg_words, self.seg_times, self.seg_offsets):
+            digest.update(np.ascontiguousarray(arr).tobytes())
+        digest.update(self.word_buf.encode("utf-8"))
+        digest.update(self.seg_buf.encode("utf-8"))
+        return digest.hexdigest()
+
+    def to_segments(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+    def find_segment(self, t: float) -> int:
+        """Index of the first segment with start <= t <= end, or -1."""
+        hits = np.flatnonzero((self.seg_times[:, 0] <= t) & (t <= self.seg_times[:, 1]))
+        return int(hits[0]) if len(hits) else -1
+
+    def segment_at(self, t: float) -> int:
+        """Index of the segment playing at t, else the first one starting after it (for jumping the editor)."""
+        if not len(self):
+            return 0
+        hit = self.find_segment(t)
+        if hit >= 0:
+            return hit
+        return min(int(np.searchsorted(self.seg_times[:, 0], t)), len(self) - 1)
+
+    def search(self, query: str) -> np.ndarray:
+        """Indices of segments whose text contains query (case-insensitive), in order."""
+        query = query.strip().lower()
+        if not query or not len(self):
+            return np.empty(0, dtype=np.int64)
+        buf = self.seg_buf.lower()
+        if len(buf) != len(self.seg_buf):
+            # Lowercasing changed string lengths (rare scripts), offsets no longer line up
+            return np.array([i for i in range(len(self)) if query in self.segment_text(i).lower()], dtype=np.int64)
+        positions = []
+        pos = buf.find(query)
+        while pos != -1:
+            positions.append(pos)
+            pos = buf.find(query, pos + 1)
+        if not positions:
+            return np.empty(0, dtype=np.int64)
+        starts = np.asarray(positions, dtype=np.int64)
+        segs = np.searchsorted(self.seg_offsets, starts, side="right") - 1
+        # Drop matches that run across the boundary into the next segment's text
+        inside = starts + len(query) <= self.seg_offsets[segs + 1]
+        return np.unique(segs[inside])
+
+    # --- Editor round trip ---
+
+    def to_editor_rows(self, first: int = 0, last: Optional[int] = None):
+        """
+        Flat rows for st.data_editor: id, start, end, text (no nested word lists).
+        Keep the id column (hidden in the grid) so edits can be mapped back to word ranges.
+        first/last select a window of segments; ids stay global.
+        """
+        import pandas as pd
+        first = max(0, first)
+        last = len(self) if last is None else min(len(self), last)
+        last = max(first, last)
+        return pd.DataFrame({
+            "id": np.arange(first, last, dtype=np.int64),
+            "start": self.seg_times[first:last, 0],
+            "end": self.seg_times[first:last, 1],
+            "text": [self.segment_text(i) for i in range(first, last)],
+        })
+
+    def apply_editor_rows(self, rows, realign: bool = True) -> "SubtitleTrack":
+        """
+        Builds a new track from edited editor rows (DataFrame or list of row dicts).
+        Rows keep the words of the segment named by their id; words of deleted rows are dropped.
+        With realign, rows whose text changed (and added rows) get their words re-aligned
+        to the cached timings instead of keeping stale ones.
+        """
+        if hasattr(rows, "to_dict"):
+            rows = rows.to_dict("records")
+
+        word_texts: List[str] = []
+        time_chunks = []
+        ranges = []
+        seg_texts = []
+        seg_times = np.empty((len(rows), 2), dtype=np.float64)
+        for i, row in enumerate(rows):
+            start = 0.0 if _is_missing(row.get('start')) else float(row['start'])
+            end = start if _is_missing(row.get('end')) else float(row['end'])
+            text = "" if _is_missing(row.get('text')) else str(row['text'])
+            seg_times[i] = (start, end)
+            seg_texts.append(text)
+
+            seg_id = row.get('id')
+            first = len(word_texts)
+            if not _is_missing(seg_id) and 0 <= int(seg_id) < len(self):
+                seg_id = int(seg_id)
+                a, b = self.seg_words[seg_id]
+                old_words = self.segment_word_texts(seg_id)
+                if realign and text != self.segment_text(seg_id):
+                    new_words, new_times = realign_words(old_words, self.word_times[a:b], text, start, end)
+                else:
+                    new_words, new_times = old_words, self.word_times[a:b]
+            elif realign and text:
+                new_words, new_times = realign_words([], self.word_times[:0], text, start, end)
+            else:
+                new_words, new_times = [], self.word_times[:0]
+            word_texts.extend(new_words)
+            time_chunks.append(new_times)
+            ranges.append((first, len(word_texts)))
+
+        times = np.concatenate(time_chunks) if time_chunks else np.empty((0, 3))
+        return SubtitleTrack.from_words(word_texts, times, ranges, seg_texts=seg_texts, seg_times=seg_times)
+
+    def splice_editor_rows(self, rows, first: int, last: int, realign: bool = True) -> "SubtitleTrack":
+        """
+        Replaces segments [first, last) with edited editor rows (see apply_editor_rows) and
+        keeps everything outside the window as is. Cost depends on the window, not the
+        transcript length (beyond copying the arrays).
+        """
+        first, last = max(0, first), min(len(self), last)
+        window = self.apply_editor_rows(rows, realign=realign)
+        return SubtitleTrack.concat([self.slice(0, first), window, self.slice(last, len(self))])
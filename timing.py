@@ -0,0 +1,96 @@
+from typing import Optional, Sequence, Tuple
+import numpy as np
+from subtitle_track import SubtitleTrack
+
+
+def stretch_for_fps(source_fps: float, target_fps: float) -> float:
+    """Stretch factor for a frame-rate conversion, e.g. 25 -> 23.976 gives ~1.0427."""
+    return float(source_fps) / float(target_fps)
+
+
+def _piecewise(t: np.ndarray, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """
+    Piecewise-linear map through anchor points (src[i] -> dst[i]).
+    One anchor is a constant shift. Outside the anchors the first/last segment slope is extended.
+    """
+    if len(src) == 1:
+        return t + (dst[0] - src[0])
+    out = np.interp(t, src, dst)
+    lo_slope = (dst[1] - dst[0]) / (src[1] - src[0])
+    hi_slope = (dst[-1] - dst[-2]) / (src[-1] - src[-2])
+    below = t < src[0]
+    above = t > src[-1]
+    out[below] = dst[0] + (t[below] - src[0]) * lo_slope
+    out[above] = dst[-1] + (t[above] - src[-1]) * hi_slope
+    return out
+
+
+def map_times(t: np.ndarray, offset: float = 0.0, stretch: float = 1.0,
+              anchors: Optional[Sequence[Tuple[float, float]]] = None) -> np.ndarray:
+    """Applies stretch, then offset, then anchor drift correction to an array of times."""
+    out = t * stretch + offset if stretch != 1.0 else t + offset
+    if anchors:
+        pts = np.array(sorted(anchors), dtype=np.float64).reshape(-1, 2)
+        # Duplicate source times would make the slope undefined; keep the last one
+        _, keep = np.unique(pts[::-1, 0], return_index=True)
+        pts = pts[::-1][keep]
+        out = _piecewise(out, pts[:, 0], pts[:, 1])
+    return out
+
+
+def _remove_overlaps(starts: np.ndarray, ends: np.ndarray) -> None:
+    """Trims each interval's end to the next interval's start (in start order), in place."""
+    if len(starts) < 2:
+        return
+    order = np.argsort(starts, kind="stable")
+    s = starts[order]
+    e = ends[order]
+    e[:-1] = np.minimum(e[:-1], s[1:])
+    ends[order] = np.maximum(e, s)
+
+
+def transform_times(track: SubtitleTrack, offset: float = 0.0, stretch: float = 1.0,
+                    anchors: Optional[Sequence[Tuple[float, float]]] = None,
+                    duration: Optional[float] = None, fix_overlaps: bool = True) -> SubtitleTrack:
+    """
+    Returns a copy of `track` with every word and segment time remapped in one vectorized pass.
+
+    offset:   constant shift in seconds (positive = later).
+    stretch:  linear scale around 0, e.g. stretch_for_fps(25, 23.976).
+    anchors:  (current_time, correct_time) pairs for piecewise drift correction.
+    duration: clamp all times to [0, duration] (clamped at 0 regardless).
+    fix_overlaps: trim segments (and words) so they don't overlap the next one.
+    """
+    out = track.copy()
+    words = out.word_times[:, :2]
+    words[:] = map_times(words, offset, stretch, anchors)
+    out.seg_times[:] = map_times(out.seg_times, offset, stretch, anchors)
+
+    upper = np.inf if duration is None else float(duration)
+    np.clip(words, 0.0, upper, out=words)
+    np.clip(out.seg_times, 0.0, upper, out=out.seg_times)
+
+    if fix_overlaps:
+        _remove_overlaps(out.seg_times[:, 0], out.seg_times[:, 1])
+        _remove_overlaps(words[:, 0], words[:, 1])
+    return out
+
+
+def parse_anchors(text: str) -> Sequence[Tuple[float, float]]:
+    """
+    Parses anchor lines like "12.5 = 13.1" or "12.5, 13.1" (current -> correct, seconds).
+    Raises ValueError on malformed lines.
+    """
+    anchors = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        for sep in ("=", "->", ",", " "):
+            if sep in line:
+                left, right = line.split(sep, 1)
+                anchors.append((float(left), float(right)))
+                break
+        else:
+            raise ValueError(f"Invalid anchor line: {line!r}")
+    return anchors
@@ -0,0 +1,357 @@
+"""
+Local transcription service: one process owns the Whisper models for every Streamlit
+session and worker process on the machine.
+
+    python -m transcription_service                 # run in the foreground
+    python -m transcription_service --workers 2 --threads 8
+
+Clients talk to it over a Unix socket (multiprocessing.connection, authenticated with a
+key file only the current user can read). The app starts it on demand through
+get_transcription_client(), so running it by hand is optional.
+"""
+import argparse
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from settings import (
+    BASE_DIR, WHISPER_MODEL_SIZE, WHISPER_COMPUTE_TYPE, TRANSCRIBE_SERVER, TRANSCRIBE_SOCKET,
+    TRANSCRIBE_SERVER_WORKERS, TRANSCRIBE_THREAD_BUDGET, TRANSCRIBE_SERVER_IDLE_SECONDS
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: no AF_UNIX listener, the app transcribes in-process
+    fcntl = None
+
+# A queued request for a model that isn't loaded waits at most this long while
+# requests for already loaded models go first
+MAX_REORDER_WAIT_SECONDS = 60
+SERVER_START_TIMEOUT = 30
+
+
+def key_path(address: str) -> str:
+    return address + ".key"
+
+
+class _Request:
+    def __init__(self, path: str, model_size: str, compute_type: str):
+        self.path = path
+        self.key = (model_size, compute_type)
+        self.queued = time.time()
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+
+class TranscriptionServer:
+    """
+    Owns a ModelRegistry and a queue of transcription requests.
+
+    `workers` requests run at once, each model loaded with thread_budget // workers
+    CPU threads, so the total never exceeds the budget however many sessions are connected.
+    Requests for models that are already loaded are served first (no reload churn when
+    sessions use different model sizes), bounded by MAX_REORDER_WAIT_SECONDS.
+    """
+
+    def __init__(self, address: str = TRANSCRIBE_SOCKET, workers: int = TRANSCRIBE_SERVER_WORKERS,
+                 thread_budget: int = TRANSCRIBE_THREAD_BUDGET, idle_seconds: int = TRANSCRIBE_SERVER_IDLE_SECONDS):
+        from model_registry import ModelRegistry
+        self.address = address
+        self.workers = max(1, workers)
+        self.idle_seconds = idle_seconds
+        self.registry = ModelRegistry(cpu_threads=max(1, thread_budget // self.workers), num_workers=1)
+        self._queue: List[_Request] = []
+        self._running = 0
+        self._connections = 0 # accepted, not yet handled
+        self._cond = threading.Condition()
+        self._last_activity = time.time()
+        self._listener: Optional[Listener] = None
+
+    # --- Queue ---
+
+    def _next_request(self) -> _Request:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            loaded = set(self.registry.loaded_keys())
+            oldest = self._queue[0]
+            request = oldest
+            if oldest.key not in loaded and time.time() - oldest.queued < MAX_REORDER_WAIT_SECONDS:
+                request = next((r for r in self._queue if r.key in loaded), oldest)
+            self._queue.remove(request)
+            self._running += 1
+            return request
+
+    def _worker(self):
+        while True:
+            request = self._next_request()
+            request.started.set()
+            try:
+                transcriber = self.registry.get(*request.key)
+                request.result = transcriber.transcribe_words(request.path)
+            except Exception as e:
+                request.error = f"{type(e).__name__}: {e}"
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._last_activity = time.time()
+                request.done.set()
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            queued, running = len(self._queue), self._running
+        return {
+            "loaded": self.registry.loaded_keys(),
+            "used_mb": self.registry.used_mb(),
+            "queued": queued,
+            "running": running,
+            "threads": self.registry.cpu_threads,
+            "pid": os.getpid(),
+        }
+
+    # --- Connections ---
+
+    def _handle(self, conn):
+        """One request per connection: ("transcribe", ...), ("warm", ...) or ("status",)."""
+        try:
+            message = conn.recv()
+            op = message[0]
+            if op == "transcribe":
+                _, path, model_size, compute_type = message
+                request = _Request(path, model_size, compute_type)
+                with self._cond:
+                    self._queue.append(request)
+                    self._last_activity = time.time()
+                    self._cond.notify()
+                request.started.wait()
+                conn.send(("started", None))
+                request.done.wait()
+                conn.send(("error", request.error) if request.error else ("ok", request.result))
+            elif op == "warm":
+                _, model_size, compute_type = message
+                self.registry.warm_async(model_size, compute_type)
+                conn.send(("ok", None))
+            elif op == "status":
+                conn.send(("ok", self.status()))
+            else:
+                conn.send(("error", f"Unknown operation {op!r}"))
+        except (EOFError, OSError):
+            # Client went away (closed tab); a running transcription still finishes and is discarded
+            pass
+        finally:
+            conn.close()
+            with self._cond:
+                self._connections -= 1
+                self._last_activity = time.time()
+
+    def _idle_watchdog(self):
+        while True:
+            time.sleep(min(60, self.idle_seconds))
+            with self._cond:
+                idle = (not self._queue and not self._running and not self._connections
+                        and time.time() - self._last_activity > self.idle_seconds)
+                if idle:
+                    # Stop taking connections before exiting; a client caught in between
+                    # (never told "started") retries against a new server
+                    print(f"Transcription server idle for {self.idle_seconds}s, exiting")
+                    self._listener.close()
+                    self._cleanup()
+                    os._exit(0)
+
+    def _cleanup(self):
+        for path in (self.address, key_path(self.address)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            if _ping(self.address):
+                raise RuntimeError(f"A transcription server is already listening on {self.address}")
+            self._cleanup() # stale socket from a crashed server
+
+        authkey = secrets.token_bytes(32)
+        fd = os.open(key_path(self.address), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(authkey)
+        listener = self._listener = Listener(self.address, family="AF_UNIX", authkey=authkey)
+        os.chmod(self.address, 0o600)
+
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"transcribe-{i}", daemon=True).start()
+        if self.idle_seconds:
+            threading.Thread(target=self._idle_watchdog, name="idle-watchdog", daemon=True).start()
+        print(f"Transcription server listening on {self.address} "
+              f"({self.workers} worker(s), {self.registry.cpu_threads} threads each)")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # Failed handshake (wrong key, client gone); keep serving
+                    print(f"Rejected connection: {e}")
+                    continue
+                with self._cond:
+                    self._connections += 1
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+            self._cleanup()
+
+
+def _ping(address: str) -> bool:
+    try:
+        TranscriptionClient(address)._send("status")
+        return True
+    except Exception:
+        return False
+
+
+class TranscriptionClient:
+    """Thin client for TranscriptionServer. Opens one short connection per call."""
+
+    def __init__(self, address: str = TRANSCRIBE_SOCKET):
+        self.address = address
+
+    def _call(self, *message, on_started: Optional[Callable[[], None]] = None):
+        started = []
+
+        def mark_started():
+            started.append(True)
+            if on_started:
+                on_started()
+
+        try:
+            return self._send(*message, on_started=mark_started)
+        except (FileNotFoundError, ConnectionError, EOFError):
+            # The server exited (idle timeout, crash) since this client was created, or while
+            # this request was being accepted: start a new one. Work it already started isn't redone.
+            if started or not self.ensure_server():
+                raise
+            return self._send(*message, on_started=on_started)
+
+    def _send(self, *message, on_started: Optional[Callable[[], None]] = None):
+        with open(key_path(self.address), "rb") as f:
+            authkey = f.read()
+        conn = Client(self.address, family="AF_UNIX", authkey=authkey)
+        try:
+            conn.send(message)
+            while True:
+                kind, payload = conn.recv()
+                if kind == "started":
+                    if on_started:
+                        on_started()
+                    continue
+                if kind == "error":
+                    raise RuntimeError(f"Transcription server: {payload}")
+                return payload
+        finally:
+            conn.close()
+
+    def transcribe_words(self, video_path: str, model_size: str = WHISPER_MODEL_SIZE,
+                         compute_type: str = WHISPER_COMPUTE_TYPE,
+                         on_started: Optional[Callable[[], None]] = None):
+        """Queues a transcription on the server and waits for (texts, times)."""
+        return self._call("transcribe", os.path.abspath(video_path), model_size, compute_type, on_started=on_started)
+
+    def warm(self, model_size: str = WHISPER_MODEL_SIZE, compute_type: str = WHISPER_COMPUTE_TYPE):
+        self._call("warm", model_size, compute_type)
+
+    def status(self) -> Dict[str, Any]:
+        return self._call("status")
+
+    def ensure_server(self, timeout: float = SERVER_START_TIMEOUT) -> bool:
+        """
+        Starts a server process if none is answering. A lock file keeps concurrent
+        app processes from starting two. Returns True once the server responds.
+        """
+        if _ping(self.address):
+            return True
+        with open(self.address + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if _ping(self.address):
+                return True
+            log = open(self.address + ".log", "ab")
+            subprocess.Popen(
+                [sys.executable, "-m", "transcription_service", "--socket", self.address],
+                cwd=BASE_DIR, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                start_new_session=True
+            )
+            log.close()
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                if _ping(self.address):
+                    return True
+                time.sleep(0.2)
+        return False
+
+
+class LocalTranscriptionClient:
+    """Same interface as TranscriptionClient, backed by an in-process ModelRegistry."""
+
+    def __init__(self, registry=None):
+        from model_registry import ModelRegistry
+        self.registry = registry or ModelRegistry()
+
+    def transcribe_words(self, video_path: str, model_size: str = WHISPER_MODEL_SIZE,
+                         compute_type: str = WHISPER_COMPUTE_TYPE,
+                         on_started: Optional[Callable[[], None]] = None):
+        transcriber = self.registry.get(model_size, compute_type)
+        if on_started:
+            on_started()
+        return transcriber.transcribe_words(video_path)
+
+    def warm(self, model_size: str = WHISPER_MODEL_SIZE, compute_type: str = WHISPER_COMPUTE_TYPE):
+        self.registry.warm_async(model_size, compute_type)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.registry.loaded_keys(),
+            "used_mb": self.registry.used_mb(),
+            "queued": 0,
+            "running": 0,
+            "threads": self.registry.cpu_threads, # 0 = CTranslate2 uses every core
+            "pid": os.getpid(),
+        }
+
+
+def get_transcription_client():
+    """
+    The shared server's client (starting the server if needed), or an in-process client
+    when the server is disabled (CAPTIONME_TRANSCRIBE_SERVER=0), unsupported or fails to start.
+    """
+    if TRANSCRIBE_SERVER and fcntl is not None:
+        client = TranscriptionClient()
+        try:
+            if client.ensure_server():
+                return client
+            print("Transcription server did not start, transcribing in-process")
+        except OSError as e:
+            print(f"Transcription server unavailable ({e}), transcribing in-process")
+    return LocalTranscriptionClient()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="transcription_service", description="Shared Whisper transcription server.")
+    parser.add_argument("--socket", default=TRANSCRIBE_SOCKET, help="Unix socket path")
+    parser.add_argument("--workers", type=int, default=TRANSCRIBE_SERVER_WORKERS, help="Concurrent transcriptions")
+    parser.add_argument("--threads", type=int, default=TRANSCRIBE_THREAD_BUDGET, help="Total CPU threads for all workers")
+    parser.add_argument("--idle-exit", type=int, default=TRANSCRIBE_SERVER_IDLE_SECONDS,
+                        help="Exit after this many idle seconds (0 = never)")
+    args = parser.parse_args(argv)
+    # Exit through serve_forever's cleanup (socket + key file) on termination
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    TranscriptionServer(args.socket, args.workers, args.threads, args.idle_exit).serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,47 @@
 import os
-import requests
-import streamlit as st
 from settings import FONTS_DIR
 
+# (connect, read) timeouts for font downloads
+HTTP_TIMEOUT = (5, 30)
 
+_http_session = None
 
-def download_file(url, save_path):
+
+def get_http_session():
+    """Shared requests.Session (connection pooling + retries) for all downloads."""
+    global _http_session
+    if _http_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        session = requests.Session()
+        adapter = HTTPAdapter(max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504]))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _http_session = session
+    return _http_session
+
+
+def download_file(url, save_path, timeout=HTTP_TIMEOUT):
     """Downloads a file from a URL to a specific path."""
+    partial_path = save_path + ".part"
     try:
-        response = requests.get(url, stream=True)
+        response = get_http_session().get(url, stream=True, timeout=timeout)
         response.raise_for_status()
-        with open(save_path, 'wb') as f:
+        with open(partial_path, 'wb') as f:
             for chunk in response.iter_content(chunk_size=8192):
                 f.write(chunk)
         
         # Integrity Check 1: Size
-        if os.path.getsize(save_path) < 1000: # 1KB minimum
+        if os.path.getsize(partial_path) < 1000: # 1KB minimum
             print(f"Warning: File {save_path} is too small. Deleting.")
-            os.remove(save_path)
+            os.remove(partial_path)
             return False
 
         # Integrity Check 2: Magic Bytes (The "Is this actually a font?" check)
         # Proper TTF files start with 00 01 00 00
         # OpenType (OTTO) starts with 4F 54 54 4F
-        with open(save_path, 'rb') as f:
+        with open(partial_path, 'rb') as f:
             header = f.read(4)
             
         # Common TTF/OTF signatures
@@ -39,16 +57,17 @@ def download_file(url, save_path):
             # If it's HTML (starts with <!DO or <htm), it's definitely junk.
             if header.startswith(b'<') or b'html' in header.lower():
                 print(f"Warning: File {save_path} appears to be HTML/XML, not a font. Deleting.")
-                os.remove(save_path)
+                os.remove(partial_path)
                 return False
             # We'll be lenient with other binary headers just in case, but warn.
             print(f"Warning: Unknown file header {header} for {save_path}. Proceeding with caution.")
             
+        os.replace(partial_path, save_path)
         return True
     except Exception as e:
         print(f"Error downloading {url}: {e}")
-        if os.path.exists(save_path):
-             os.remove(save_path)
+        if os.path.exists(partial_path):
+             os.remove(partial_path)
         return False
 
 
@@ -80,43 +99,16 @@ def fetch_google_font(font_name: str) -> str:
     
     for url in base_urls:
         if download_file(url, save_path):
+            from fonts import record_font
+            record_font(save_path)
             return save_path
             
     return None
 
 def download_google_fonts():
     """
-    Downloads required base Google Fonts if they don't exist locally.
+    Downloads required base Google Fonts if they don't exist locally (blocking).
+    Returns the number of fonts downloaded. The app uses fonts.bootstrap_fonts() once per process instead.
     """
-    # Define fonts to download (Raw GitHub URLs for Google Fonts)
-    fonts = {
-        "Anton-Regular.ttf": "https://github.com/google/fonts/raw/main/ofl/anton/Anton-Regular.ttf",
-        "Roboto-Regular.ttf": "https://github.com/google/fonts/raw/main/apache/roboto/Roboto-Regular.ttf",
-        "Roboto-Bold.ttf": "https://github.com/google/fonts/raw/main/apache/roboto/Roboto-Bold.ttf"
-    }
-    
-    os.makedirs(FONTS_DIR, exist_ok=True)
-    
-    created = 0
-    created = 0
-    for filename, url in fonts.items():
-        file_path = os.path.join(FONTS_DIR, filename)
-        
-        # Check if exists but is corrupt (too small)
-        if os.path.exists(file_path):
-            if os.path.getsize(file_path) < 1000:
-                print(f"Found corrupt font {filename}. Deleting...")
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
-        
-        if not os.path.exists(file_path):
-            print(f"Downloading font: {filename}...")
-            if download_file(url, file_path):
-                created += 1
-        else:
-             pass
-            
-    return created
-
+    from fonts import bootstrap_fonts
+    return len(bootstrap_fonts(background=False)["downloaded"])
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from settings import TEMP_DIR, OUTPUT_DIR, CACHE_DIR, TEMP_QUOTA_MB, OUTPUT_QUOTA_MB
+
+# Session pins expire if a session stops refreshing them (closed tab, dead websocket)
+PIN_TTL_SECONDS = 3600
+# Files younger than this are never evicted (may still be written by a job)
+MIN_AGE_SECONDS = 60
+
+
+class WorkspaceManager:
+    """
+    Keeps TEMP_DIR and OUTPUT_DIR under size quotas.
+
+    Last access is tracked through each file's atime, which touch() sets explicitly
+    (so it works on relatime/noatime mounts and survives restarts). Eviction removes the
+    least recently used files that no live session has pinned.
+    Share one instance per process (st.cache_resource).
+    """
+
+    def __init__(self, areas: Optional[Dict[str, Tuple[str, int]]] = None, keep_on_purge: Iterable[str] = (CACHE_DIR,)):
+        # name -> (root dir, quota in MB; 0 = unlimited)
+        self.areas = areas or {
+            "temp": (TEMP_DIR, TEMP_QUOTA_MB),
+            "output": (OUTPUT_DIR, OUTPUT_QUOTA_MB),
+        }
+        # Content caches stay useful after a purge; only quota eviction (LRU) trims them
+        self.keep_on_purge = tuple(os.path.join(os.path.abspath(d), "") for d in keep_on_purge)
+        self._pins: Dict[str, Tuple[float, frozenset]] = {}
+        self._lock = threading.Lock()
+
+    # --- Access tracking ---
+
+    def touch(self, *paths: str):
+        """Marks files as just used (bumps atime, keeps mtime so content caches stay valid)."""
+        now_ns = time.time_ns()
+        for path in paths:
+            if path and os.path.isfile(path):
+                try:
+                    os.utime(path, ns=(now_ns, os.stat(path).st_mtime_ns))
+                except OSError:
+                    pass
+
+    def pin(self, session_id: str, paths: Iterable[Optional[str]]):
+        """Declares the files a session currently references (replaces its previous pins)."""
+        abs_paths = frozenset(os.path.abspath(p) for p in paths if p)
+        with self._lock:
+            self._pins[session_id] = (time.time(), abs_paths)
+        self.touch(*abs_paths)
+
+    def pinned(self) -> set:
+        cutoff = time.time() - PIN_TTL_SECONDS
+        with self._lock:
+            for session_id in [s for s, (seen, _) in self._pins.items() if seen < cutoff]:
+                del self._pins[session_id]
+            return set().union(*(paths for _, paths in self._pins.values())) if self._pins else set()
+
+    # --- Usage & eviction ---
+
+    def _stats(self, root: str) -> List[Tuple[str, os.stat_result]]:
+        """(path, stat) for every file under root."""
+        stats = []
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stats.append((os.path.abspath(path), os.stat(path)))
+                except OSError:
+                    continue
+        return stats
+
+    def _units(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        area -> files grouped by inode. Renders are hardlinked from the cache into OUTPUT_DIR,
+        so one file can have several paths: its bytes count once, toward the last area
+        listing it, and evicting it removes every path (the space is only freed with the last link).
+        """
+        units: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        for name, (root, _) in self.areas.items():
+            for path, stat in self._stats(root):
+                unit = units.setdefault((stat.st_dev, stat.st_ino), {
+                    "paths": [], "size": stat.st_size, "atime": stat.st_atime, "mtime": stat.st_mtime,
+                })
+                unit["paths"].append(path)
+                unit["atime"] = max(unit["atime"], stat.st_atime)
+                unit["mtime"] = max(unit["mtime"], stat.st_mtime)
+                unit["area"] = name
+        by_area: Dict[str, List[Dict[str, Any]]] = {name: [] for name in self.areas}
+        for unit in units.values():
+            by_area[unit["area"]].append(unit)
+        return by_area
+
+    def usage(self) -> Dict[str, Tuple[int, int]]:
+        """area -> (used bytes, quota bytes; 0 = unlimited). Hardlinked files count once."""
+        units = self._units()
+        return {name: (sum(unit["size"] for unit in units[name]), quota_mb * 1024 * 1024)
+                for name, (_, quota_mb) in self.areas.items()}
+
+    def enforce(self) -> List[str]:
+        """Evicts LRU unpinned files from every area over quota. Returns removed paths."""
+        removed = []
+        pinned = self.pinned()
+        now = time.time()
+        units = self._units()
+        for name, (root, quota_mb) in self.areas.items():
+            if not quota_mb:
+                continue
+            quota = quota_mb * 1024 * 1024
+            used = sum(unit["size"] for unit in units[name])
+            if used <= quota:
+                continue
+            # Least recently accessed first
+            for unit in sorted(units[name], key=lambda u: u["atime"]):
+                if used <= quota:
+                    break
+                if pinned.intersection(unit["paths"]) or now - unit["mtime"] < MIN_AGE_SECONDS:
+                    continue
+                for path in unit["paths"]:
+                    try:
+                        # Only the last link frees the space (others may live outside the workspace)
+                        freed = os.stat(path).st_nlink == 1
+                        os.remove(path)
+                        removed.append(path)
+                        if freed:
+                            used -= unit["size"]
+                    except OSError as e:
+                        print(f"Workspace: could not evict {path}: {e}")
+            if used > quota:
+                print(f"Workspace: '{name}' still over quota ({used // (1024 * 1024)} MB), everything left is in use")
+        return removed
+
+    def purge(self, area: str = "temp") -> List[str]:
+        """
+        Removes every unpinned file in an area except the caches (the sidebar purge button).
+        Files still being written (.part, or modified within MIN_AGE_SECONDS) are left alone:
+        they may be another session's ingest or prefetch.
+        """
+        root, _ = self.areas[area]
+        pinned = self.pinned()
+        now = time.time()
+        removed = []
+        for path, stat in self._stats(root):
+            if path in pinned or path.startswith(self.keep_on_purge):
+                continue
+            if ".part" in os.path.basename(path) or now - stat.st_mtime < MIN_AGE_SECONDS:
+                continue
+            try:
+                os.remove(path)
+                removed.append(path)
+            except OSError:
+                pass
+        return removed